@@ -0,0 +1,632 @@
+/**
+ * Array-backed outputs for state Maps.
+ *
+ * Array-backed outputs which can stand in for the Map of region to Map of attribute to value used
+ * under "out" in state Maps. Values live in a Float64Array laid out region by attribute such that
+ * many workspaces can share a single buffer and be copied with a single typed array operation.
+ * States using these outputs can also be posted to workers by transferring that buffer instead of
+ * structured cloning nested Maps (see packStateForTransfer and unpackStateFromTransfer).
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+
+/**
+ * Description of the layout of outputs within a Float64Array.
+ */
+class StateSchema {
+    /**
+     * Create a new schema.
+     *
+     * @param regions Array of region names in the order they are laid out.
+     * @param attrs Array of attribute names in the order they are laid out within a region.
+     */
+    constructor(regions, attrs) {
+        const self = this;
+
+        self._regions = regions;
+        self._attrs = attrs;
+
+        self._regionIndices = new Map();
+        regions.forEach((region, i) => self._regionIndices.set(region, i));
+
+        self._attrIndices = new Map();
+        attrs.forEach((attr, i) => self._attrIndices.set(attr, i));
+    }
+
+    /**
+     * Get the regions in the order they are laid out.
+     *
+     * @returns Array of region names.
+     */
+    getRegions() {
+        const self = this;
+        return self._regions;
+    }
+
+    /**
+     * Get the attributes in the order they are laid out within a region.
+     *
+     * @returns Array of attribute names.
+     */
+    getAttrs() {
+        const self = this;
+        return self._attrs;
+    }
+
+    /**
+     * Determine if a region is part of this schema.
+     *
+     * @param region The name of the region.
+     * @returns True if included and false otherwise.
+     */
+    hasRegion(region) {
+        const self = this;
+        return self._regionIndices.has(region);
+    }
+
+    /**
+     * Determine if an attribute is part of this schema.
+     *
+     * @param attr The name of the attribute.
+     * @returns True if included and false otherwise.
+     */
+    hasAttr(attr) {
+        const self = this;
+        return self._attrIndices.has(attr);
+    }
+
+    /**
+     * Get the position of a region within the layout.
+     *
+     * @param region The name of the region.
+     * @returns Index of the region or -1 if not found.
+     */
+    getRegionIndex(region) {
+        const self = this;
+        const index = self._regionIndices.get(region);
+        return index === undefined ? -1 : index;
+    }
+
+    /**
+     * Get the position of an attribute within a region's layout.
+     *
+     * @param attr The name of the attribute.
+     * @returns Index of the attribute or -1 if not found.
+     */
+    getAttrIndex(attr) {
+        const self = this;
+        const index = self._attrIndices.get(attr);
+        return index === undefined ? -1 : index;
+    }
+
+    /**
+     * Get the offset of a value relative to the start of a workspace.
+     *
+     * @param region The name of the region.
+     * @param attr The name of the attribute.
+     * @returns Offset of the value within the values for a single workspace.
+     */
+    getOffset(region, attr) {
+        const self = this;
+        return self.getRegionIndex(region) * self._attrs.length + self.getAttrIndex(attr);
+    }
+
+    /**
+     * Get the number of values in a single workspace.
+     *
+     * @returns Number of regions times number of attributes.
+     */
+    getSize() {
+        const self = this;
+        return self._regions.length * self._attrs.length;
+    }
+}
+
+
+/**
+ * Map-like view over the attributes for a single region.
+ *
+ * Map-like view over the attributes for a single region where attributes in the schema are read
+ * from and written to the underlying array. Other attributes are kept in a regular Map so that
+ * this can be used anywhere a Map of attribute to value is expected.
+ */
+class ArrayRegionOutputs {
+    /**
+     * Create a new view.
+     *
+     * @param schema The StateSchema describing the layout.
+     * @param values The Float64Array holding the values.
+     * @param offset The index in values at which this region's attributes start.
+     */
+    constructor(schema, values, offset) {
+        const self = this;
+        self._schema = schema;
+        self._values = values;
+        self._offset = offset;
+        self._extra = new Map();
+    }
+
+    /**
+     * Determine if an attribute is available.
+     *
+     * @param attr The name of the attribute.
+     * @returns True if found and false otherwise.
+     */
+    has(attr) {
+        const self = this;
+        return self._schema.hasAttr(attr) || self._extra.has(attr);
+    }
+
+    /**
+     * Get the attributes outside of the schema.
+     *
+     * @returns Map from attribute name to value for attributes not held in the array.
+     */
+    getExtras() {
+        const self = this;
+        return self._extra;
+    }
+
+    /**
+     * Get the value of an attribute.
+     *
+     * @param attr The name of the attribute.
+     * @returns The value or undefined if not found.
+     */
+    get(attr) {
+        const self = this;
+        const index = self._schema.getAttrIndex(attr);
+        if (index == -1) {
+            return self._extra.get(attr);
+        } else {
+            return self._values[self._offset + index];
+        }
+    }
+
+    /**
+     * Set the value of an attribute.
+     *
+     * @param attr The name of the attribute.
+     * @param value The new value.
+     * @returns This view.
+     */
+    set(attr, value) {
+        const self = this;
+        const index = self._schema.getAttrIndex(attr);
+        if (index == -1) {
+            self._extra.set(attr, value);
+        } else {
+            self._values[self._offset + index] = value;
+        }
+        return self;
+    }
+
+    /**
+     * Get the attribute names with schema attributes first.
+     *
+     * @returns Iterator over attribute names.
+     */
+    keys() {
+        const self = this;
+        return self._schema.getAttrs().concat(Array.of(...self._extra.keys()))[Symbol.iterator]();
+    }
+
+    /**
+     * Get the values in the same order as keys.
+     *
+     * @returns Iterator over values.
+     */
+    values() {
+        const self = this;
+        return Array.of(...self.keys()).map((attr) => self.get(attr))[Symbol.iterator]();
+    }
+
+    /**
+     * Get attribute and value pairs in the same order as keys.
+     *
+     * @returns Iterator over [attribute, value] arrays.
+     */
+    entries() {
+        const self = this;
+        return Array.of(...self.keys()).map((attr) => [attr, self.get(attr)])[Symbol.iterator]();
+    }
+
+    /**
+     * Call a function for each value like Map.forEach.
+     *
+     * @param callback Function taking value, attribute name, and this view.
+     */
+    forEach(callback) {
+        const self = this;
+        for (const attr of self.keys()) {
+            callback(self.get(attr), attr, self);
+        }
+    }
+
+    /**
+     * Get attribute and value pairs.
+     *
+     * @returns Iterator over [attribute, value] arrays.
+     */
+    [Symbol.iterator]() {
+        const self = this;
+        return self.entries();
+    }
+
+    /**
+     * Get the number of attributes.
+     *
+     * @returns Count of attributes.
+     */
+    get size() {
+        const self = this;
+        return self._schema.getAttrs().length + self._extra.size;
+    }
+}
+
+
+/**
+ * Map-like view from region name to that region's ArrayRegionOutputs.
+ *
+ * Map-like view from region name to that region's ArrayRegionOutputs for a single workspace.
+ * Regions outside the schema (like global added after simulation) are kept in a regular Map.
+ */
+class ArrayOutputs {
+    /**
+     * Create a new view.
+     *
+     * @param schema The StateSchema describing the layout.
+     * @param values The Float64Array holding the values.
+     * @param offset Optional index in values at which this workspace starts. Defaults to 0.
+     */
+    constructor(schema, values, offset) {
+        const self = this;
+        self._schema = schema;
+        self._values = values;
+        self._offset = offset === undefined ? 0 : offset;
+        self._extra = new Map();
+
+        const numAttrs = schema.getAttrs().length;
+        self._regionViews = new Map();
+        schema.getRegions().forEach((region, i) => {
+            const regionOffset = self._offset + i * numAttrs;
+            self._regionViews.set(region, new ArrayRegionOutputs(schema, values, regionOffset));
+        });
+    }
+
+    /**
+     * Get the schema describing the layout.
+     *
+     * @returns StateSchema for these outputs.
+     */
+    getSchema() {
+        const self = this;
+        return self._schema;
+    }
+
+    /**
+     * Get the array backing these outputs.
+     *
+     * @returns Float64Array which may be shared with other workspaces.
+     */
+    getValues() {
+        const self = this;
+        return self._values;
+    }
+
+    /**
+     * Get the index at which this workspace starts in the backing array.
+     *
+     * @returns Offset into getValues().
+     */
+    getOffset() {
+        const self = this;
+        return self._offset;
+    }
+
+    /**
+     * Make an independent copy of these outputs.
+     *
+     * @returns New ArrayOutputs with its own array holding a copy of this workspace's values
+     *      along with copies of attributes and regions outside the schema.
+     */
+    clone() {
+        const self = this;
+
+        const size = self._schema.getSize();
+        const values = self._values.slice(self._offset, self._offset + size);
+        const copied = new ArrayOutputs(self._schema, values);
+
+        self._regionViews.forEach((view, region) => {
+            const copiedView = copied.get(region);
+            view.getExtras().forEach((value, attr) => copiedView.set(attr, value));
+        });
+
+        self._extra.forEach((regionOutputs, region) => {
+            copied.set(region, new Map(regionOutputs));
+        });
+
+        return copied;
+    }
+
+    /**
+     * Describe these outputs such that they can be posted to a worker.
+     *
+     * Describe these outputs such that they can be posted to a worker. If this workspace owns its
+     * entire backing array, that array is used directly so its buffer may be transferred without
+     * copying (after which these outputs can no longer be used). Otherwise, values for just this
+     * workspace are first copied into a new array. Alternatively, a target array may be given
+     * in which case values are copied into it such that multiple workspaces may share one buffer.
+     *
+     * @param target Optional Float64Array into which values should be copied.
+     * @param targetOffset Offset into target at which to write values. Ignored if target not
+     *      given.
+     * @returns Plain object with regions, attrs, values (Float64Array), offset (index into values
+     *      at which this workspace starts), regionExtras (Map from schema region to its Map of
+     *      attributes outside the schema), and extras (Map from region outside the schema to its
+     *      outputs).
+     */
+    toMessage(target, targetOffset) {
+        const self = this;
+
+        const size = self._schema.getSize();
+        const ownValues = () => self._values.subarray(self._offset, self._offset + size);
+
+        let values = null;
+        let offset = 0;
+        if (target !== undefined) {
+            target.set(ownValues(), targetOffset);
+            values = target;
+            offset = targetOffset;
+        } else {
+            const ownsValues = self._offset == 0 && self._values.length == size;
+            const valuesBytes = self._values.byteLength;
+            const ownsBuffer = ownsValues && self._values.buffer.byteLength == valuesBytes;
+            values = ownsBuffer ? self._values : ownValues().slice();
+        }
+
+        const regionExtras = new Map();
+        self._regionViews.forEach((view, region) => {
+            regionExtras.set(region, view.getExtras());
+        });
+
+        return {
+            "regions": self._schema.getRegions(),
+            "attrs": self._schema.getAttrs(),
+            "values": values,
+            "offset": offset,
+            "regionExtras": regionExtras,
+            "extras": self._extra,
+        };
+    }
+
+    /**
+     * Determine if a region is available.
+     *
+     * @param region The name of the region.
+     * @returns True if found and false otherwise.
+     */
+    has(region) {
+        const self = this;
+        return self._regionViews.has(region) || self._extra.has(region);
+    }
+
+    /**
+     * Get the outputs for a region.
+     *
+     * @param region The name of the region.
+     * @returns Map-like outputs for the region or undefined if not found.
+     */
+    get(region) {
+        const self = this;
+        if (self._regionViews.has(region)) {
+            return self._regionViews.get(region);
+        } else {
+            return self._extra.get(region);
+        }
+    }
+
+    /**
+     * Set the outputs for a region.
+     *
+     * @param region The name of the region.
+     * @param outputs Map of attribute to value. If the region is in the schema, values are copied
+     *      into the backing array.
+     * @returns This view.
+     */
+    set(region, outputs) {
+        const self = this;
+        if (self._regionViews.has(region)) {
+            const view = self._regionViews.get(region);
+            outputs.forEach((value, attr) => view.set(attr, value));
+        } else {
+            self._extra.set(region, outputs);
+        }
+        return self;
+    }
+
+    /**
+     * Get the region names with schema regions first.
+     *
+     * @returns Iterator over region names.
+     */
+    keys() {
+        const self = this;
+        return self._schema.getRegions()
+            .concat(Array.of(...self._extra.keys()))[Symbol.iterator]();
+    }
+
+    /**
+     * Get the region outputs in the same order as keys.
+     *
+     * @returns Iterator over region outputs.
+     */
+    values() {
+        const self = this;
+        return Array.of(...self.keys()).map((region) => self.get(region))[Symbol.iterator]();
+    }
+
+    /**
+     * Get region and outputs pairs in the same order as keys.
+     *
+     * @returns Iterator over [region, outputs] arrays.
+     */
+    entries() {
+        const self = this;
+        return Array.of(...self.keys())
+            .map((region) => [region, self.get(region)])[Symbol.iterator]();
+    }
+
+    /**
+     * Call a function for each region like Map.forEach.
+     *
+     * @param callback Function taking region outputs, region name, and this view.
+     */
+    forEach(callback) {
+        const self = this;
+        for (const region of self.keys()) {
+            callback(self.get(region), region, self);
+        }
+    }
+
+    /**
+     * Get region and outputs pairs.
+     *
+     * @returns Iterator over [region, outputs] arrays.
+     */
+    [Symbol.iterator]() {
+        const self = this;
+        return self.entries();
+    }
+
+    /**
+     * Get the number of regions.
+     *
+     * @returns Count of regions.
+     */
+    get size() {
+        const self = this;
+        return self._schema.getRegions().length + self._extra.size;
+    }
+}
+
+
+/**
+ * Rebuild outputs from a message created by ArrayOutputs.toMessage.
+ *
+ * @param message The message received from postMessage.
+ * @returns Newly built ArrayOutputs viewing the values in the message without copying.
+ */
+function buildArrayOutputsFromMessage(message) {
+    const schema = new StateSchema(message["regions"], message["attrs"]);
+    const offset = message["offset"] === undefined ? 0 : message["offset"];
+    const outputs = new ArrayOutputs(schema, message["values"], offset);
+
+    message["regionExtras"].forEach((extras, region) => {
+        const view = outputs.get(region);
+        extras.forEach((value, attr) => view.set(attr, value));
+    });
+
+    message["extras"].forEach((regionOutputs, region) => {
+        outputs.set(region, regionOutputs);
+    });
+
+    return outputs;
+}
+
+
+/**
+ * Prepare a state Map to be posted to or from a worker.
+ *
+ * Prepare a state Map to be posted to or from a worker. Note that, once posted with the transfer
+ * list, the outputs of the original state may no longer be readable.
+ *
+ * @param state The state Map whose outputs may be ArrayOutputs.
+ * @returns Object with state (Map which can be structured cloned) and transfer (array of
+ *      ArrayBuffers to pass as the transfer list to postMessage).
+ */
+function packStateForTransfer(state) {
+    const outputs = state.get("out");
+
+    if (!(outputs instanceof ArrayOutputs)) {
+        return {"state": state, "transfer": []};
+    }
+
+    const message = outputs.toMessage();
+    const packed = new Map(state);
+    packed.set("out", message);
+
+    return {"state": packed, "transfer": [message["values"].buffer]};
+}
+
+
+/**
+ * Restore a state Map received from postMessage after packStateForTransfer.
+ *
+ * @param state The state Map as received.
+ * @returns State Map with outputs restored to ArrayOutputs if they were packed.
+ */
+function unpackStateFromTransfer(state) {
+    const outputs = state.get("out");
+
+    if (outputs instanceof Map) {
+        return state;
+    }
+
+    state.set("out", buildArrayOutputsFromMessage(outputs));
+    return state;
+}
+
+
+/**
+ * Prepare multiple state Maps to be posted to or from a worker together.
+ *
+ * Prepare multiple state Maps to be posted to or from a worker together, copying the values of
+ * all of their ArrayOutputs into a single array such that the whole batch is sent with one
+ * transferable buffer.
+ *
+ * @param states Array of state Maps whose outputs may be ArrayOutputs.
+ * @returns Object with states (array of Maps which can be structured cloned) and transfer (array
+ *      of ArrayBuffers to pass as the transfer list to postMessage).
+ */
+function packStatesForTransfer(states) {
+    const isArray = (state) => state.get("out") instanceof ArrayOutputs;
+
+    const totalSize = states
+        .filter(isArray)
+        .map((state) => state.get("out").getSchema().getSize())
+        .reduce((a, b) => a + b, 0);
+
+    if (totalSize == 0) {
+        return {"states": states, "transfer": []};
+    }
+
+    const values = new Float64Array(totalSize);
+    let offset = 0;
+
+    const packedStates = states.map((state) => {
+        if (!isArray(state)) {
+            return state;
+        }
+
+        const outputs = state.get("out");
+        const packed = new Map(state);
+        packed.set("out", outputs.toMessage(values, offset));
+        offset += outputs.getSchema().getSize();
+        return packed;
+    });
+
+    return {"states": packedStates, "transfer": [values.buffer]};
+}
+
+
+/**
+ * Restore state Maps received from postMessage after packStatesForTransfer.
+ *
+ * @param states Array of state Maps as received.
+ * @returns The same state Maps with outputs restored to ArrayOutputs if they were packed.
+ */
+function unpackStatesFromTransfer(states) {
+    return states.map(unpackStateFromTransfer);
+}
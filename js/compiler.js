@@ -16,11 +16,18 @@ class CompileResult {
      *
      * @param program The compiled program as a lambda if successful or null if unsuccessful.
      * @param errors Any errors enountered or empty list if no errors.
+     * @param reads Optional non-local variables read by the program. Defaults to empty list.
+     * @param writes Optional non-local variables written by the program. Defaults to empty list.
+     * @param stochastic Optional flag indicating if the program draws random values. Defaults to
+     *      false.
      */
-    constructor(program, errors) {
+    constructor(program, errors, reads, writes, stochastic) {
         const self = this;
         self._program = program;
         self._errors = errors;
+        self._reads = reads === undefined ? [] : reads;
+        self._writes = writes === undefined ? [] : writes;
+        self._stochastic = stochastic === undefined ? false : stochastic;
     }
 
     /**
@@ -42,6 +49,36 @@ class CompileResult {
         const self = this;
         return self._errors;
     }
+
+    /**
+     * Get the variables outside the program's local scope which it may read.
+     *
+     * @returns Sorted array of full identifiers like in.startYear.
+     */
+    getReads() {
+        const self = this;
+        return self._reads;
+    }
+
+    /**
+     * Get the variables outside the program's local scope which it may write.
+     *
+     * @returns Sorted array of full identifiers like out.nafta.eolRecyclingMT.
+     */
+    getWrites() {
+        const self = this;
+        return self._writes;
+    }
+
+    /**
+     * Determine if the program draws random values.
+     *
+     * @returns True if the program may give different results for the same inputs.
+     */
+    isStochastic() {
+        const self = this;
+        return self._stochastic;
+    }
 }
 
 
@@ -93,12 +130,19 @@ class Compiler {
             return new CompileResult(null, errors);
         }
 
-        const program = programUncompiled.accept(new CompileVisitor());
+        const visitor = new CompileVisitor();
+        const program = programUncompiled.accept(visitor);
         if (errors.length > 0) {
             return new CompileResult(null, errors);
         }
 
-        return new CompileResult(program, errors);
+        return new CompileResult(
+            program,
+            errors,
+            visitor.getReads(),
+            visitor.getWrites(),
+            visitor.isStochastic(),
+        );
     }
 }
 
@@ -110,8 +110,10 @@ const HISTORY_START_YEAR = PIPELINE_EXPORT_START_YEAR + RECYCLING_DELAY_ASSUMPTI
 const START_YEAR = 2024;
 const MAX_YEAR = 2050;
 
-// Cache management
-const CACHE_BUSTER = Date.now();
+// Cache management (version from the import map set on deploy by support/package.sh)
+const CACHE_VERSION = new URL(import.meta.url).searchParams.get("v");
+const CACHE_VERSION_SET = CACHE_VERSION !== null && CACHE_VERSION !== "EPOCH";
+const CACHE_BUSTER = CACHE_VERSION_SET ? CACHE_VERSION : Date.now();
 
 // Displays
 const DISPLAY_TYPES = {amount: 1, percent: 2, cumulative: 3};
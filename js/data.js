@@ -19,7 +19,8 @@ const BAD_YEAR_MSG = [
  *
  * Utility to operate on business as usual data, the records on which simulation is performed. This
  * is technically a facade which allows for request of state objects (Map) which are fed into
- * plastics language scripts.
+ * plastics language scripts. Numeric outputs for each year are laid out once into a Float64Array
+ * (see array_state.js) such that building a state copies a single array instead of nested Maps.
  */
 class DataLayer {
     /**
@@ -45,6 +46,13 @@ class DataLayer {
 
             self._baselineByYear.get(year).push(record);
         });
+
+        self._schema = self._buildSchema(baseline);
+
+        self._valuesByYear = new Map();
+        self._baselineByYear.forEach((records, year) => {
+            self._valuesByYear.set(year, self._buildValues(records));
+        });
     }
 
     /**
@@ -67,23 +75,17 @@ class DataLayer {
             }
         }
 
-        // Convert normal outputs
-        const outputs = new Map();
+        // Convert normal outputs, copying numeric values and setting others individually
+        const values = self._valuesByYear.get(year).slice();
+        const outputs = new ArrayOutputs(self._schema, values);
         const targetData = self._baselineByYear.get(year);
         targetData.forEach((datum) => {
-            const region = datum["region"];
-            if (!outputs.has(region)) {
-                outputs.set(region, new Map());
-            }
-
-            const regionData = outputs.get(region);
+            const regionData = outputs.get(datum["region"]);
             for (const key in datum) {
-                if (datum[key] !== undefined) {
+                if (datum[key] !== undefined && !self._schema.hasAttr(key)) {
                     regionData.set(key, datum[key]);
                 }
             }
-
-            regionData.set("eolReuseMT", 0);
         });
 
         // Add outputs
@@ -105,6 +107,64 @@ class DataLayer {
 
         return state;
     }
+
+    /**
+     * Determine the layout of numeric outputs across all years.
+     *
+     * @param baseline Raw business as usual data.
+     * @returns StateSchema with regions in order of appearance and attributes which are numeric
+     *      in every record along with eolReuseMT. Records without a region like trailing empty
+     *      lines are ignored.
+     */
+    _buildSchema(baseline) {
+        const self = this;
+
+        const regions = [];
+        const attrs = [];
+        const nonNumeric = new Set();
+
+        const hasRegion = (record) => record["region"] !== null && record["region"] !== undefined;
+
+        baseline.filter(hasRegion).forEach((record) => {
+            const region = record["region"];
+            if (regions.indexOf(region) == -1) {
+                regions.push(region);
+            }
+
+            for (const key in record) {
+                if (typeof record[key] !== "number") {
+                    nonNumeric.add(key);
+                } else if (attrs.indexOf(key) == -1) {
+                    attrs.push(key);
+                }
+            }
+        });
+
+        const numericAttrs = attrs.filter((x) => !nonNumeric.has(x) && x !== "eolReuseMT");
+        return new StateSchema(regions, numericAttrs.concat(["eolReuseMT"]));
+    }
+
+    /**
+     * Lay out the numeric outputs for a single year.
+     *
+     * @param records The raw business as usual records for the year.
+     * @returns Float64Array following the schema with eolReuseMT at zero.
+     */
+    _buildValues(records) {
+        const self = this;
+
+        const values = new Float64Array(self._schema.getSize());
+        records.filter((x) => self._schema.hasRegion(x["region"])).forEach((record) => {
+            const region = record["region"];
+            self._schema.getAttrs().forEach((attr) => {
+                if (record[attr] !== undefined) {
+                    values[self._schema.getOffset(region, attr)] = record[attr];
+                }
+            });
+        });
+
+        return values;
+    }
 }
 
 
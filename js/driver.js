@@ -6,6 +6,7 @@
 
 import {
     ALL_ATTRS,
+    CACHE_BUSTER,
     FLAG_DEFAULT_GHG,
     FLAG_DEFAULT_GHG_EXPORT,
     FLAG_DEFAULT_THREADS,
@@ -18,7 +19,9 @@ import {buildDataLayer} from "data";
 import {FilePresenter} from "file";
 import {addGlobalToState} from "geotools";
 import {buildOverviewPresenter} from "overview";
+import {ProgramChain} from "program_chain";
 import {buildReportPresenter} from "report";
+import {MemoryStore, ResultCache} from "result_cache";
 import {buildSimPresenter} from "sim_presenter";
 import {buildSliders} from "slider";
 
@@ -30,6 +33,11 @@ const SCROLL_REFRESH_MSG = [
     "Do you want to reload now?",
 ].join(" ");
 const REFRESH_LATER_MESSAGE = "When you refresh later, your changes will update.";
+const STATES_CACHE_SIZE = 10;
+const MAX_BATCH_YEARS = 10;
+const MAX_BATCHES_PER_WORKER = 1;
+const WORKER_QUEUE_CANCELLED = "cancelled";
+const INPUT_CHANGE_GROUP = "inputChange";
 
 
 /**
@@ -57,6 +65,9 @@ class Driver {
         self._disableDelay = disableDelay;
         self._lastYear = MAX_YEAR;
         self._polymerWorkerQueue = new PolymerWorkerQueue();
+        self._statesCache = new ResultCache(new MemoryStore(STATES_CACHE_SIZE));
+        self._businessAsUsualCache = new ResultCache(new MemoryStore(1));
+        self._programChain = new ProgramChain();
 
         self._historicYears = [];
         for (let year = HISTORY_START_YEAR; year < START_YEAR; year++) {
@@ -180,12 +191,15 @@ class Driver {
                     () => self._buildStateForCurrentYear(),
                     (x) => self._compileProgram(x),
                     (year) => self._onYearChange(year),
-                    (runPrograms, prePrograms, historicYears, projectionYears) => self._getStates(
-                        runPrograms,
-                        prePrograms,
-                        historicYears,
-                        projectionYears,
-                    ),
+                    (runPrograms, prePrograms, historicYears, projectionYears, requirements) => {
+                        return self._getStates(
+                            runPrograms,
+                            prePrograms,
+                            historicYears,
+                            projectionYears,
+                            requirements,
+                        );
+                    },
                 ),
             ];
 
@@ -213,6 +227,8 @@ class Driver {
                     self._leversByName.set(lever.getVariable(), lever);
                 });
 
+                self._invalidateStates();
+
                 document.getElementById("loading-indicator").style.display = "none";
                 self._getD3().select("#loaded")
                     .transition()
@@ -293,13 +309,97 @@ class Driver {
     /**
      * Build states for all years in the simulation tool.
      *
+     * Build states for all years in the simulation tool. Default runs (no optional arguments) are
+     * cached and requested in INPUT_CHANGE_GROUP such that they are cancelled if superseded by a
+     * later input change before completing. Business as usual runs are cached separately, keyed
+     * only by lever defaults, such that they are reused across slider changes until
+     * _invalidateStates is called.
+     *
+     * @param runPrograms True if the scripts should be run and false otherwise.
+     * @param prePrograms Optional array of programs to run prior to regular execution.
+     * @param historicYears Optional array of historic years to simulate.
+     * @param projectionYears Optional array of projection years to simulate.
+     * @param requirements Optional object with attrs and stages (see getGoalRequirements) limiting
+     *      what is calculated after levers run. Defaults to calculating everything.
+     * @returns Map from year to state Map for that year.
+     */
+    _getStates(runPrograms, prePrograms, historicYears, projectionYears, requirements) {
+        const self = this;
+
+        const isDefaultRun = [prePrograms, historicYears, projectionYears, requirements].every(
+            (x) => x === undefined,
+        );
+
+        if (!isDefaultRun) {
+            return self._getStatesUncached(
+                runPrograms,
+                prePrograms,
+                historicYears,
+                projectionYears,
+                undefined,
+                undefined,
+                requirements,
+            );
+        }
+
+        // Business as usual only sees lever defaults so slider moves do not change it.
+        const levers = self._getLevers();
+        const cache = runPrograms ? self._statesCache : self._businessAsUsualCache;
+        const key = runPrograms ? JSON.stringify({
+            "values": levers.map((lever) => [lever.getVariable(), lever.getValue()]),
+            "code": levers.map((lever) => lever.getCode()),
+        }) : JSON.stringify({
+            "defaults": levers.map((lever) => [lever.getVariable(), lever.getDefault()]),
+        });
+
+        const cached = cache.get(key);
+        if (cached !== null) {
+            cached["inspects"].forEach((inspects, lever) => lever.showInspects(inspects));
+            return Promise.resolve(cached["states"]);
+        }
+
+        const inspectsByLever = new Map();
+        const onInspects = (lever, inspects) => inspectsByLever.set(lever, inspects);
+
+        return self._getStatesUncached(
+            runPrograms,
+            prePrograms,
+            historicYears,
+            projectionYears,
+            onInspects,
+            INPUT_CHANGE_GROUP,
+        ).then((states) => {
+            cache.set(key, {"states": states, "inspects": inspectsByLever});
+            return states;
+        });
+    }
+
+    /**
+     * Discard all cached states such as after data or levers are (re)loaded.
+     */
+    _invalidateStates() {
+        const self = this;
+        self._statesCache.clear();
+        self._businessAsUsualCache.clear();
+        self._programChain.clear();
+    }
+
+    /**
+     * Build states for all years in the simulation tool without consulting the states cache.
+     *
      * @param runPrograms True if the scripts should be run and false otherwise.
      * @param prePrograms Optional array of programs to run prior to regular execution.
      * @param historicYears Optional array of historic years to simulate.
      * @param projectionYears Optional array of projection years to simulate.
+     * @param onInspects Optional callback taking a lever and its inspects for the final year.
+     * @param group Optional name of the worker queue group in which to request processing such
+     *      that it may be cancelled.
+     * @param requirements Optional object with attrs and stages limiting what is calculated
+     *      after levers run (see PolymerWorkerQueue.request).
      * @returns Map from year to state Map for that year.
      */
-    _getStates(runPrograms, prePrograms, historicYears, projectionYears) {
+    _getStatesUncached(runPrograms, prePrograms, historicYears, projectionYears, onInspects,
+        group, requirements) {
         const self = this;
 
         const getPrograms = () => {
@@ -326,9 +426,38 @@ class Driver {
         const historicStates = historicYearsResolved.map((year) => {
             return {"year": year, "state": self._buildState(year, runPrograms)};
         });
+        const reportInspects = (year, lever, inspects) => {
+            if (year === 2050) {
+                lever.showInspects(inspects);
+
+                if (onInspects !== undefined) {
+                    onInspects(lever, inspects);
+                }
+            }
+        };
+
+        // Without pre-programs, lever outputs only depend on inputs so checkpoints may be reused.
+        const steps = programs.map((programInfo) => {
+            const dependencies = programInfo["lever"].getDependencies();
+            return {
+                "program": programInfo["program"],
+                "reads": dependencies["reads"],
+                "writes": dependencies["writes"],
+                "stochastic": dependencies["stochastic"],
+            };
+        });
+        const useChain = runPrograms && preProgramsResolved.length == 0;
+
         const projectionStates = projectionYearsResolved.map((year) => {
             const state = self._buildState(year, runPrograms);
 
+            if (useChain) {
+                const result = self._programChain.run(year, state, steps, (i, inspects) => {
+                    reportInspects(year, programs[i]["lever"], inspects);
+                });
+                return {"year": year, "state": result};
+            }
+
             preProgramsResolved.forEach((program) => {
                 state.set("local", new Map());
                 state.set("inspect", []);
@@ -343,23 +472,16 @@ class Driver {
                 state.set("inspect", []);
                 program(state);
 
-                if (year === 2050) {
-                    const inspects = state.get("inspect");
-                    lever.showInspects(inspects);
-                }
+                reportInspects(year, lever, state.get("inspect"));
             });
 
             return {"year": year, "state": state};
         });
 
         const allStates = historicStates.concat(projectionStates);
-        const promises = allStates.map((task) => {
-            const year = task["year"];
-            const state = task["state"];
-            return self._polymerWorkerQueue.request(year, state);
-        });
+        const future = self._polymerWorkerQueue.request(allStates, group, requirements);
 
-        return Promise.all(promises).then((tasks) => {
+        return future.then((tasks) => {
             const states = new Map();
 
             tasks.forEach((task) => {
@@ -424,6 +546,9 @@ class Driver {
                 return;
             }
 
+            // Results from prior input changes are no longer needed.
+            self._polymerWorkerQueue.cancel(INPUT_CHANGE_GROUP);
+
             const businessAsUsualFuture = self._getStates(false);
             const withInterventionsFuture = self._getStates(true);
 
@@ -435,6 +560,10 @@ class Driver {
                     self._redrawTimeout = null;
                 })
                 .catch((error) => {
+                    if (error === WORKER_QUEUE_CANCELLED) {
+                        return;
+                    }
+
                     console.log(error);
                     alert("Whoops! The engine ran into an exception.");
                     throw error;
@@ -934,6 +1063,11 @@ function main(shouldPause, includeDevelopment, disableDelay) {
 
 /**
  * Facade which sends tasks to the queue potentially backed by web workers if available.
+ *
+ * Facade which sends tasks to the queue potentially backed by web workers if available. States
+ * with array-backed outputs are posted by transferring their buffers (see array_state.js) such
+ * that outputs are not structured cloned in either direction. The polymer matricies are loaded
+ * once on the main thread and sent to each worker as it starts.
  */
 class PolymerWorkerQueue {
     /**
@@ -942,7 +1076,11 @@ class PolymerWorkerQueue {
     constructor() {
         const self = this;
         self._workerRequestId = 0;
-        self._workerCallbacks = new Map();
+        self._workers = [];
+        self._workerLoads = [];
+        self._pendingBatches = [];
+        self._inFlightBatches = new Map();
+        self._activeRequests = new Set();
 
         const getWorkersEnabled = () => {
             const urlParams = new URLSearchParams(window.location.search);
@@ -953,103 +1091,239 @@ class PolymerWorkerQueue {
             }
         };
 
+        // Load matricies once on the main thread and share them with workers.
+        // eslint-disable-next-line no-undef
+        const matriciesFuture = buildMatricies();
+
+        const buildMainThreadModifier = () => {
+            // eslint-disable-next-line no-undef
+            self._modifierFuture = matriciesFuture.then((x) => new StateModifier(x));
+        };
+
         // Require that worker is supported and, for Safari, that network is available for
         // importScripts within the worker.
         self._workersFuture = new Promise((resolve) => {
-            const workers = [];
+            const workers = self._workers;
 
             if (!window.Worker || !window.navigator.onLine || !getWorkersEnabled()) {
                 console.log("Running without threads.");
-                self._modifierFuture = buildModifier();
+                buildMainThreadModifier();
                 resolve(workers);
                 return;
             }
 
             fetch("/js/version.txt").then((response) => {
-                if (response.ok) {
+                if (!response.ok) {
+                    buildMainThreadModifier();
+                    resolve(workers);
+                    return;
+                }
+
+                matriciesFuture.then((matricies) => {
+                    const matriciesMessage = matricies.toMessage();
                     const nativeConcurrency = window.navigator.hardwareConcurrency;
                     const hasKnownConcurrency = nativeConcurrency !== undefined;
                     const concurrencyAllowed = hasKnownConcurrency ? nativeConcurrency - 1 : 1;
                     const concurrencyCap = concurrencyAllowed > 5 ? 5 : concurrencyAllowed;
                     const concurrencyDesired = concurrencyCap < 1 ? 1 : concurrencyCap;
                     for (let i = 0; i < concurrencyDesired; i++) {
-                        workers.push(self._makeWorker());
+                        workers.push(self._makeWorker(matriciesMessage));
                     }
-                } else {
-                    self._modifierFuture = buildModifier();
-                }
-                resolve(workers);
+                    resolve(workers);
+                });
             });
         });
     }
 
     /**
-     * Request processing of a year and state.
+     * Request processing of states for a set of years.
+     *
+     * Request processing of states for a set of years where tasks are sorted by year and split
+     * into batches of contiguous years. Each batch is sent to a worker as a single message with
+     * one transferable buffer and batches are given to the least loaded worker as workers free
+     * up rather than assigned in a round-robin.
      *
-     * @param year The year like 2050 for which a state is provided.
-     * @param state The state object (Map) to process.
-     * @returns Promise which resolves when the object is processed.
+     * @param tasks Array of objects with year (like 2050) and state (Map) to process.
+     * @param group Optional name for the group of requests to which this belongs such that it may
+     *      be cancelled through cancel. Requests without a group cannot be cancelled.
+     * @param requirements Optional object with attrs (output attributes to sum into global) and
+     *      stages (StateModifier stages to run) like from getGoalRequirements when only goals are
+     *      needed. Defaults to all attributes and stages.
+     * @returns Promise which resolves to the processed tasks in year order or rejects with
+     *      WORKER_QUEUE_CANCELLED if cancelled.
      */
-    request(year, state) {
+    request(tasks, group, requirements) {
         const self = this;
 
+        const sortedTasks = tasks.slice();
+        sortedTasks.sort((a, b) => a["year"] - b["year"]);
+
+        const attrs = requirements === undefined ? ALL_ATTRS : requirements["attrs"];
+        const stages = requirements === undefined ? undefined : requirements["stages"];
+
         return self._workersFuture.then((workers) => {
             if (workers.length == 0) {
                 return self._modifierFuture.then((modifier) => {
-                    modifier.modify(year, state, ALL_ATTRS);
-                    return {"year": year, "state": state};
+                    sortedTasks.forEach((task) => {
+                        modifier.modify(task["year"], task["state"], attrs, stages);
+                    });
+                    return sortedTasks;
                 });
             }
 
-            const requestId = self._workerRequestId;
-            const workerId = requestId % workers.length;
+            if (sortedTasks.length == 0) {
+                return sortedTasks;
+            }
+
+            return new Promise((resolve, reject) => {
+                const requestInfo = {
+                    "group": group === undefined ? null : group,
+                    "attrs": attrs,
+                    "stages": stages,
+                    "results": new Array(sortedTasks.length),
+                    "remaining": 0,
+                    "resolve": resolve,
+                    "reject": reject,
+                };
+
+                const batchSizeEven = Math.ceil(sortedTasks.length / workers.length);
+                const batchSize = Math.min(MAX_BATCH_YEARS, batchSizeEven);
+                for (let start = 0; start < sortedTasks.length; start += batchSize) {
+                    self._pendingBatches.push({
+                        "request": requestInfo,
+                        "start": start,
+                        "tasks": sortedTasks.slice(start, start + batchSize),
+                    });
+                    requestInfo["remaining"]++;
+                }
+
+                self._activeRequests.add(requestInfo);
+                self._dispatch();
+            });
+        });
+    }
+
+    /**
+     * Cancel all outstanding requests in a group.
+     *
+     * Cancel all outstanding requests in a group, rejecting their promises with
+     * WORKER_QUEUE_CANCELLED. Batches not yet sent to a worker are dropped and results for
+     * batches already in flight are discarded when they arrive.
+     *
+     * @param group The name of the group to cancel like INPUT_CHANGE_GROUP.
+     */
+    cancel(group) {
+        const self = this;
+
+        const cancelled = Array.from(self._activeRequests).filter((x) => x["group"] === group);
+        cancelled.forEach((requestInfo) => {
+            self._removeRequest(requestInfo);
+            requestInfo["reject"](WORKER_QUEUE_CANCELLED);
+        });
+    }
+
+    /**
+     * Send pending batches to the least loaded workers until all workers are at capacity.
+     */
+    _dispatch() {
+        const self = this;
+
+        while (self._pendingBatches.length > 0) {
+            const minLoad = Math.min(...self._workerLoads);
+            if (minLoad >= MAX_BATCHES_PER_WORKER) {
+                return;
+            }
+
+            const workerId = self._workerLoads.indexOf(minLoad);
+            const batch = self._pendingBatches.shift();
+            const batchId = self._workerRequestId;
+            self._workerRequestId++;
+
+            // eslint-disable-next-line no-undef
+            const packed = packStatesForTransfer(batch["tasks"].map((x) => x["state"]));
 
             const requestObj = {
-                "year": year,
-                "state": state,
-                "requestId": requestId,
-                "attrs": ALL_ATTRS,
+                "batchId": batchId,
+                "years": batch["tasks"].map((x) => x["year"]),
+                "states": packed["states"],
+                "attrs": batch["request"]["attrs"],
+                "stages": batch["request"]["stages"],
             };
 
-            self._workerRequestId++;
+            self._inFlightBatches.set(batchId, batch);
+            self._workerLoads[workerId]++;
+            self._workers[workerId].postMessage(requestObj, packed["transfer"]);
+        }
+    }
 
-            return new Promise((resolve, reject) => {
-                self._workerCallbacks.set(requestId, {"resolve": resolve, "reject": reject});
-                workers[workerId].postMessage(requestObj);
-            });
-        });
+    /**
+     * Stop tracking a request, dropping any of its batches not yet sent to a worker.
+     *
+     * @param requestInfo The record for the request to remove.
+     */
+    _removeRequest(requestInfo) {
+        const self = this;
+        self._activeRequests.delete(requestInfo);
+        self._pendingBatches = self._pendingBatches.filter((x) => x["request"] !== requestInfo);
     }
 
     /**
      * Process a response from a worker.
      *
+     * @param workerId The index of the worker which sent the response.
      * @param response Response from worker thread.
      */
-    _onResponse(response) {
+    _onResponse(workerId, response) {
         const self = this;
-        const requestId = response["requestId"];
-        const year = response["year"];
-        if (!self._workerCallbacks.has(requestId)) {
-            return;
+        const batchId = response["batchId"];
+
+        self._workerLoads[workerId]--;
+
+        const batch = self._inFlightBatches.get(batchId);
+        self._inFlightBatches.delete(batchId);
+
+        const requestInfo = batch["request"];
+        if (!self._activeRequests.has(requestInfo)) {
+            self._dispatch();
+            return; // Cancelled or previously failed
         }
 
-        const callbacks = self._workerCallbacks.get(requestId);
         if (response["error"] === null) {
-            callbacks["resolve"]({"year": year, "state": response["state"]});
+            // eslint-disable-next-line no-undef
+            const states = unpackStatesFromTransfer(response["states"]);
+            const years = response["years"];
+            states.forEach((state, i) => {
+                requestInfo["results"][batch["start"] + i] = {"year": years[i], "state": state};
+            });
+
+            requestInfo["remaining"]--;
+            if (requestInfo["remaining"] == 0) {
+                self._removeRequest(requestInfo);
+                requestInfo["resolve"](requestInfo["results"]);
+            }
         } else {
-            callbacks["reject"](response["error"]);
+            self._removeRequest(requestInfo);
+            requestInfo["reject"](response["error"]);
         }
+
+        self._dispatch();
     }
 
     /**
      * Make a new web worker.
      *
+     * @param matriciesMessage The polymer matricies as serialized by PolymerMatricies.toMessage
+     *      which are sent to the worker before any batches.
      * @returns Newly constructed worker.
      */
-    _makeWorker() {
+    _makeWorker(matriciesMessage) {
         const self = this;
-        const newWorker = new Worker("/js/polymers.js");
-        newWorker.onmessage = (event) => self._onResponse(event.data);
+        const workerId = self._workerLoads.length;
+        self._workerLoads.push(0);
+
+        const newWorker = new Worker("/js/polymers.js?v=" + CACHE_BUSTER);
+        newWorker.onmessage = (event) => self._onResponse(workerId, event.data);
+        newWorker.postMessage({"matricies": matriciesMessage});
         return newWorker;
     }
 }
@@ -6,6 +6,9 @@
 
 import {ALL_REGIONS, CONSUMPTION_ATTRS, EOL_ATTRS} from "const";
 
+// Name of the StateModifier stage calculating GHG (see polymers.js) which requires polymers.
+const GHG_STAGE = "ghg";
+
 
 function getRegionOutput(state, region) {
     return state.get("out").get(region);
@@ -13,104 +16,105 @@ function getRegionOutput(state, region) {
 
 
 /**
- * Get the high level goal metrics.
+ * Make a goal which sums output attributes for a region.
  *
- * @param target The state object (Map) for a year to be modified.
- * @returns Map from name of metric to goal metric value.
+ * @param goal The name of the goal like totalWaste.
+ * @param attrs The output attributes to sum like eolLandfillMT.
+ * @returns Goal definition as used in GOALS.
  */
-function getGoals(target) {
-    const strategies = [
-        (state, region) => {
-            return {
-                "goal": "landfillWaste",
-                "value": getRegionOutput(state, region).get("eolLandfillMT"),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "mismanagedWaste",
-                "value": getRegionOutput(state, region).get("eolMismanagedMT"),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "incineratedWaste",
-                "value": getRegionOutput(state, region).get("eolIncinerationMT"),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "recycling",
-                "value": getRegionOutput(state, region).get("eolRecyclingMT"),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "productionEmissions",
-                "value": 123,
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "consumptionEmissions",
-                "value": 123,
-            };
-        },
-        (state, region) => {
-            const total = CONSUMPTION_ATTRS
+function makeAttrsGoal(goal, attrs) {
+    return {
+        "goal": goal,
+        "attrs": attrs,
+        "stages": [],
+        "getValue": (state, region) => {
+            return attrs
                 .map((x) => getRegionOutput(state, region).get(x))
                 .reduce((a, b) => a + b);
-
-            return {
-                "goal": "totalConsumption",
-                "value": total,
-            };
         },
-        (state, region) => {
-            const total = EOL_ATTRS
-                .map((x) => getRegionOutput(state, region).get(x))
-                .reduce((a, b) => a + b);
+    };
+}
 
-            return {
-                "goal": "totalWaste",
-                "value": total,
-            };
-        },
-        (state, region) => {
-            const getTotal = () => {
-                if (state.has("ghg")) {
-                    return state.get("ghg").get(region).get("overallGhg");
-                } else {
-                    return -1;
-                }
-            };
-
-            return {
-                "goal": "ghg",
-                "value": getTotal(),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "primaryProduction",
-                "value": getRegionOutput(state, region).get("primaryProductionMT"),
-            };
-        },
-        (state, region) => {
-            return {
-                "goal": "secondaryProduction",
-                "value": getRegionOutput(state, region).get("secondaryProductionMT"),
-            };
+
+/**
+ * Make a placeholder goal which reports a constant.
+ *
+ * @param goal The name of the goal like productionEmissions.
+ * @returns Goal definition as used in GOALS.
+ */
+function makePlaceholderGoal(goal) {
+    return {
+        "goal": goal,
+        "attrs": [],
+        "stages": [],
+        "getValue": (state, region) => 123,
+    };
+}
+
+
+// Goals along with the output attributes and modifier stages needed to calculate them
+const GOALS = [
+    makeAttrsGoal("landfillWaste", ["eolLandfillMT"]),
+    makeAttrsGoal("mismanagedWaste", ["eolMismanagedMT"]),
+    makeAttrsGoal("incineratedWaste", ["eolIncinerationMT"]),
+    makeAttrsGoal("recycling", ["eolRecyclingMT"]),
+    makePlaceholderGoal("productionEmissions"),
+    makePlaceholderGoal("consumptionEmissions"),
+    makeAttrsGoal("totalConsumption", CONSUMPTION_ATTRS),
+    makeAttrsGoal("totalWaste", EOL_ATTRS),
+    {
+        "goal": "ghg",
+        "attrs": [],
+        "stages": [GHG_STAGE],
+        "getValue": (state, region) => {
+            if (state.has("ghg")) {
+                return state.get("ghg").get(region).get("overallGhg");
+            } else {
+                return -1;
+            }
         },
-    ];
+    },
+    makeAttrsGoal("primaryProduction", ["primaryProductionMT"]),
+    makeAttrsGoal("secondaryProduction", ["secondaryProductionMT"]),
+];
+
+
+/**
+ * Get the definitions of goals by name.
+ *
+ * @param goalNames Optional array of goal names like ghg. Defaults to all goals.
+ * @returns Array of goal definitions from GOALS.
+ */
+function getGoalDefinitions(goalNames) {
+    if (goalNames === undefined) {
+        return GOALS;
+    }
+
+    return goalNames.map((goalName) => {
+        const definition = GOALS.find((x) => x["goal"] === goalName);
+        if (definition === undefined) {
+            throw "Unknown goal: " + goalName;
+        }
+        return definition;
+    });
+}
+
+
+/**
+ * Get the high level goal metrics.
+ *
+ * @param target The state object (Map) for a year to be modified.
+ * @param goalNames Optional array of goal names like ghg to calculate. Defaults to all goals.
+ * @returns Map from name of metric to goal metric value.
+ */
+function getGoals(target, goalNames) {
+    const definitions = getGoalDefinitions(goalNames);
 
     const goals = new Map();
     ALL_REGIONS.forEach((region) => {
-        const newValues = strategies.map((x) => x(target, region));
-
         const regionGoals = new Map();
-        newValues.forEach((newValue) => {
-            regionGoals.set(newValue["goal"], newValue["value"]);
+        definitions.forEach((definition) => {
+            regionGoals.set(definition["goal"], definition["getValue"](target, region));
         });
 
         goals.set(region, regionGoals);
@@ -120,4 +124,33 @@ function getGoals(target) {
 }
 
 
-export {getGoals};
+/**
+ * Determine what must be calculated after levers run in order to report goals.
+ *
+ * Determine what must be calculated after levers run in order to report goals such that states
+ * only used for goals (like in simulation trials) skip the rest. Global values are only needed
+ * for the attributes read by the goals and polymers / GHG only if a goal reads GHG. As the ghg
+ * goal only reads overallGhg, the detail stage is never required.
+ *
+ * @param goalNames Optional array of goal names like ghg. Defaults to all goals.
+ * @returns Object with attrs (output attributes to sum into global) and stages (StateModifier
+ *      stages to run like ghg).
+ */
+function getGoalRequirements(goalNames) {
+    const definitions = getGoalDefinitions(goalNames);
+
+    const attrs = new Set();
+    const stages = new Set();
+    definitions.forEach((definition) => {
+        definition["attrs"].forEach((attr) => attrs.add(attr));
+        definition["stages"].forEach((stage) => stages.add(stage));
+    });
+
+    return {
+        "attrs": Array.from(attrs),
+        "stages": Array.from(stages),
+    };
+}
+
+
+export {getGoalRequirements, getGoals};
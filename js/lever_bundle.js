@@ -0,0 +1,89 @@
+/**
+ * Logic for loading the pre-rendered bundle of plastics language programs.
+ *
+ * Logic for loading the pre-rendered bundle of plastics language programs written by
+ * support/render_bundle.py such that templates do not need to be fetched and rendered one by one.
+ * The bundle holds rendered source so programs are still parsed and compiled when loaded.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import {CACHE_BUSTER} from "const";
+import {fetchWithRetry} from "file";
+
+let bundleFuture = null;
+
+
+/**
+ * Collection of pre-rendered plastics language programs.
+ */
+class LeverBundle {
+    /**
+     * Create a new record of a bundle.
+     *
+     * @param hash Hash of the contents of the bundle.
+     * @param levers Object mapping from lever variable name like chinaPercentReducePs to the
+     *      plastics language source rendered for that lever.
+     * @param files Object mapping from filename like simulation.pt to source for programs used
+     *      without templating.
+     */
+    constructor(hash, levers, files) {
+        const self = this;
+        self._hash = hash;
+        self._levers = levers;
+        self._files = files;
+    }
+
+    /**
+     * Get the hash which changes when any program in the bundle changes.
+     *
+     * @returns Hex string.
+     */
+    getHash() {
+        const self = this;
+        return self._hash;
+    }
+
+    /**
+     * Get the rendered source for a lever.
+     *
+     * @param variable The name of the variable controlled by the lever like chinaPercentReducePs.
+     * @returns The plastics language source or null if the lever is not in the bundle.
+     */
+    getLeverCode(variable) {
+        const self = this;
+        const code = self._levers[variable];
+        return code === undefined ? null : code;
+    }
+
+    /**
+     * Get the source for a program used without templating.
+     *
+     * @param filename The name of the file like sim_bau.pt.
+     * @returns The plastics language source or null if the file is not in the bundle.
+     */
+    getFileCode(filename) {
+        const self = this;
+        const code = self._files[filename];
+        return code === undefined ? null : code;
+    }
+}
+
+
+/**
+ * Get the bundle of programs, fetching it only once per page load.
+ *
+ * @returns Promise resolving to the LeverBundle.
+ */
+function getLeverBundle() {
+    if (bundleFuture === null) {
+        bundleFuture = fetchWithRetry("/pt/bundle.json?v=" + CACHE_BUSTER)
+            .then((response) => response.json())
+            .then((raw) => new LeverBundle(raw["hash"], raw["levers"], raw["files"]));
+    }
+
+    return bundleFuture;
+}
+
+
+export {getLeverBundle, LeverBundle};
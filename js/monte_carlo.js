@@ -0,0 +1,270 @@
+/**
+ * Logic for running monte carlo trials and summarizing their results as they complete.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import {RunningStats} from "running_stats";
+
+const TRIALS_PER_WORKER = 4;
+
+
+/**
+ * Executor which keeps a pool of trials in flight, starting a new trial as each completes.
+ *
+ * Executor which keeps a pool of trials in flight, starting a new trial as each completes instead
+ * of waiting on a timer between fixed size chunks. Trials are expected to hand their expensive
+ * work to the polymer web workers such that the pool keeps every worker busy while the main
+ * thread only handles one completed trial at a time.
+ */
+class MonteCarloExecutor {
+    /**
+     * Create a new executor.
+     *
+     * @param executeTrial Function taking the index of a trial and returning a promise resolving
+     *      to that trial's results.
+     * @param concurrency Optional maximum number of trials in flight. Defaults to a multiple of
+     *      the number of workers available (see getDefaultConcurrency).
+     */
+    constructor(executeTrial, concurrency) {
+        const self = this;
+        self._executeTrial = executeTrial;
+        self._concurrency = concurrency === undefined ? getDefaultConcurrency() : concurrency;
+    }
+
+    /**
+     * Run trials.
+     *
+     * @param count The number of trials to run.
+     * @param onTrial Callback taking the results of a trial and its index, called in completion
+     *      order (which may differ from index order).
+     * @param onProgress Optional callback taking the number of trials completed so far.
+     * @returns Promise which resolves to the number of trials completed after all trials finish
+     *      or rejects with the first error encountered.
+     */
+    run(count, onTrial, onProgress) {
+        const self = this;
+        return self._runRange(0, count, onTrial, onProgress);
+    }
+
+    /**
+     * Run trials in rounds until a stopping condition is met or a maximum number of trials.
+     *
+     * Run trials in rounds of a fixed size, checking whether to stop only after a round finishes
+     * such that the trials included (indices 0 through count - 1) do not depend on the order in
+     * which trials complete. This lets a seeded run reproduce the same trials.
+     *
+     * @param maxCount The maximum number of trials to run.
+     * @param roundSize The number of trials between checks of shouldStop.
+     * @param onTrial Callback taking the results of a trial and its index, called in completion
+     *      order (which may differ from index order).
+     * @param shouldStop Function taking the number of trials completed and returning true if no
+     *      further rounds are required.
+     * @param onProgress Optional callback taking the number of trials completed so far.
+     * @returns Promise which resolves to the number of trials completed or rejects with the first
+     *      error encountered.
+     */
+    runAdaptive(maxCount, roundSize, onTrial, shouldStop, onProgress) {
+        const self = this;
+
+        const runRound = (start) => {
+            if (start >= maxCount || (start > 0 && shouldStop(start))) {
+                return Promise.resolve(start);
+            }
+
+            const end = Math.min(start + roundSize, maxCount);
+            return self._runRange(start, end, onTrial, onProgress).then(() => runRound(end));
+        };
+
+        return runRound(0);
+    }
+
+    /**
+     * Run the trials with indices in a range.
+     *
+     * @param start The index of the first trial to run (inclusive).
+     * @param end The index after the last trial to run (exclusive).
+     * @param onTrial Callback taking the results of a trial and its index.
+     * @param onProgress Optional callback taking the number of trials completed so far including
+     *      those before start.
+     * @returns Promise which resolves to end after all trials in the range finish or rejects with
+     *      the first error encountered.
+     */
+    _runRange(start, end, onTrial, onProgress) {
+        const self = this;
+        const count = end - start;
+
+        return new Promise((resolve, reject) => {
+            let started = 0;
+            let completed = 0;
+            let failed = false;
+
+            const startNext = () => {
+                if (failed || started >= count) {
+                    return;
+                }
+
+                const index = start + started;
+                started++;
+
+                self._executeTrial(index).then((result) => {
+                    if (failed) {
+                        return;
+                    }
+
+                    completed++;
+                    onTrial(result, index);
+
+                    if (onProgress !== undefined) {
+                        onProgress(start + completed);
+                    }
+
+                    if (completed == count) {
+                        resolve(end);
+                    } else {
+                        startNext();
+                    }
+                }, (error) => {
+                    if (!failed) {
+                        failed = true;
+                        reject(error);
+                    }
+                });
+            };
+
+            if (count <= 0) {
+                resolve(end);
+                return;
+            }
+
+            const initialCount = Math.min(self._concurrency, count);
+            for (let i = 0; i < initialCount; i++) {
+                startNext();
+            }
+        });
+    }
+}
+
+
+/**
+ * Online summary of trial results by series, region, and variable.
+ *
+ * Online summary of trial results by series, region, and variable which keeps a running mean and
+ * standard deviation for each instead of every trial's results.
+ */
+class MonteCarloSummary {
+    /**
+     * Create a new empty summary.
+     */
+    constructor() {
+        const self = this;
+        self._stats = new Map();
+    }
+
+    /**
+     * Add the results of a trial.
+     *
+     * @param record Map from region to Map from variable to value along with series (the label for
+     *      the trial) and, optionally, region which are not summarized.
+     */
+    add(record) {
+        const self = this;
+
+        record.forEach((regionRecord, region) => {
+            const series = regionRecord.get("series");
+            const variables = Array.of(...regionRecord.keys())
+                .filter((x) => x !== "series")
+                .filter((x) => x !== "region");
+
+            variables.forEach((variable) => {
+                const key = [series, region, variable].join("\t");
+                if (!self._stats.has(key)) {
+                    self._stats.set(key, {
+                        "series": series,
+                        "region": region,
+                        "variable": variable,
+                        "stats": new RunningStats(),
+                    });
+                }
+                self._stats.get(key)["stats"].add(regionRecord.get(variable));
+            });
+        });
+    }
+
+    /**
+     * Get the summary records.
+     *
+     * @returns Array of objects with series, region, variable, mean, std (population standard
+     *      deviation), and count (number of trials) in the order in which they were first
+     *      observed.
+     */
+    getRecords() {
+        const self = this;
+
+        return Array.of(...self._stats.values()).map((entry) => {
+            return {
+                "series": entry["series"],
+                "region": entry["region"],
+                "variable": entry["variable"],
+                "mean": entry["stats"].getMean(),
+                "std": entry["stats"].getStd(),
+                "count": entry["stats"].getCount(),
+            };
+        });
+    }
+
+    /**
+     * Get the precision achieved for a series.
+     *
+     * Get the precision achieved for a series as the widest confidence interval for the mean of
+     * any tracked goal relative to the magnitude of that mean.
+     *
+     * @param series The label for the trials like baseline.
+     * @param z The number of standard errors on either side of the mean like 1.96 for 95%.
+     * @param isTracked Optional function taking a region and variable and returning true if that
+     *      goal should be considered. Defaults to considering all goals.
+     * @returns The largest half width of a confidence interval divided by the absolute value of
+     *      its mean like 0.01 for +/- 1%. Infinity if a goal has fewer than two trials or a mean
+     *      of zero with spread. Zero if no goals are tracked.
+     */
+    getPrecision(series, z, isTracked) {
+        const self = this;
+
+        const entries = Array.of(...self._stats.values())
+            .filter((entry) => entry["series"] === series)
+            .filter((entry) => {
+                return isTracked === undefined || isTracked(entry["region"], entry["variable"]);
+            });
+
+        const precisions = entries.map((entry) => {
+            const halfWidth = entry["stats"].getStdError() * z;
+            const magnitude = Math.abs(entry["stats"].getMean());
+            if (halfWidth == 0) {
+                return 0;
+            } else if (magnitude == 0) {
+                return Infinity;
+            } else {
+                return halfWidth / magnitude;
+            }
+        });
+
+        return precisions.reduce((a, b) => Math.max(a, b), 0);
+    }
+}
+
+
+/**
+ * Determine how many trials to keep in flight.
+ *
+ * @returns Number of trials which keeps all of the workers allowed by hardwareConcurrency busy.
+ */
+function getDefaultConcurrency() {
+    const nativeConcurrency = window.navigator.hardwareConcurrency;
+    const hasKnownConcurrency = nativeConcurrency !== undefined;
+    const workersAllowed = hasKnownConcurrency ? nativeConcurrency - 1 : 1;
+    const workers = workersAllowed < 1 ? 1 : workersAllowed;
+    return workers * TRIALS_PER_WORKER;
+}
+
+
+export {MonteCarloExecutor, MonteCarloSummary};
@@ -8,8 +8,11 @@
  */
 
 
-// Create a separate cache buster for the worker
-const CACHE_BUSTER = Date.now();
+// Use the version given in the worker URL (see PolymerWorkerQueue) or bust the cache if none
+const CACHE_VERSION = typeof location === "undefined" ?
+    null :
+    new URLSearchParams(location.search).get("v");
+const CACHE_BUSTER = CACHE_VERSION === null ? Date.now() : CACHE_VERSION;
 
 // Define expected attributes of final products and their associated polymer pipeline types
 const GOODS = [
@@ -97,6 +100,48 @@ const ADDITIVES_POLYMER = "additives";
 // Allowed final imprecision due to floating point operations or other smoothing.
 const ALLOWED_IMPRECISION = 1;
 
+// Stages of StateModifier.modify which may be requested where ghg requires polymers. The detail
+// stage keeps intermediate values (trade, polymer vectors, GHG components) after ghg runs.
+const POLYMERS_STAGE = "polymers";
+const GHG_STAGE = "ghg";
+const DETAIL_STAGE = "detail";
+const MODIFIER_STAGES = [POLYMERS_STAGE, GHG_STAGE, DETAIL_STAGE];
+
+// Keys of a state which only hold intermediate values for polymers and GHG, kept with detail.
+const GHG_INTERMEDIATE_KEYS = ["polymerOverrides", "trade", "tradeNormalization"];
+
+
+// Cache of names built by joinName from a prefix to a Map from suffix to the joined name.
+const JOINED_NAMES = new Map();
+
+
+/**
+ * Join a prefix and suffix into a name like chinaPercentReducePs.
+ *
+ * Join a prefix and suffix into a name like chinaPercentReducePs where the string is built on
+ * the first request and reused afterwards such that modifying a state does not concatenate
+ * strings for each year.
+ *
+ * @param prefix The start of the name like china.
+ * @param suffix The end of the name like PercentReducePs.
+ * @returns The joined name.
+ */
+function joinName(prefix, suffix) {
+    let prefixNames = JOINED_NAMES.get(prefix);
+    if (prefixNames === undefined) {
+        prefixNames = new Map();
+        JOINED_NAMES.set(prefix, prefixNames);
+    }
+
+    let name = prefixNames.get(suffix);
+    if (name === undefined) {
+        name = prefix + suffix;
+        prefixNames.set(suffix, name);
+    }
+
+    return name;
+}
+
 
 /**
  * Make a string key representing the identity of an object.
@@ -370,38 +415,55 @@ function getResinTradeKey(year, region) {
 }
 
 
+/**
+ * Get the value used for a name in place of string keys.
+ *
+ * @param name The name like China where lookups are case insensitive.
+ * @returns Lowercase string identifying the name.
+ */
+function getInternKey(name) {
+    return (name + "").toLowerCase();
+}
+
+
 /**
  * Collection of matricies for subtypes and their polymers.
+ *
+ * Collection of matricies for subtypes and their polymers stored as dense Float64Array tensors
+ * indexed by integer ids for region, subtype, polymer, and year. Lookups find ids through Maps
+ * from names to ids and then use offset arithmetic such that no string keys are built. Missing
+ * records hold NaN. These tensors can be sent to workers without rebuilding (see toMessage).
  */
 class PolymerMatricies {
     /**
-     * Create a new empty set of matricies.
+     * Create a new set of matricies around tensors.
+     *
+     * @param tensors Object with the names for each dimension (regions, subtypes, polymers,
+     *      series, years) and the tensors (polymerPercents, polymerSeries, subtypeRatios,
+     *      netImportResin) as built by PolymerMatriciesBuilder.
      */
-    constructor() {
+    constructor(tensors) {
         const self = this;
-        self._polymerInfos = new Map();
-        self._subtypeInfos = new Map();
-        self._resinTradeInfos = new Map();
+        self._tensors = tensors;
 
-        self._subtypes = new Set();
-        self._years = new Set();
-        self._regions = new Set();
-        self._polymers = new Set();
-        self._series = new Set();
-    }
+        self._regionIds = self._makeIds(tensors["regions"]);
+        self._subtypeIds = self._makeIds(tensors["subtypes"]);
+        self._polymerIds = self._makeIds(tensors["polymers"]);
+        self._yearIds = self._makeIds(tensors["years"]);
 
-    /**
-     * Add information about a polymer within a subtype.
-     *
-     * @param target New PolymerInfo object to register.
-     */
-    addPolymer(target) {
-        const self = this;
-        self._polymerInfos.set(target.getKey(), target);
-        self._subtypes.add(target.getSubtype());
-        self._regions.add(target.getRegion());
-        self._polymers.add(target.getPolymer());
-        self._series.add(target.getSeries());
+        self._numRegions = tensors["regions"].length;
+        self._numSubtypes = tensors["subtypes"].length;
+        self._numPolymers = tensors["polymers"].length;
+
+        self._polymerPercents = tensors["polymerPercents"];
+        self._polymerSeries = tensors["polymerSeries"];
+        self._subtypeRatios = tensors["subtypeRatios"];
+        self._netImportResin = tensors["netImportResin"];
+
+        self._subtypes = new Set(tensors["subtypes"]);
+        self._regions = new Set(tensors["regions"]);
+        self._polymers = new Set(tensors["polymers"]);
+        self._series = new Set(tensors["series"]);
     }
 
     /**
@@ -410,25 +472,25 @@ class PolymerMatricies {
      * @param region The region like eu30 case insensitive.
      * @param subtype The subtype like transportation case insensitive.
      * @param polymer The name of the polymer like pur case insensitive.
-     * @returns Corresponding PolymerInfo object.
+     * @returns Corresponding PolymerInfo object or undefined if not found.
      */
     getPolymer(region, subtype, polymer) {
         const self = this;
-        const key = getPolymerKey(region, subtype, polymer);
-        return self._polymerInfos.get(key);
-    }
+        const regionId = self._getId(self._regionIds, region);
+        const subtypeId = self._getId(self._subtypeIds, subtype);
+        const polymerId = self._getId(self._polymerIds, polymer);
+        const offset = self._getPolymerOffset(regionId, subtypeId, polymerId);
+        if (offset === -1 || isNaN(self._polymerPercents[offset])) {
+            return undefined;
+        }
 
-    /**
-     * Add information about a subtype.
-     *
-     * @param target New SubtypeInfo object to register.
-     */
-    addSubtype(target) {
-        const self = this;
-        self._subtypeInfos.set(target.getKey(), target);
-        self._years.add(target.getYear());
-        self._regions.add(target.getRegion());
-        self._subtypes.add(target.getSubtype());
+        return new PolymerInfo(
+            self._tensors["subtypes"][subtypeId],
+            self._tensors["regions"][regionId],
+            self._tensors["polymers"][polymerId],
+            self._polymerPercents[offset],
+            self._tensors["series"][self._polymerSeries[offset]],
+        );
     }
 
     /**
@@ -437,24 +499,24 @@ class PolymerMatricies {
      * @param year The year for which subtype info is requested like 2050.
      * @param region The region in which subtype info is requested like nafta case insensitive.
      * @param subtype The subtype like transportation case insensitive.
-     * @returns SubtypeInfo object.
+     * @returns SubtypeInfo object or undefined if not found.
      */
     getSubtype(year, region, subtype) {
         const self = this;
-        const key = getSubtypeKey(year, region, subtype);
-        return self._subtypeInfos.get(key);
-    }
+        const yearId = self._getId(self._yearIds, year);
+        const regionId = self._getId(self._regionIds, region);
+        const subtypeId = self._getId(self._subtypeIds, subtype);
+        const offset = self._getSubtypeOffset(yearId, regionId, subtypeId);
+        if (offset === -1 || isNaN(self._subtypeRatios[offset])) {
+            return undefined;
+        }
 
-    /**
-     * Add information about resin trade.
-     *
-     * @param target New ResinTrade object to register.
-     */
-    addResinTrade(target) {
-        const self = this;
-        self._resinTradeInfos.set(target.getKey(), target);
-        self._years.add(target.getYear());
-        self._regions.add(target.getRegion());
+        return new SubtypeInfo(
+            self._tensors["years"][yearId],
+            self._tensors["regions"][regionId],
+            self._tensors["subtypes"][subtypeId],
+            self._subtypeRatios[offset],
+        );
     }
 
     /**
@@ -462,12 +524,22 @@ class PolymerMatricies {
      *
      * @param year The year for which net resin trade is desired like 2050.
      * @param region The region for which net resin trade is desired like row case insensitive.
-     * @returns New ResinTrade object.
+     * @returns New ResinTrade object or undefined if not found.
      */
     getResinTrade(year, region) {
         const self = this;
-        const key = getResinTradeKey(year, region);
-        return self._resinTradeInfos.get(key);
+        const yearId = self._getId(self._yearIds, year);
+        const regionId = self._getId(self._regionIds, region);
+        const offset = self._getResinTradeOffset(yearId, regionId);
+        if (offset === -1 || isNaN(self._netImportResin[offset])) {
+            return undefined;
+        }
+
+        return new ResinTrade(
+            self._tensors["years"][yearId],
+            self._tensors["regions"][regionId],
+            self._netImportResin[offset],
+        );
     }
 
     /**
@@ -509,6 +581,252 @@ class PolymerMatricies {
         const self = this;
         return self._series;
     }
+
+    /**
+     * Serialize these matricies such that they can be sent to workers.
+     *
+     * Serialize these matricies by returning their tensors which are backed by a
+     * SharedArrayBuffer when available (see makeShareableArray) such that workers read the same
+     * memory instead of receiving copies.
+     *
+     * @returns Object which can be structured cloned and given to
+     *      buildPolymerMatriciesFromMessage.
+     */
+    toMessage() {
+        const self = this;
+        return self._tensors;
+    }
+
+    /**
+     * Build the Map from names to ids for a dimension.
+     *
+     * @param names The names in id order like the regions.
+     * @returns Map from both the name and its lowercase form to the index of the name.
+     */
+    _makeIds(names) {
+        const self = this;
+        const ids = new Map();
+        names.forEach((name, i) => {
+            ids.set(getInternKey(name), i);
+            ids.set(name, i);
+        });
+        return ids;
+    }
+
+    /**
+     * Get the id for a name within a dimension.
+     *
+     * @param ids The Map from names to ids for the dimension (see _makeIds).
+     * @param name The name like China case insensitive.
+     * @returns The id or -1 if not found.
+     */
+    _getId(ids, name) {
+        const self = this;
+        const id = ids.get(name);
+        if (id !== undefined) {
+            return id;
+        }
+
+        const idNormalized = ids.get(getInternKey(name));
+        return idNormalized === undefined ? -1 : idNormalized;
+    }
+
+    /**
+     * Get the position of a polymer within the polymer tensors.
+     *
+     * @param regionId The id of the region (see _getId).
+     * @param subtypeId The id of the subtype.
+     * @param polymerId The id of the polymer.
+     * @returns Offset into polymerPercents and polymerSeries or -1 if an id is -1.
+     */
+    _getPolymerOffset(regionId, subtypeId, polymerId) {
+        const self = this;
+        if (regionId === -1 || subtypeId === -1 || polymerId === -1) {
+            return -1;
+        }
+
+        return (regionId * self._numSubtypes + subtypeId) * self._numPolymers + polymerId;
+    }
+
+    /**
+     * Get the position of a subtype within the subtype tensor.
+     *
+     * @param yearId The id of the year (see _getId).
+     * @param regionId The id of the region.
+     * @param subtypeId The id of the subtype.
+     * @returns Offset into subtypeRatios or -1 if an id is -1.
+     */
+    _getSubtypeOffset(yearId, regionId, subtypeId) {
+        const self = this;
+        if (yearId === -1 || regionId === -1 || subtypeId === -1) {
+            return -1;
+        }
+
+        return (yearId * self._numRegions + regionId) * self._numSubtypes + subtypeId;
+    }
+
+    /**
+     * Get the position of a year and region within the resin trade tensor.
+     *
+     * @param yearId The id of the year (see _getId).
+     * @param regionId The id of the region.
+     * @returns Offset into netImportResin or -1 if an id is -1.
+     */
+    _getResinTradeOffset(yearId, regionId) {
+        const self = this;
+        if (yearId === -1 || regionId === -1) {
+            return -1;
+        }
+
+        return yearId * self._numRegions + regionId;
+    }
+}
+
+
+/**
+ * Builder which collects records before packing them into PolymerMatricies.
+ */
+class PolymerMatriciesBuilder {
+    /**
+     * Create a new builder without any records.
+     */
+    constructor() {
+        const self = this;
+        self._polymerInfos = new Map();
+        self._subtypeInfos = new Map();
+        self._resinTradeInfos = new Map();
+
+        self._subtypes = new Map();
+        self._years = new Map();
+        self._regions = new Map();
+        self._polymers = new Map();
+        self._series = new Map();
+    }
+
+    /**
+     * Add information about a polymer within a subtype.
+     *
+     * @param target New PolymerInfo object to register.
+     */
+    addPolymer(target) {
+        const self = this;
+        self._polymerInfos.set(target.getKey(), target);
+        self._intern(self._subtypes, target.getSubtype());
+        self._intern(self._regions, target.getRegion());
+        self._intern(self._polymers, target.getPolymer());
+        self._intern(self._series, target.getSeries());
+    }
+
+    /**
+     * Add information about a subtype.
+     *
+     * @param target New SubtypeInfo object to register.
+     */
+    addSubtype(target) {
+        const self = this;
+        self._subtypeInfos.set(target.getKey(), target);
+        self._intern(self._years, target.getYear());
+        self._intern(self._regions, target.getRegion());
+        self._intern(self._subtypes, target.getSubtype());
+    }
+
+    /**
+     * Add information about resin trade.
+     *
+     * @param target New ResinTrade object to register.
+     */
+    addResinTrade(target) {
+        const self = this;
+        self._resinTradeInfos.set(target.getKey(), target);
+        self._intern(self._years, target.getYear());
+        self._intern(self._regions, target.getRegion());
+    }
+
+    /**
+     * Pack the records added into dense tensors.
+     *
+     * @returns Newly built PolymerMatricies where records added with the same key (case
+     *      insensitive) keep the last added.
+     */
+    build() {
+        const self = this;
+
+        const getNames = (target) => Array.from(target.values());
+        const regions = getNames(self._regions);
+        const subtypes = getNames(self._subtypes);
+        const polymers = getNames(self._polymers);
+        const series = getNames(self._series);
+        const years = getNames(self._years);
+
+        const indices = new Map([
+            self._regions,
+            self._subtypes,
+            self._polymers,
+            self._series,
+            self._years,
+        ].map((target) => [target, new Map(Array.from(target.keys()).map((x, i) => [x, i]))]));
+        const getId = (target, name) => indices.get(target).get(getInternKey(name));
+        const makeFilled = (ArrayType, length, value) => {
+            const result = makeShareableArray(ArrayType, length);
+            result.fill(value);
+            return result;
+        };
+
+        const numPolymerCells = regions.length * subtypes.length * polymers.length;
+        const polymerPercents = makeFilled(Float64Array, numPolymerCells, NaN);
+        const polymerSeries = makeFilled(Int32Array, numPolymerCells, -1);
+        self._polymerInfos.forEach((info) => {
+            const regionId = getId(self._regions, info.getRegion());
+            const subtypeId = getId(self._subtypes, info.getSubtype());
+            const polymerId = getId(self._polymers, info.getPolymer());
+            const offset = (regionId * subtypes.length + subtypeId) * polymers.length + polymerId;
+            polymerPercents[offset] = info.getPercent();
+            polymerSeries[offset] = getId(self._series, info.getSeries());
+        });
+
+        const numSubtypeCells = years.length * regions.length * subtypes.length;
+        const subtypeRatios = makeFilled(Float64Array, numSubtypeCells, NaN);
+        self._subtypeInfos.forEach((info) => {
+            const yearId = getId(self._years, info.getYear());
+            const regionId = getId(self._regions, info.getRegion());
+            const subtypeId = getId(self._subtypes, info.getSubtype());
+            const offset = (yearId * regions.length + regionId) * subtypes.length + subtypeId;
+            subtypeRatios[offset] = info.getRatio();
+        });
+
+        const netImportResin = makeFilled(Float64Array, years.length * regions.length, NaN);
+        self._resinTradeInfos.forEach((info) => {
+            const yearId = getId(self._years, info.getYear());
+            const regionId = getId(self._regions, info.getRegion());
+            netImportResin[yearId * regions.length + regionId] = info.getNetImportResin();
+        });
+
+        return new PolymerMatricies({
+            "regions": regions,
+            "subtypes": subtypes,
+            "polymers": polymers,
+            "series": series,
+            "years": years,
+            "polymerPercents": polymerPercents,
+            "polymerSeries": polymerSeries,
+            "subtypeRatios": subtypeRatios,
+            "netImportResin": netImportResin,
+        });
+    }
+
+    /**
+     * Record a name for a dimension if not already seen.
+     *
+     * @param target Map from lowercase name to the first form of the name seen.
+     * @param name The name like China.
+     */
+    _intern(target, name) {
+        const self = this;
+        const key = getInternKey(name);
+        if (!target.has(key)) {
+            target.set(key, name);
+        }
+    }
 }
 
 
@@ -603,6 +921,48 @@ class ImmutablePolymerMatricies {
         const self = this;
         return self._inner.getSeries();
     }
+
+    /**
+     * Serialize these matricies such that they can be sent to workers.
+     *
+     * @returns Object which can be structured cloned and given to
+     *      buildPolymerMatriciesFromMessage.
+     */
+    toMessage() {
+        const self = this;
+        return self._inner.toMessage();
+    }
+}
+
+
+/**
+ * Allocate a numeric array which may be shared with workers without copying.
+ *
+ * Allocate a numeric array backed by a SharedArrayBuffer if available or an ArrayBuffer
+ * otherwise. Browsers only offer SharedArrayBuffer on cross origin isolated pages so, elsewhere,
+ * each worker receives its own copy when the array is posted.
+ *
+ * @param ArrayType The typed array constructor like Float64Array.
+ * @param length The number of elements.
+ * @returns Newly allocated typed array filled with zeros.
+ */
+function makeShareableArray(ArrayType, length) {
+    const isolated = typeof crossOriginIsolated === "undefined" || crossOriginIsolated;
+    const canShare = typeof SharedArrayBuffer !== "undefined" && isolated;
+    const byteLength = length * ArrayType.BYTES_PER_ELEMENT;
+    const buffer = canShare ? new SharedArrayBuffer(byteLength) : new ArrayBuffer(byteLength);
+    return new ArrayType(buffer);
+}
+
+
+/**
+ * Rebuild matricies from a message created by PolymerMatricies.toMessage.
+ *
+ * @param message The message as received by a worker.
+ * @returns ImmutablePolymerMatricies reading the tensors in the message without copying them.
+ */
+function buildPolymerMatriciesFromMessage(message) {
+    return new ImmutablePolymerMatricies(new PolymerMatricies(message));
 }
 
 
@@ -626,31 +986,81 @@ class StateModifier {
      * @param year The year that the state object represents.
      * @param state The state object (Map) to modify. This will be modified in place.
      * @param attrs The attributes to include in global calculation.
+     * @param stages Optional array of stages (see MODIFIER_STAGES) to calculate like when only
+     *      some outputs are needed (see getGoalRequirements in goals.js). The ghg stage also runs
+     *      the polymers stage on which it depends but, without the detail stage, only overallGhg
+     *      is kept. Defaults to all stages.
      * @returns Modified state object which is the input state modified in place.
      */
-    modify(year, state, attrs) {
+    modify(year, state, attrs, stages) {
         const self = this;
 
-        // Make override
-        self._addOverrides(state, year);
+        const stagesEffective = stages === undefined ? MODIFIER_STAGES : stages;
+        const includeGhg = stagesEffective.indexOf(GHG_STAGE) != -1;
+        const requestedPolymers = stagesEffective.indexOf(POLYMERS_STAGE) != -1;
+        const includePolymers = includeGhg || requestedPolymers;
+        const includeDetail = stagesEffective.indexOf(DETAIL_STAGE) != -1;
 
-        // Prepare polymers
-        self._addDetailedTrade(year, state);
-        self._normalizeDetailedTrade(year, state);
-        self._calculatePolymers(year, state);
+        if (includePolymers) {
+            // Make override
+            self._addOverrides(state, year);
 
-        // Deal with resin trade reflowing into goods trade
-        self._balanceProduction(year, state);
-        self._getOverallTrade(year, state);
+            // Prepare polymers
+            self._addDetailedTrade(year, state);
+            self._normalizeDetailedTrade(year, state);
+            self._calculatePolymers(year, state);
+
+            // Deal with resin trade reflowing into goods trade
+            self._balanceProduction(year, state);
+            self._getOverallTrade(year, state);
+        }
 
-        // Prepare GHG
-        self._makeGhgInState(state);
-        self._calculateStartOfLifeGhg(state);
-        self._calculateEndOfLifeGhg(state);
+        if (includeGhg) {
+            // Prepare GHG
+            self._makeGhgInState(state);
+            self._calculateStartOfLifeGhg(state);
+            self._calculateEndOfLifeGhg(state);
+        }
 
         // Create summation
         self._addOutputGlobalToStateAttrs(state, attrs);
-        self._calculateOverallGhg(year, state);
+
+        if (includeGhg) {
+            self._calculateOverallGhg(year, state);
+
+            if (!includeDetail) {
+                self._removeGhgDetail(state, requestedPolymers);
+            }
+        }
+
+        return state;
+    }
+
+    /**
+     * Remove values which were only needed to calculate overall GHG.
+     *
+     * Remove values which were only needed to calculate overall GHG such that states for which
+     * only goals are needed (like in simulation trials) do not carry trade, polymer vectors, and
+     * GHG components back from workers.
+     *
+     * @param state The state object (Map) from which to remove the detail. Modified in place.
+     * @param keepPolymers If true, keep the polymer vectors as they were requested.
+     * @returns Modified state object (Map).
+     */
+    _removeGhgDetail(state, keepPolymers) {
+        const self = this;
+
+        GHG_INTERMEDIATE_KEYS.forEach((key) => state.delete(key));
+
+        if (!keepPolymers) {
+            state.delete("polymers");
+        }
+
+        const ghgInfo = state.get("ghg");
+        Array.of(...ghgInfo.keys()).forEach((region) => {
+            const overallGhg = ghgInfo.get(region).get("overallGhg");
+            ghgInfo.set(region, new Map([["overallGhg", overallGhg]]));
+        });
 
         return state;
     }
@@ -730,7 +1140,7 @@ class StateModifier {
             return 1;
         }
 
-        const percentReductionTarget = inputs.get(region + "PercentReducePs") / 100;
+        const percentReductionTarget = inputs.get(joinName(region, "PercentReducePs")) / 100;
         const done = year >= endYear;
         const duration = endYear - startYear;
         const yearsEllapsed = year - startYear;
@@ -761,7 +1171,7 @@ class StateModifier {
             return 1;
         }
 
-        const key = region + "AdditivesPercentReduction";
+        const key = joinName(region, "AdditivesPercentReduction");
         const testing = !inputs.has(key);
         if (testing) {
             return 1;
@@ -1141,7 +1551,7 @@ class StateModifier {
                 return 0;
             }
 
-            const additivesKey = region + ADDITIVES_KEYS[subtype];
+            const additivesKey = joinName(region, ADDITIVES_KEYS[subtype]);
             const inputs = state.get("in");
             if (!inputs.has(additivesKey)) {
                 return 0;
@@ -1212,7 +1622,13 @@ class StateModifier {
         regions.forEach((region) => {
             goodsTradeTotals.set(region, self._getNetTrade(out.get(region)));
         });
-        self._normalizeDetailedTradeSeries(state, goodsTradeSubtypes, goodsTradeTotals, regions);
+        self._normalizeDetailedTradeSeries(
+            state,
+            "goods",
+            goodsTradeSubtypes,
+            goodsTradeTotals,
+            regions,
+        );
 
         const resinTradeTotals = new Map();
         regions.forEach((region) => {
@@ -1221,33 +1637,64 @@ class StateModifier {
                 self._matricies.getResinTrade(year, region).getNetImportResin(),
             );
         });
-        self._normalizeDetailedTradeSeries(state, RESIN_SUBTYPES, resinTradeTotals, regions);
+        self._normalizeDetailedTradeSeries(
+            state,
+            "resin",
+            RESIN_SUBTYPES,
+            resinTradeTotals,
+            regions,
+        );
     }
 
     /**
      * Normalize trade for a specific subset (series) like resin or goods trade.
      *
      * Normalize trade for a specific subset (series) like resin or goods trade through back
-     * propagation to meet mass balance constriants.
+     * propagation to meet mass balance constriants. Values are copied into a dense region by
+     * subtype array for smoothing and written back at the end. Totals are summed in the same
+     * order as the smoothing steps visit values such that results match smoothing on the Maps.
+     * The number of passes and the remaining error are recorded in the state's
+     * tradeNormalization Map under the series name.
      *
      * @param state The state object in which to perform back propagation.
+     * @param seriesName The name of the series like goods or resin used for diagnostics.
      * @param seriesSubtypes The subtypes to normalize together.
      * @param seriesTotals The total volumes (sum) to try to meet per subtype.
      * @param regions The region in which to perform the normalization.
      */
-    _normalizeDetailedTradeSeries(state, seriesSubtypes, seriesTotals, regions) {
+    _normalizeDetailedTradeSeries(state, seriesName, seriesSubtypes, seriesTotals, regions) {
         const self = this;
         const tradeMap = state.get("trade");
 
-        const getRegionTotal = (region) => {
+        const numRegions = regions.length;
+        const numSubtypes = seriesSubtypes.length;
+
+        const values = new Float64Array(numRegions * numSubtypes);
+        const targets = new Float64Array(numRegions);
+        regions.forEach((region, regionIndex) => {
             const regionTrade = tradeMap.get(region);
-            const values = seriesSubtypes.map((subtype) => regionTrade.get(subtype));
-            return values.reduce((a, b) => a + b);
+            const offset = regionIndex * numSubtypes;
+            seriesSubtypes.forEach((subtype, subtypeIndex) => {
+                values[offset + subtypeIndex] = regionTrade.get(subtype);
+            });
+            targets[regionIndex] = seriesTotals.get(region);
+        });
+
+        const getRegionTotal = (regionIndex) => {
+            const offset = regionIndex * numSubtypes;
+            let total = 0;
+            for (let i = 0; i < numSubtypes; i++) {
+                total += values[offset + i];
+            }
+            return total;
         };
 
-        const getSubtypeTotal = (subtype) => {
-            const values = regions.map((region) => tradeMap.get(region).get(subtype));
-            return values.reduce((a, b) => a + b);
+        const getSubtypeTotal = (subtypeIndex) => {
+            let total = 0;
+            for (let i = 0; i < numRegions; i++) {
+                total += values[i * numSubtypes + subtypeIndex];
+            }
+            return total;
         };
 
         const getScaling = (delta) => {
@@ -1261,73 +1708,86 @@ class StateModifier {
             }
         };
 
-        const smoothRegion = (region) => {
-            const origTotal = seriesTotals.get(region);
-            const newTotal = getRegionTotal(region);
-            const delta = origTotal - newTotal;
+        const smoothRegion = (regionIndex) => {
+            const delta = targets[regionIndex] - getRegionTotal(regionIndex);
             const scaling = getScaling(delta);
 
             if (scaling == 0) {
                 return;
             }
 
-            const values = seriesSubtypes.map((subtype) => tradeMap.get(region).get(subtype));
-            const absTotal = values.map((x) => Math.abs(x)).reduce((a, b) => a + b);
+            const offset = regionIndex * numSubtypes;
+            let absTotal = 0;
+            for (let i = 0; i < numSubtypes; i++) {
+                absTotal += Math.abs(values[offset + i]);
+            }
 
-            seriesSubtypes.forEach((subtype) => {
-                const originalVal = tradeMap.get(region).get(subtype);
-                const newVal = Math.abs(originalVal) / absTotal * delta * scaling + originalVal;
-                tradeMap.get(region).set(subtype, newVal);
-            });
+            for (let i = 0; i < numSubtypes; i++) {
+                const originalVal = values[offset + i];
+                values[offset + i] = Math.abs(originalVal) / absTotal * delta * scaling +
+                    originalVal;
+            }
         };
 
-        const smoothSubtype = (subtype) => {
-            const subtypeTotal = getSubtypeTotal(subtype);
+        const smoothSubtype = (subtypeIndex) => {
+            const subtypeTotal = getSubtypeTotal(subtypeIndex);
             const scaling = getScaling(subtypeTotal);
 
             if (scaling == 0) {
                 return;
             }
 
-            const avg = subtypeTotal / seriesSubtypes.length;
-            regions.forEach((region) => {
-                const originalVal = tradeMap.get(region).get(subtype);
-                const newVal = originalVal - avg * scaling;
-                tradeMap.get(region).set(subtype, newVal);
-            });
+            const avg = subtypeTotal / numSubtypes;
+            for (let i = 0; i < numRegions; i++) {
+                values[i * numSubtypes + subtypeIndex] -= avg * scaling;
+            }
         };
 
-        const getRegionError = (region) => {
-            return Math.abs(getRegionTotal(region) - seriesTotals.get(region));
-        };
+        const getMaxError = () => {
+            let maxError = 0;
 
-        const getSubtypeError = (subtype) => {
-            return Math.abs(getSubtypeTotal(subtype));
-        };
+            for (let i = 0; i < numRegions; i++) {
+                const error = Math.abs(getRegionTotal(i) - targets[i]);
+                maxError = error > maxError ? error : maxError;
+            }
 
-        const getMaxError = () => {
-            const regionErrors = regions.map(getRegionError);
-            const maxRegionError = regionErrors.reduce((a, b) => a > b ? a : b);
-            const subtypesErrors = seriesSubtypes.map(getSubtypeError);
-            const maxSubtypesError = subtypesErrors.reduce((a, b) => a > b ? a : b);
-            return maxSubtypesError > maxRegionError ? maxSubtypesError : maxRegionError;
+            for (let i = 0; i < numSubtypes; i++) {
+                const error = Math.abs(getSubtypeTotal(i));
+                maxError = error > maxError ? error : maxError;
+            }
+
+            return maxError;
         };
 
-        const errors = [];
-        for (let i = 0; i < MAX_NORM_ITERATIONS; i++) {
-            const maxError = getMaxError();
-            if (maxError <= ALLOWED_IMPRECISION) {
-                return state;
+        let iterations = 0;
+        let maxError = getMaxError();
+        while (iterations < MAX_NORM_ITERATIONS && maxError > ALLOWED_IMPRECISION) {
+            for (let subtypeIndex = 0; subtypeIndex < numSubtypes; subtypeIndex++) {
+                smoothSubtype(subtypeIndex);
+                for (let regionIndex = 0; regionIndex < numRegions; regionIndex++) {
+                    smoothRegion(regionIndex);
+                }
             }
-            errors.push(maxError);
 
-            seriesSubtypes.forEach((subtype) => {
-                smoothSubtype(subtype);
-                regions.forEach((region) => {
-                    smoothRegion(region);
-                });
+            iterations++;
+            maxError = getMaxError();
+        }
+
+        regions.forEach((region, regionIndex) => {
+            const regionTrade = tradeMap.get(region);
+            const offset = regionIndex * numSubtypes;
+            seriesSubtypes.forEach((subtype, subtypeIndex) => {
+                regionTrade.set(subtype, values[offset + subtypeIndex]);
             });
+        });
+
+        if (!state.has("tradeNormalization")) {
+            state.set("tradeNormalization", new Map());
         }
+        state.get("tradeNormalization").set(seriesName, {
+            "iterations": iterations,
+            "residual": maxError,
+        });
 
         return state;
     }
@@ -1462,7 +1922,8 @@ class StateModifier {
      */
     _getOverrideKey(region, subtype, polymer) {
         const self = this;
-        return [region, subtype, polymer].join("\t");
+        const regionSubtype = joinName(joinName(region, "\t"), subtype);
+        return joinName(joinName(regionSubtype, "\t"), polymer);
     }
 }
 
@@ -1477,7 +1938,7 @@ class StateModifier {
  * @returns GHG emissions in metric megatons CO2 equivalent.
  */
 function getGhg(state, region, volume, leverName) {
-    const inputNameBase = region + leverName + "Emissions";
+    const inputNameBase = joinName(joinName(region, leverName), "Emissions");
     const regionOut = state.get("out").get(region);
     const isTesting = !regionOut.has("primaryProductionMT");
     const isNotRecyclable = RECYCLABLE_LEVER_NAMES.indexOf(leverName) == -1;
@@ -1511,10 +1972,10 @@ function getGhg(state, region, volume, leverName) {
         if (isEol) {
             return state.get("in").get(inputNameBase);
         } else {
-            const inputNameProduction = inputNameBase + "Production";
+            const inputNameProduction = joinName(inputNameBase, "Production");
             const intensityProduction = state.get("in").get(inputNameProduction);
 
-            const inputNameConversion = inputNameBase + "Conversion";
+            const inputNameConversion = joinName(inputNameBase, "Conversion");
             const intensityConversion = state.get("in").get(inputNameConversion);
 
             const productionPercent = getPrimaryPercent();
@@ -1700,7 +2161,7 @@ class GhgFinalizer {
         const inputs = state.get("in");
         regions.forEach((region) => {
             const regionGhg = ghgInfo.get(region);
-            const reduction = inputs.get(region + "MinGHGReduction");
+            const reduction = inputs.get(joinName(region, "MinGHGReduction"));
             regionGhg.set("policyGhgReduction", reduction);
         });
     }
@@ -1799,8 +2260,7 @@ class GhgTradeLedger {
         self._regions.add(region);
         self._materialTypes.add(materialType);
 
-        const label = [region, materialType].join("-");
-        const rectified = self._checkVolumeAndGhg(newVolume, newGhg, label);
+        const rectified = self._checkVolumeAndGhg(newVolume, newGhg, region, materialType);
         newVolume = rectified["volume"];
         newGhg = rectified["ghg"];
 
@@ -1828,8 +2288,7 @@ class GhgTradeLedger {
 
         const key = self._getCombineKey(region, materialType);
 
-        const label = [region, materialType].join("-");
-        const rectified = self._checkVolumeAndGhg(newVolume, newGhg, label);
+        const rectified = self._checkVolumeAndGhg(newVolume, newGhg, region, materialType);
         newGhg = rectified["ghg"];
         newVolume = rectified["volume"];
 
@@ -1887,7 +2346,7 @@ class GhgTradeLedger {
      */
     _getCombineKey(region, materialType) {
         const self = this;
-        return [region, materialType].join("\t");
+        return joinName(joinName(region, "\t"), materialType);
     }
 
     /**
@@ -1913,20 +2372,22 @@ class GhgTradeLedger {
      *
      * @param volume The volume in Mt to check.
      * @param ghg The GHG in CO2e Mt to check.
-     * @param label The label to use in reporting an error.
+     * @param region The region of the volume to use in reporting an error.
+     * @param materialType The type of material to use in reporting an error.
      * @returns Object with volume and ghg rectified.
      */
-    _checkVolumeAndGhg(volume, ghg, label) {
+    _checkVolumeAndGhg(volume, ghg, region, materialType) {
         const self = this;
 
         const errorThreshold = ALLOWED_IMPRECISION * -1;
+        const getLabel = () => [region, materialType].join("-");
 
         if (volume < errorThreshold || isNaN(volume)) {
-            throw label + " encountered invalid or negative volume: " + volume;
+            throw getLabel() + " encountered invalid or negative volume: " + volume;
         }
 
         if (ghg < errorThreshold || isNaN(ghg)) {
-            throw label + " encountered invalid or negative ghg: " + ghg;
+            throw getLabel() + " encountered invalid or negative ghg: " + ghg;
         }
 
         if (volume < 0) {
@@ -2048,12 +2509,35 @@ class GhgTradeLedger {
 }
 
 
+/**
+ * Load the rows of a matrix CSV file from the server.
+ *
+ * @param filename The name of the file within the data directory like live_polymer_ratios.csv.
+ * @returns Promise resolving to the parsed rows (objects with dynamically typed values).
+ */
+function loadMatrixRowsRemote(filename) {
+    return new Promise((resolve) => {
+        Papa.parse("/data/" + filename + "?v=" + CACHE_BUSTER, {
+            download: true,
+            header: true,
+            complete: (results) => resolve(results["data"]),
+            dynamicTyping: true,
+        });
+    });
+}
+
+
 /**
  * Create a promise for a set of matricies required to calculate polymer and ghg level info.
  *
+ * @param loadRows Optional function taking the name of a matrix CSV file and returning a promise
+ *      resolving to its parsed rows. Defaults to loadMatrixRowsRemote which downloads from the
+ *      server but the standalone engine reads from disk instead.
  * @returns Promise resolving to the matricies set.
  */
-function buildMatricies() {
+function buildMatricies(loadRows) {
+    const loadRowsEffective = loadRows === undefined ? loadMatrixRowsRemote : loadRows;
+
     const assertPresent = (row, key) => {
         const value = row[key];
 
@@ -2070,14 +2554,7 @@ function buildMatricies() {
         return rows.filter((x) => x["region"] !== null).filter((x) => x["region"] !== undefined);
     };
 
-    const subtypeRawFuture = new Promise((resolve) => {
-        Papa.parse("/data/live_production_trade_subtype_ratios.csv?v=" + CACHE_BUSTER, {
-            download: true,
-            header: true,
-            complete: (results) => resolve(results["data"]),
-            dynamicTyping: true,
-        });
-    });
+    const subtypeRawFuture = loadRowsEffective("live_production_trade_subtype_ratios.csv");
 
     const subtypeFuture = subtypeRawFuture.then((rows) => {
         return ignoreEmpty(rows).map((row) => {
@@ -2095,14 +2572,7 @@ function buildMatricies() {
         });
     });
 
-    const polymerRawFuture = new Promise((resolve) => {
-        Papa.parse("/data/live_polymer_ratios.csv?v=" + CACHE_BUSTER, {
-            download: true,
-            header: true,
-            complete: (results) => resolve(results["data"]),
-            dynamicTyping: true,
-        });
-    });
+    const polymerRawFuture = loadRowsEffective("live_polymer_ratios.csv");
 
     const polymerFuture = polymerRawFuture.then((rows) => {
         return ignoreEmpty(rows).map((row) => {
@@ -2122,14 +2592,7 @@ function buildMatricies() {
         });
     });
 
-    const resinTradeRawFuture = new Promise((resolve) => {
-        Papa.parse("/data/resin_trade_supplement.csv?v=" + CACHE_BUSTER, {
-            download: true,
-            header: true,
-            complete: (results) => resolve(results["data"]),
-            dynamicTyping: true,
-        });
-    });
+    const resinTradeRawFuture = loadRowsEffective("resin_trade_supplement.csv");
 
     const resinTradeFuture = resinTradeRawFuture.then((rows) => {
         return ignoreEmpty(rows).map((row) => {
@@ -2152,12 +2615,12 @@ function buildMatricies() {
         const polymerInfos = results[1];
         const resinTradeInfos = results[2];
 
-        const retMatricies = new PolymerMatricies();
-        subtypeInfos.forEach((record) => retMatricies.addSubtype(record));
-        polymerInfos.forEach((record) => retMatricies.addPolymer(record));
-        resinTradeInfos.forEach((record) => retMatricies.addResinTrade(record));
+        const builder = new PolymerMatriciesBuilder();
+        subtypeInfos.forEach((record) => builder.addSubtype(record));
+        polymerInfos.forEach((record) => builder.addPolymer(record));
+        resinTradeInfos.forEach((record) => builder.addResinTrade(record));
 
-        return retMatricies;
+        return builder.build();
     });
 
     const immutableMatrixFuture = matrixFuture.then((x) => new ImmutablePolymerMatricies(x));
@@ -2169,10 +2632,11 @@ function buildMatricies() {
 /**
  * Build a promise for a StateModifier pre-loaded with matricies.
  *
+ * @param loadRows Optional function loading the rows of a matrix CSV file (see buildMatricies).
  * @returns Promise resolving to the preloaded modifier.
  */
-function buildModifier() {
-    const matrixFuture = buildMatricies();
+function buildModifier(loadRows) {
+    const matrixFuture = buildMatricies(loadRows);
     const stateModifierFuture = matrixFuture.then((matricies) => new StateModifier(matricies));
     return stateModifierFuture;
 }
@@ -2180,23 +2644,48 @@ function buildModifier() {
 
 /**
  * Initialize the web worker.
+ *
+ * Initialize the web worker which waits for the matricies from the main thread (see
+ * PolymerMatricies.toMessage) such that they are loaded and parsed once regardless of the number
+ * of workers. Batches received before the matricies wait for them to arrive.
  */
 function init() {
-    importScripts("/third_party/papaparse.min.js");
     importScripts("/js/add_global_util.js");
+    importScripts("/js/array_state.js");
 
-    const modifierFuture = buildModifier();
+    let resolveModifier = null;
+    const modifierFuture = new Promise((resolve) => {
+        resolveModifier = resolve;
+    });
 
     const onmessage = (event) => {
-        const stateInfo = event.data;
-        const year = stateInfo["year"];
-        const requestId = stateInfo["requestId"];
-        const state = stateInfo["state"];
-        const attrs = stateInfo["attrs"];
+        const batch = event.data;
+
+        if (batch["matricies"] !== undefined) {
+            const matricies = buildPolymerMatriciesFromMessage(batch["matricies"]);
+            resolveModifier(new StateModifier(matricies));
+            return;
+        }
+
+        const batchId = batch["batchId"];
+        const years = batch["years"];
+        const states = unpackStatesFromTransfer(batch["states"]);
+        const attrs = batch["attrs"];
+        const stages = batch["stages"];
 
         modifierFuture.then((modifier) => {
-            modifier.modify(year, state, attrs);
-            postMessage({"requestId": requestId, "state": state, "error": null, "year": year});
+            try {
+                states.forEach((state, i) => modifier.modify(years[i], state, attrs, stages));
+            } catch (error) {
+                postMessage({"batchId": batchId, "error": error.toString()});
+                return;
+            }
+
+            const packed = packStatesForTransfer(states);
+            postMessage(
+                {"batchId": batchId, "states": packed["states"], "error": null, "years": years},
+                packed["transfer"],
+            );
         });
     };
 
@@ -0,0 +1,214 @@
+/**
+ * Logic for incrementally re-running an ordered chain of compiled programs.
+ *
+ * Logic for re-running only the part of an ordered chain of compiled programs (like levers in
+ * priority order) affected by a change in inputs, shared by the browser and the standalone engine
+ * (see support/preprocess_visitors.sh).
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+
+/**
+ * Make a copy of a state which can be modified without changing the original.
+ *
+ * Make a copy of a state which can be modified without changing the original. Outputs are copied
+ * through their clone method if available (like ArrayOutputs) or as a Map of Maps otherwise.
+ * Other entries not listed here (like levers in the standalone engine) are shared.
+ *
+ * @param state The state Map to copy.
+ * @returns Newly built state Map.
+ */
+function copyState(state) {
+    const copyOutputs = (outputs) => {
+        if (typeof outputs.clone === "function") {
+            return outputs.clone();
+        }
+
+        const copied = new Map();
+        outputs.forEach((regionOutputs, region) => {
+            copied.set(region, new Map(regionOutputs));
+        });
+        return copied;
+    };
+
+    const copied = new Map(state);
+    copied.set("out", copyOutputs(state.get("out")));
+
+    ["in", "meta", "local"].filter((key) => state.has(key)).forEach((key) => {
+        copied.set(key, new Map(state.get(key)));
+    });
+
+    if (state.has("inspect")) {
+        copied.set("inspect", state.get("inspect").slice());
+    }
+
+    return copied;
+}
+
+
+/**
+ * Runner for an ordered chain of programs which keeps checkpoints between each program.
+ *
+ * Runner for an ordered chain of programs which keeps a copy of the state before each program
+ * such that, when run again for the same key, only programs starting at the first one affected by
+ * changed inputs are executed. A program (step) is affected if it is new or replaced, draws random
+ * values, or reads or writes an input which changed. Everything after the first affected step is
+ * re-run as later steps may read its outputs.
+ */
+class ProgramChain {
+    /**
+     * Create a new chain without any checkpoints.
+     */
+    constructor() {
+        const self = this;
+        self._records = new Map();
+    }
+
+    /**
+     * Run steps against a state, reusing checkpoints from the last run with the same key.
+     *
+     * @param key Identifier (like the year) for states which start with the same outputs such that
+     *      they may share checkpoints. Only inputs are compared between runs for a key.
+     * @param state The state Map prior to running any steps which may be modified in place. Its
+     *      meta is used by all executed steps even if earlier steps are restored from checkpoints.
+     * @param steps Array of objects with program (function taking a state), reads and writes
+     *      (arrays of full identifiers like in.startYear), and stochastic (true if the program
+     *      draws random values). Steps are matched to the prior run by program identity such that
+     *      recompiling a program marks it as changed.
+     * @param onStep Optional callback taking the index of a step and its inspects, called for each
+     *      step in order whether it was executed or restored from a checkpoint.
+     * @returns The state after all steps.
+     */
+    run(key, state, steps, onStep) {
+        const self = this;
+
+        const inputs = new Map(state.get("in"));
+        const previous = self._records.has(key) ? self._records.get(key) : null;
+        const changed = previous === null ? new Set() : self._getChanged(previous, inputs);
+        const firstAffected = previous === null ? 0 : self._getFirstAffected(
+            previous,
+            changed,
+            steps,
+        );
+
+        const checkpoints = [];
+        const inspects = [];
+        let current = state;
+
+        if (firstAffected > 0) {
+            for (let i = 0; i < firstAffected; i++) {
+                checkpoints.push(previous["checkpoints"][i]);
+                inspects.push(previous["inspects"][i]);
+            }
+
+            current = copyState(previous["checkpoints"][firstAffected]);
+
+            // Meta (like the random source for a seed) belongs to this run, not the prior one.
+            if (state.has("meta")) {
+                current.set("meta", state.get("meta"));
+            } else {
+                current.delete("meta");
+            }
+
+            // Steps prior to firstAffected do not write changed inputs so they can be swapped in.
+            const currentInputs = current.get("in");
+            changed.forEach((name) => {
+                if (inputs.has(name)) {
+                    currentInputs.set(name, inputs.get(name));
+                } else {
+                    currentInputs.delete(name);
+                }
+            });
+        }
+
+        for (let i = firstAffected; i < steps.length; i++) {
+            checkpoints.push(copyState(current));
+            current.set("local", new Map());
+            current.set("inspect", []);
+            steps[i]["program"](current);
+            inspects.push(current.get("inspect"));
+        }
+
+        checkpoints.push(copyState(current));
+
+        self._records.set(key, {
+            "inputs": inputs,
+            "programs": steps.map((step) => step["program"]),
+            "checkpoints": checkpoints,
+            "inspects": inspects,
+        });
+
+        if (onStep !== undefined) {
+            inspects.forEach((stepInspects, i) => onStep(i, stepInspects));
+        }
+
+        return current;
+    }
+
+    /**
+     * Discard all checkpoints such as after the data behind the initial states change.
+     */
+    clear() {
+        const self = this;
+        self._records.clear();
+    }
+
+    /**
+     * Determine which inputs differ from those of a prior run.
+     *
+     * @param previous The record of the prior run.
+     * @param inputs Map from input name to value for the current run.
+     * @returns Set of input names (without the in. prefix) which were added, removed, or changed.
+     */
+    _getChanged(previous, inputs) {
+        const self = this;
+        const previousInputs = previous["inputs"];
+
+        const changed = new Set();
+        inputs.forEach((value, name) => {
+            if (!previousInputs.has(name) || previousInputs.get(name) !== value) {
+                changed.add(name);
+            }
+        });
+        previousInputs.forEach((value, name) => {
+            if (!inputs.has(name)) {
+                changed.add(name);
+            }
+        });
+
+        return changed;
+    }
+
+    /**
+     * Find the first step which must be executed again.
+     *
+     * @param previous The record of the prior run.
+     * @param changed Set of input names which changed since the prior run.
+     * @param steps The steps for the current run.
+     * @returns Index of the first affected step or steps.length if none are affected.
+     */
+    _getFirstAffected(previous, changed, steps) {
+        const self = this;
+        const previousPrograms = previous["programs"];
+
+        const touchesChanged = (step) => {
+            return step["reads"].concat(step["writes"]).some((name) => {
+                return name.startsWith("in.") && changed.has(name.substring(3));
+            });
+        };
+
+        for (let i = 0; i < steps.length; i++) {
+            const step = steps[i];
+            const isNew = i >= previousPrograms.length || previousPrograms[i] !== step["program"];
+            if (isNew || step["stochastic"] || touchesChanged(step)) {
+                return i;
+            }
+        }
+
+        return steps.length;
+    }
+}
+
+
+export {copyState, ProgramChain};
@@ -0,0 +1,394 @@
+/**
+ * Logic for drawing random numbers from seedable sources.
+ *
+ * Logic for drawing random numbers from seedable sources as used by draw expressions in plastics
+ * language programs, shared by the browser and the standalone engine (see
+ * support/preprocess_visitors.sh).
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+const BUFFER_SIZE = 256;
+const WARM_UP_ROUNDS = 12;
+const GOLDEN_GAMMA = 0x9E3779B9;
+const UINT32_RANGE = 4294967296;
+const HIGH_MULTIPLIER = 67108864; // 2 ** 26
+const DOUBLE_RANGE = 9007199254740992; // 2 ** 53
+const FEISTEL_ROUNDS = 4;
+
+const SAMPLING_RANDOM = "random";
+const SAMPLING_LATIN = "latin";
+const DEFAULT_SAMPLING = SAMPLING_LATIN;
+
+// Coefficients for the rational approximations of the inverse normal CDF (Acklam)
+const INVERSE_NORMAL_A = [
+    -3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+    1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00,
+];
+const INVERSE_NORMAL_B = [
+    -5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+    6.680131188771972e+01, -1.328068155288572e+01,
+];
+const INVERSE_NORMAL_C = [
+    -7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+    -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00,
+];
+const INVERSE_NORMAL_D = [
+    7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+    3.754408661907416e+00,
+];
+const INVERSE_NORMAL_LOW = 0.02425;
+
+let defaultSource = null;
+
+
+/**
+ * Seedable pseudorandom number generator.
+ *
+ * Seedable pseudorandom number generator (sfc32 expanded from the seed by splitmix32) which fills
+ * a buffer of uniform doubles at a time and keeps the second value of each Box-Muller pair for
+ * the next normal draw.
+ */
+class RandomSource {
+    /**
+     * Create a new source.
+     *
+     * @param seed Integer seed where sources with the same seed and stream give the same draws.
+     * @param stream Optional integer (like a trial index) selecting one of many sequences for the
+     *      same seed. Defaults to 0.
+     */
+    constructor(seed, stream) {
+        const self = this;
+
+        let mix = seed >>> 0;
+        const nextMix = () => {
+            mix = (mix + GOLDEN_GAMMA) >>> 0;
+            return mixUint32(mix);
+        };
+
+        const streamMix = Math.imul(((stream === undefined ? 0 : stream) >>> 0) + 1, GOLDEN_GAMMA);
+        self._a = nextMix();
+        self._b = (nextMix() ^ streamMix) >>> 0;
+        self._c = nextMix();
+        self._counter = 1;
+
+        for (let i = 0; i < WARM_UP_ROUNDS; i++) {
+            self._nextUint32();
+        }
+
+        self._buffer = new Float64Array(BUFFER_SIZE);
+        self._bufferIndex = BUFFER_SIZE;
+        self._spareNormal = null;
+    }
+
+    /**
+     * Draw from the uniform distribution over [0, 1).
+     *
+     * @returns The value drawn.
+     */
+    nextUniform() {
+        const self = this;
+
+        if (self._bufferIndex >= BUFFER_SIZE) {
+            self._fillBuffer();
+        }
+
+        const value = self._buffer[self._bufferIndex];
+        self._bufferIndex++;
+        return value;
+    }
+
+    /**
+     * Draw from the standard normal distribution.
+     *
+     * @returns The value drawn.
+     */
+    nextNormal() {
+        const self = this;
+
+        if (self._spareNormal !== null) {
+            const spare = self._spareNormal;
+            self._spareNormal = null;
+            return spare;
+        }
+
+        const u = 1 - self.nextUniform();
+        const v = self.nextUniform();
+        const radius = Math.sqrt(-2 * Math.log(u));
+        const angle = 2 * Math.PI * v;
+        self._spareNormal = radius * Math.sin(angle);
+        return radius * Math.cos(angle);
+    }
+
+    /**
+     * Draw from a uniform distribution.
+     *
+     * @param low The minimum value (inclusive).
+     * @param high The maximum value (exclusive).
+     * @returns The value drawn.
+     */
+    uniform(low, high) {
+        const self = this;
+        return low + self.nextUniform() * (high - low);
+    }
+
+    /**
+     * Draw from a normal distribution.
+     *
+     * @param mean The mean of the distribution.
+     * @param std The standard deviation of the distribution.
+     * @returns The value drawn.
+     */
+    normal(mean, std) {
+        const self = this;
+        return mean + std * self.nextNormal();
+    }
+
+    /**
+     * Refill the buffer of uniform doubles with 53 bits of randomness each.
+     */
+    _fillBuffer() {
+        const self = this;
+
+        for (let i = 0; i < BUFFER_SIZE; i++) {
+            const high = self._nextUint32() >>> 5;
+            const low = self._nextUint32() >>> 6;
+            self._buffer[i] = (high * HIGH_MULTIPLIER + low) / DOUBLE_RANGE;
+        }
+
+        self._bufferIndex = 0;
+    }
+
+    /**
+     * Advance the generator.
+     *
+     * @returns Unsigned 32 bit integer.
+     */
+    _nextUint32() {
+        const self = this;
+
+        const result = (self._a + self._b + self._counter) >>> 0;
+        self._counter = (self._counter + 1) >>> 0;
+        self._a = self._b ^ (self._b >>> 9);
+        self._b = (self._c + (self._c << 3)) >>> 0;
+        self._c = ((self._c << 21) | (self._c >>> 11)) >>> 0;
+        self._c = (self._c + result) >>> 0;
+        return result;
+    }
+}
+
+
+/**
+ * Source for one trial in a Latin hypercube design across a set of trials.
+ *
+ * Source for one trial in a Latin hypercube design where each draw within a trial (in the order
+ * made, so each draw site in a program) is a dimension of the design. Within a block of trials,
+ * every dimension places exactly one trial in each of blockSize equal strata of [0, 1) with the
+ * strata shuffled independently per dimension and a random offset within each stratum. Normals
+ * use the inverse CDF so that they keep the stratification. The shuffles are keyed permutations
+ * such that each trial computes its own draws without a shared table.
+ */
+class LatinHypercubeSource {
+    /**
+     * Create a new source.
+     *
+     * @param seed Integer seed where sources with the same seed and index give the same draws.
+     * @param index The index of the trial like 5.
+     * @param blockSize The number of trials stratified together. Trials 0 to blockSize - 1 form
+     *      the first block, blockSize to 2 * blockSize - 1 the second, and so on.
+     */
+    constructor(seed, index, blockSize) {
+        const self = this;
+        self._seed = seed >>> 0;
+        self._block = Math.floor(index / blockSize);
+        self._position = index % blockSize;
+        self._blockSize = blockSize;
+        self._offsets = new RandomSource(seed, index);
+        self._dimension = 0;
+    }
+
+    /**
+     * Draw from the uniform distribution over [0, 1) in the next dimension.
+     *
+     * @returns The value drawn.
+     */
+    nextUniform() {
+        const self = this;
+
+        const key = mixUint32(
+            mixUint32(self._seed ^ mixUint32(self._block + GOLDEN_GAMMA)) ^ self._dimension,
+        );
+        self._dimension++;
+
+        const stratum = permuteIndex(self._position, self._blockSize, key);
+        return (stratum + self._offsets.nextUniform()) / self._blockSize;
+    }
+
+    /**
+     * Draw from the standard normal distribution in the next dimension.
+     *
+     * @returns The value drawn.
+     */
+    nextNormal() {
+        const self = this;
+        return inverseNormalCdf(Math.max(self.nextUniform(), Number.MIN_VALUE));
+    }
+
+    /**
+     * Draw from a uniform distribution.
+     *
+     * @param low The minimum value (inclusive).
+     * @param high The maximum value (exclusive).
+     * @returns The value drawn.
+     */
+    uniform(low, high) {
+        const self = this;
+        return low + self.nextUniform() * (high - low);
+    }
+
+    /**
+     * Draw from a normal distribution.
+     *
+     * @param mean The mean of the distribution.
+     * @param std The standard deviation of the distribution.
+     * @returns The value drawn.
+     */
+    normal(mean, std) {
+        const self = this;
+        return mean + std * self.nextNormal();
+    }
+}
+
+
+/**
+ * Scramble the bits of an unsigned 32 bit integer (the murmur3 finalizer).
+ *
+ * @param value The integer to scramble.
+ * @returns Unsigned 32 bit integer.
+ */
+function mixUint32(value) {
+    let z = value >>> 0;
+    z = Math.imul(z ^ (z >>> 16), 0x85EBCA6B);
+    z = Math.imul(z ^ (z >>> 13), 0xC2B2AE35);
+    return (z ^ (z >>> 16)) >>> 0;
+}
+
+
+/**
+ * Map an index to its position in a keyed pseudorandom permutation.
+ *
+ * Map an index to its position in a keyed pseudorandom permutation using a small Feistel network
+ * over the next even power of two, walking the cycle until the result falls within size.
+ *
+ * @param index The index to map from 0 to size - 1.
+ * @param size The number of items permuted.
+ * @param key Unsigned 32 bit integer selecting the permutation.
+ * @returns The permuted index from 0 to size - 1.
+ */
+function permuteIndex(index, size, key) {
+    let halfBits = 1;
+    while ((1 << (2 * halfBits)) < size) {
+        halfBits++;
+    }
+    const halfMask = (1 << halfBits) - 1;
+
+    let value = index;
+    do {
+        let left = value >>> halfBits;
+        let right = value & halfMask;
+        for (let round = 0; round < FEISTEL_ROUNDS; round++) {
+            const newRight = left ^ (mixUint32(right ^ mixUint32(key + round)) & halfMask);
+            left = right;
+            right = newRight;
+        }
+        value = (left << halfBits) | right;
+    } while (value >= size);
+
+    return value;
+}
+
+
+/**
+ * Find the value at which the standard normal CDF reaches a probability.
+ *
+ * @param p The probability between 0 and 1 (exclusive).
+ * @returns The standard normal quantile with relative error under about 1.2e-9.
+ */
+function inverseNormalCdf(p) {
+    const evaluate = (coefficients, x) => coefficients.reduce((total, c) => total * x + c, 0);
+
+    if (p < INVERSE_NORMAL_LOW) {
+        const q = Math.sqrt(-2 * Math.log(p));
+        return evaluate(INVERSE_NORMAL_C, q) / (evaluate(INVERSE_NORMAL_D, q) * q + 1);
+    } else if (p > 1 - INVERSE_NORMAL_LOW) {
+        const q = Math.sqrt(-2 * Math.log(1 - p));
+        return -evaluate(INVERSE_NORMAL_C, q) / (evaluate(INVERSE_NORMAL_D, q) * q + 1);
+    } else {
+        const q = p - 0.5;
+        const r = q * q;
+        return evaluate(INVERSE_NORMAL_A, r) * q / (evaluate(INVERSE_NORMAL_B, r) * r + 1);
+    }
+}
+
+
+/**
+ * Make the source from which a Monte Carlo trial draws.
+ *
+ * @param sampling The sampling strategy: random for independent pseudorandom draws per trial or
+ *      latin for a Latin hypercube design across trials (see LatinHypercubeSource).
+ * @param seed Integer seed for the set of trials.
+ * @param index The index of the trial like 5. Trial i sees the same draws for the same seed.
+ * @param blockSize The number of trials stratified together for latin like the number of trials
+ *      in the run. Ignored for random.
+ * @returns The RandomSource or LatinHypercubeSource for the trial.
+ */
+function makeTrialRandomSource(sampling, seed, index, blockSize) {
+    if (sampling === SAMPLING_RANDOM) {
+        return new RandomSource(seed, index);
+    } else if (sampling === SAMPLING_LATIN) {
+        return new LatinHypercubeSource(seed, index, blockSize);
+    } else {
+        throw "Unknown sampling strategy: " + sampling;
+    }
+}
+
+
+/**
+ * Make a new seed when the user did not request one.
+ *
+ * @returns Unsigned 32 bit integer seed.
+ */
+function makeRandomSeed() {
+    return Math.floor(Math.random() * UINT32_RANGE);
+}
+
+
+/**
+ * Get the source from which a program running against a state should draw.
+ *
+ * @param state The state Map whose meta may have a RandomSource under random for the run.
+ * @returns The RandomSource for the run or a shared unseeded source if none given.
+ */
+function getStateRandomSource(state) {
+    const meta = state.get("meta");
+    if (meta !== undefined && meta.has("random")) {
+        return meta.get("random");
+    }
+
+    if (defaultSource === null) {
+        defaultSource = new RandomSource(makeRandomSeed());
+    }
+
+    return defaultSource;
+}
+
+
+export {
+    DEFAULT_SAMPLING,
+    getStateRandomSource,
+    inverseNormalCdf,
+    LatinHypercubeSource,
+    makeRandomSeed,
+    makeTrialRandomSource,
+    RandomSource,
+};
@@ -0,0 +1,176 @@
+/**
+ * Logic for caching simulation results.
+ *
+ * Logic for caching simulation results in front of a pluggable store which is shared by the
+ * browser and the standalone engine (see support/preprocess_visitors.sh).
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+
+/**
+ * Cache in front of a store which records hit and miss statistics.
+ *
+ * Cache in front of a store which records hit and miss statistics where a store is any object
+ * with get(key) returning the value or null if not found and set(key, value).
+ */
+class ResultCache {
+    /**
+     * Create a new cache.
+     *
+     * @param store The store in which results should be saved like a MemoryStore.
+     */
+    constructor(store) {
+        const self = this;
+        self._store = store;
+        self._hits = 0;
+        self._misses = 0;
+    }
+
+    /**
+     * Get a result from the cache.
+     *
+     * @param key The key (string) for the result.
+     * @returns The cached result or null if not found.
+     */
+    get(key) {
+        const self = this;
+        const value = self._store.get(key);
+
+        if (value === null) {
+            self._misses++;
+        } else {
+            self._hits++;
+        }
+
+        return value;
+    }
+
+    /**
+     * Save a result into the cache.
+     *
+     * @param key The key (string) for the result.
+     * @param value The result to save.
+     */
+    set(key, value) {
+        const self = this;
+        self._store.set(key, value);
+    }
+
+    /**
+     * Get a result from the cache or calculate and save it if not found.
+     *
+     * @param key The key (string) for the result.
+     * @param calculate Function taking no arguments which returns the result on a cache miss.
+     * @returns The cached or newly calculated result.
+     */
+    getOrCalculate(key, calculate) {
+        const self = this;
+        const cached = self.get(key);
+
+        if (cached !== null) {
+            return cached;
+        }
+
+        const value = calculate();
+        self.set(key, value);
+        return value;
+    }
+
+    /**
+     * Remove all results from the underlying store.
+     */
+    clear() {
+        const self = this;
+        self._store.clear();
+    }
+
+    /**
+     * Get hit and miss statistics.
+     *
+     * @returns Object with hits and misses counts since this cache was created.
+     */
+    getStats() {
+        const self = this;
+        return {"hits": self._hits, "misses": self._misses};
+    }
+}
+
+
+/**
+ * In-memory store evicting the least recently used results when over a maximum size.
+ */
+class MemoryStore {
+    /**
+     * Create a new empty store.
+     *
+     * @param maxSize The maximum total size of values to hold before evicting.
+     * @param getSize Optional function which returns the size of a value. Defaults to 1 per value
+     *      such that maxSize is a count of entries.
+     */
+    constructor(maxSize, getSize) {
+        const self = this;
+        self._maxSize = maxSize;
+        self._getSize = getSize === undefined ? (x) => 1 : getSize;
+        self._entries = new Map();
+        self._totalSize = 0;
+    }
+
+    /**
+     * Get a value, marking it as recently used.
+     *
+     * @param key The key for the value.
+     * @returns The value or null if not found.
+     */
+    get(key) {
+        const self = this;
+
+        if (!self._entries.has(key)) {
+            return null;
+        }
+
+        // Maps iterate in insertion order so re-insert to move to most recently used.
+        const entry = self._entries.get(key);
+        self._entries.delete(key);
+        self._entries.set(key, entry);
+
+        return entry["value"];
+    }
+
+    /**
+     * Save a value, evicting least recently used values if over the maximum size.
+     *
+     * @param key The key for the value.
+     * @param value The value to save.
+     */
+    set(key, value) {
+        const self = this;
+
+        if (self._entries.has(key)) {
+            self._totalSize -= self._entries.get(key)["size"];
+            self._entries.delete(key);
+        }
+
+        const size = self._getSize(value);
+        self._entries.set(key, {"value": value, "size": size});
+        self._totalSize += size;
+
+        while (self._totalSize > self._maxSize && self._entries.size > 1) {
+            const oldestKey = self._entries.keys().next().value;
+            self._totalSize -= self._entries.get(oldestKey)["size"];
+            self._entries.delete(oldestKey);
+        }
+    }
+
+    /**
+     * Remove all values.
+     */
+    clear() {
+        const self = this;
+        self._entries.clear();
+        self._totalSize = 0;
+    }
+}
+
+
+export {MemoryStore, ResultCache};
@@ -0,0 +1,86 @@
+/**
+ * Logic for summarizing many observations without holding all of them in memory.
+ *
+ * Logic for summarizing many observations like monte carlo trial results without holding all of
+ * them in memory, shared by the browser and the standalone engine (see
+ * support/preprocess_visitors.sh).
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+
+/**
+ * Running mean and standard deviation using Welford's online algorithm.
+ */
+class RunningStats {
+    /**
+     * Create a new empty accumulator.
+     */
+    constructor() {
+        const self = this;
+        self._count = 0;
+        self._mean = 0;
+        self._sumSquares = 0;
+    }
+
+    /**
+     * Add an observation.
+     *
+     * @param value The value observed.
+     */
+    add(value) {
+        const self = this;
+        self._count++;
+        const delta = value - self._mean;
+        self._mean += delta / self._count;
+        self._sumSquares += delta * (value - self._mean);
+    }
+
+    /**
+     * Get the mean of the observations.
+     *
+     * @returns Mean or 0 if no observations.
+     */
+    getMean() {
+        const self = this;
+        return self._mean;
+    }
+
+    /**
+     * Get the population standard deviation of the observations like in the browser simulations.
+     *
+     * @returns Standard deviation or 0 if no observations.
+     */
+    getStd() {
+        const self = this;
+        return self._count == 0 ? 0 : Math.sqrt(self._sumSquares / self._count);
+    }
+
+    /**
+     * Get the number of observations added.
+     *
+     * @returns Count of observations.
+     */
+    getCount() {
+        const self = this;
+        return self._count;
+    }
+
+    /**
+     * Get the standard error of the mean using the sample standard deviation.
+     *
+     * @returns Standard error or Infinity if fewer than two observations.
+     */
+    getStdError() {
+        const self = this;
+        if (self._count < 2) {
+            return Infinity;
+        }
+
+        const sampleVariance = self._sumSquares / (self._count - 1);
+        return Math.sqrt(sampleVariance / self._count);
+    }
+}
+
+
+export {RunningStats};
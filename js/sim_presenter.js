@@ -7,10 +7,20 @@
 import {CACHE_BUSTER, DEFAULT_YEAR, HISTORY_START_YEAR, MAX_YEAR} from "const";
 import {buildSimDownload, buildSimSummaryDownload} from "exporters";
 import {fetchWithRetry} from "file";
-import {getGoals} from "goals";
+import {getGoalRequirements, getGoals} from "goals";
+import {getLeverBundle} from "lever_bundle";
+import {MonteCarloExecutor, MonteCarloSummary} from "monte_carlo";
+import {DEFAULT_SAMPLING, makeRandomSeed, makeTrialRandomSource} from "random";
 
 const NUM_TRIALS_STANDALONE = 1000;
-const NUM_TRIALS_POLICY = 500;
+
+// Policies run in rounds until every tracked goal is precise enough or the cap is reached.
+const MAX_TRIALS_POLICY = 500;
+const MIN_TRIALS_POLICY = 50;
+const TRIALS_PER_CHECK = 25;
+const DEFAULT_TOLERANCE = 0.01;
+const CONFIDENCE_Z = 1.96;
+const TRACKED_REGION = "global";
 
 const SELECTED_POLICIES = [
     {"series": "baseline", "source": "sim_bau.pt"},
@@ -49,6 +59,10 @@ const STANDALONE_X_TITLES = {
     "secondaryProduction": "Secondary Production (Mt)",
 };
 
+// Trials only report the goals shown so only calculate what those need after levers run.
+const SIM_GOALS = Object.keys(STANDALONE_X_TITLES);
+const GOAL_REQUIREMENTS = getGoalRequirements(SIM_GOALS);
+
 /**
  * Presenter which provides a slider representation of a simulation parameter (lever).
  */
@@ -182,8 +196,8 @@ class SimPresenter {
     loadInitialCode() {
         const self = this;
 
-        const futureMainCode = fetchWithRetry("/pt/simulation.pt?v=" + CACHE_BUSTER)
-            .then((response) => response.text())
+        const futureMainCode = getLeverBundle()
+            .then((bundle) => bundle.getFileCode("simulation.pt"))
             .then((text) => {
                 self._editor.setValue(text);
                 self._editor.clearSelection();
@@ -343,18 +357,11 @@ class SimPresenter {
         return ace;
     }
 
-    _executeMany(count, label, setupProgram) {
+    _executeSingle(label, setupProgram, random) {
         const self = this;
-        const promises = Array.from(Array(count)).map(() => {
-            return self._executeSingle(label, setupProgram);
-        });
-        return Promise.all(promises);
-    }
 
-    _executeSingle(label, setupProgram) {
-        const self = this;
-
-        const prePrograms = [self.getProgram()];
+        const useRandom = (state) => state.get("meta").set("random", random);
+        const prePrograms = [useRandom, self.getProgram()];
         if (setupProgram !== undefined) {
             prePrograms.push(setupProgram);
         }
@@ -364,15 +371,22 @@ class SimPresenter {
             prePrograms,
             [],
             [self.getYear()],
+            GOAL_REQUIREMENTS,
         );
 
-        return singleFuture.then((x) => getGoals(x.get(self.getYear())))
+        return singleFuture.then((x) => getGoals(x.get(self.getYear()), SIM_GOALS))
             .then((x) => self._labelGoals(x, label))
             .then((x) => x, (err) => {
                 throw ("Failed on " + label + " with " + err);
             });
     }
 
+    _getSeed() {
+        const self = this;
+        const urlParams = new URLSearchParams(window.location.search);
+        return urlParams.has("seed") ? parseInt(urlParams.get("seed")) : makeRandomSeed();
+    }
+
     _labelGoals(targets, label) {
         const self = this;
         targets.forEach((regionInfo) => {
@@ -405,29 +419,19 @@ class SimPresenter {
 
         displayStatus(0);
 
-        return new Promise((resolve) => {
-            let completed = 0;
-            const completedResults = [];
-
-            const continueSimulations = () => {
-                setTimeout(onSimResults, 10);
-            };
-
-            const onSimResults = () => {
-                self._executeMany(10, "standalone").then((newResults) => {
-                    completedResults.push(...newResults);
-                    completed += 10;
-                    displayStatus(completed);
-                    if (completed < NUM_TRIALS_STANDALONE) {
-                        continueSimulations();
-                    } else {
-                        resolve(completedResults);
-                    }
-                });
-            };
-
-            continueSimulations();
+        const seed = self._getSeed();
+        const sampling = self._getSampling();
+        const completedResults = [];
+        const executor = new MonteCarloExecutor((index) => {
+            const random = makeTrialRandomSource(sampling, seed, index, NUM_TRIALS_STANDALONE);
+            return self._executeSingle("standalone", undefined, random);
         });
+
+        return executor.run(
+            NUM_TRIALS_STANDALONE,
+            (result) => completedResults.push(result),
+            displayStatus,
+        ).then(() => completedResults);
     }
 
     _reportStandalone(allResults) {
@@ -459,8 +463,14 @@ class SimPresenter {
         const totalLabel = self._rootElement.querySelector(".total-sim-count");
         const progressBar = self._rootElement.querySelector(".sim-progress-bar");
 
-        totalLabel.innerHTML = NUM_TRIALS_POLICY * self._policies.length;
-        progressBar.max = NUM_TRIALS_POLICY * self._policies.length;
+        // Total shrinks as policies stop before the cap.
+        let totalTrials = MAX_TRIALS_POLICY * self._policies.length;
+        let priorCompleted = 0;
+
+        const displayTotal = () => {
+            totalLabel.innerHTML = totalTrials;
+            progressBar.max = totalTrials;
+        };
 
         const displayStatus = (completed) => {
             completeLabel.innerHTML = completed;
@@ -468,49 +478,79 @@ class SimPresenter {
             progressBar.innerHTML = completed;
         };
 
+        displayTotal();
         displayStatus(0);
 
-        let totalCompleted = 0;
-        const completedResults = [];
+        // Only keep running statistics for each policy rather than every trial's results.
+        const summary = new MonteCarloSummary();
+        const tolerance = self._getTolerance();
+        const isTracked = (region, variable) => {
+            return region === TRACKED_REGION && STANDALONE_X_TITLES[variable] !== undefined;
+        };
+        const getPrecision = (series) => summary.getPrecision(series, CONFIDENCE_Z, isTracked);
+
+        // Trial i of each policy sees the same draws such that policies are compared fairly. Latin
+        // hypercube designs cover each round such that stopping after any round keeps them whole.
+        const seed = self._getSeed();
+        const sampling = self._getSampling();
+        const precisions = [];
+        const runPolicy = (policyInfo) => {
+            const series = policyInfo["series"];
+            const executor = new MonteCarloExecutor((index) => {
+                const random = makeTrialRandomSource(sampling, seed, index, TRIALS_PER_CHECK);
+                return self._executeSingle(series, policyInfo["program"], random);
+            });
+
+            const shouldStop = (completed) => {
+                return completed >= MIN_TRIALS_POLICY && getPrecision(series) <= tolerance;
+            };
 
-        const executePolicy = (policyInfo) => {
-            const policyName = policyInfo["series"];
-            const policyProgram = policyInfo["program"];
-
-            return new Promise((innerResolve) => {
-                let completed = 0;
-
-                const continueSimulations = () => {
-                    setTimeout(onSimResults, 10);
-                };
-
-                const onSimResults = () => {
-                    self._executeMany(10, policyName, policyProgram).then((newResults) => {
-                        completedResults.push(...newResults);
-                        completed += 10;
-                        totalCompleted += 10;
-                        displayStatus(totalCompleted);
-                        if (completed < NUM_TRIALS_POLICY) {
-                            continueSimulations();
-                        } else {
-                            innerResolve(completedResults);
-                        }
-                    });
-                };
-
-                continueSimulations();
+            return executor.runAdaptive(
+                MAX_TRIALS_POLICY,
+                TRIALS_PER_CHECK,
+                (result) => summary.add(result),
+                shouldStop,
+                (completed) => displayStatus(priorCompleted + completed),
+            ).then((completed) => {
+                priorCompleted += completed;
+                totalTrials -= MAX_TRIALS_POLICY - completed;
+                displayTotal();
+                displayStatus(priorCompleted);
+
+                precisions.push({
+                    "series": series,
+                    "count": completed,
+                    "precision": getPrecision(series),
+                });
             });
         };
 
-        const policyFutures = self._policies.map(executePolicy);
+        const allPoliciesFuture = self._policies.reduce(
+            (prior, policyInfo) => prior.then(() => runPolicy(policyInfo)),
+            Promise.resolve(),
+        );
 
-        return Promise.all(policyFutures).then((results) => results.flat());
+        return allPoliciesFuture.then(() => {
+            return {"records": summary.getRecords(), "precisions": precisions};
+        });
     }
 
-    _reportPolicies(allResults) {
+    _getSampling() {
         const self = this;
+        const urlParams = new URLSearchParams(window.location.search);
+        return urlParams.has("sampling") ? urlParams.get("sampling") : DEFAULT_SAMPLING;
+    }
 
-        const summarizedRecords = self._summarizeRecords(allResults);
+    _getTolerance() {
+        const self = this;
+        const urlParams = new URLSearchParams(window.location.search);
+        return urlParams.has("tolerance") ?
+            parseFloat(urlParams.get("tolerance")) :
+            DEFAULT_TOLERANCE;
+    }
+
+    _reportPolicies(results) {
+        const self = this;
 
         const progressPanel = self._rootElement.querySelector(".sim-progress-panel");
         const resultsPanel = self._rootElement.querySelector(".sim-policies-results-panel");
@@ -518,54 +558,11 @@ class SimPresenter {
         progressPanel.style.display = "none";
         resultsPanel.style.display = "block";
 
-        const outputLink = buildSimSummaryDownload(summarizedRecords);
+        const outputLink = buildSimSummaryDownload(results["records"]);
         const downloadLink = self._rootElement.querySelector("#export-policies");
         downloadLink.href = outputLink;
 
-        self._policiesReportPresenter.setResults(summarizedRecords);
-    }
-
-    _summarizeRecords(allResults) {
-        const self = this;
-
-        const allResultsByKey = new Map();
-        allResults.forEach((inputRecord) => {
-            Array.of(...inputRecord.keys()).forEach((region) => {
-                const regionRecord = inputRecord.get(region);
-                const series = regionRecord.get("series");
-                const variables = Array.of(...regionRecord.keys())
-                    .filter((x) => x !== "series")
-                    .filter((x) => x !== "region");
-
-                return variables.forEach((variable) => {
-                    const key = [series, region, variable].join("\t");
-                    const value = regionRecord.get(variable);
-                    if (!allResultsByKey.has(key)) {
-                        allResultsByKey.set(key, []);
-                    }
-                    allResultsByKey.get(key).push(value);
-                });
-            });
-        });
-
-        const summarizedRecords = [];
-        allResultsByKey.forEach((values, key) => {
-            const keyComponents = key.split("\t");
-            const series = keyComponents[0];
-            const region = keyComponents[1];
-            const variable = keyComponents[2];
-            const mean = getMean(values);
-            const std = getStandardDeviation(values);
-            summarizedRecords.push({
-                "series": series,
-                "region": region,
-                "variable": variable,
-                "mean": mean,
-                "std": std,
-            });
-        });
-
-        return summarizedRecords;
+        self._policiesReportPresenter.setResults(results["records"], results["precisions"]);
     }
 
     _resetUI() {
@@ -590,8 +587,8 @@ class SimPresenter {
         const self = this;
 
         const promises = SELECTED_POLICIES.map((policyRecord) => {
-            return fetchWithRetry("/pt/" + policyRecord["source"] + "?v=" + CACHE_BUSTER)
-                .then((response) => response.text())
+            return getLeverBundle()
+                .then((bundle) => bundle.getFileCode(policyRecord["source"]))
                 .then((text) => {
                     const compileResult = self._compileProgram(text);
                     const hasErrors = compileResult.getErrors().length > 0;
@@ -737,10 +734,33 @@ class PoliciesReportPresenter {
         self._attachListeners();
     }
 
-    setResults(results) {
+    setResults(results, precisions) {
         const self = this;
         self._results = results.filter((x) => x["region"] === "global");
         self._refreshChart();
+        self._showPrecisions(precisions);
+    }
+
+    _showPrecisions(precisions) {
+        const self = this;
+
+        const describe = (precisionInfo) => {
+            const label = SERIES_LABELS[precisionInfo["series"]].join(" ");
+            const precision = precisionInfo["precision"];
+            const precisionStr = isFinite(precision) ?
+                "+/- " + (Math.round(precision * 1000) / 10) + "%" :
+                "not estimated";
+            return label + ": " + precisionInfo["count"] + " trials, " + precisionStr;
+        };
+
+        const holder = d3.select(self._rootElement.querySelector(".policies-precision"));
+        holder.html("");
+        holder.selectAll(".policies-precision-item")
+            .data(precisions)
+            .enter()
+            .append("li")
+            .classed("policies-precision-item", true)
+            .text(describe);
     }
 
     _getSelectedDimension() {
@@ -822,43 +842,6 @@ class PoliciesReportPresenter {
 }
 
 
-/**
- * Get the mean value of an array.
- *
- * @param target Array of numbers
- * @returns Mean
- */
-function getMean(target) {
-    if (target.length == 0) {
-        return 0;
-    }
-
-    const total = target.reduce((a, b) => a + b);
-    const mean = total / target.length;
-    return mean;
-}
-
-
-/**
- * Get the standard deviation of an array.
- *
- * @param target Array of numbers
- * @returns Standard deviation
- */
-function getStandardDeviation(target) {
-    if (target.length == 0) {
-        return 0;
-    }
-
-    const total = target.reduce((a, b) => a + b);
-    const mean = total / target.length;
-    const varianceNum = target.map((x) => Math.pow(x - mean, 2)).reduce((a, b) => a + b);
-    const variance = varianceNum / target.length;
-    const std = Math.sqrt(variance);
-    return std;
-};
-
-
 /**
  * Create a new simulation tab presenter.
  *
@@ -8,6 +8,7 @@ import {CACHE_BUSTER} from "const";
 import {fetchWithRetry} from "file";
 import {addGlobalToState} from "geotools";
 import {getGoals} from "goals";
+import {getLeverBundle} from "lever_bundle";
 import {STRINGS} from "strings";
 
 
@@ -38,6 +39,7 @@ class SliderPresenter {
         self._compileProgram = compileProgram;
         self._getSelection = getSelection;
         self._programCache = null;
+        self._dependenciesCache = null;
         self._priority = priority;
 
         const editorContainer = self._rootElement.querySelector(".editor");
@@ -127,6 +129,16 @@ class SliderPresenter {
         }
     }
 
+    /**
+     * Get the current code assigned to this lever.
+     *
+     * @returns The plastics language source for this lever which may be edited by the user.
+     */
+    getCode() {
+        const self = this;
+        return self._editor.getValue();
+    }
+
     /**
      * Compile the current program assigned to this lever.
      *
@@ -148,6 +160,11 @@ class SliderPresenter {
                 return null;
             } else if (hasProgram) {
                 self._showError(null);
+                self._dependenciesCache = {
+                    "reads": compileResult.getReads(),
+                    "writes": compileResult.getWrites(),
+                    "stochastic": compileResult.isStochastic(),
+                };
                 return compileResult.getProgram();
             } else {
                 self._showError(null);
@@ -162,6 +179,22 @@ class SliderPresenter {
         return self._programCache;
     }
 
+    /**
+     * Get the variables read and written by the current program assigned to this lever.
+     *
+     * @returns Object with reads and writes (arrays of full identifiers like in.startYear) along
+     *      with stochastic (true if the program draws random values) or null if no program.
+     */
+    getDependencies() {
+        const self = this;
+
+        if (self.getProgram() === null) {
+            return null;
+        }
+
+        return self._dependenciesCache;
+    }
+
     /**
      * Show the inspection table for debugging.
      *
@@ -243,6 +276,7 @@ class SliderPresenter {
 
         // Invalid cache
         self._programCache = null;
+        self._dependenciesCache = null;
 
         // Get new program
         const program = self.getProgram();
@@ -479,12 +513,6 @@ function buildSliders(includeDevelopment, buildState, compileProgram, onInputCha
     };
 
     const fetchCache = (url, isJson) => {
-        if (url.startsWith("/pt/noop.pt?v=")) {
-            return new Promise((resolve) => {
-                resolve({"text": () => ""});
-            });
-        }
-
         if (promiseCache.has(url)) {
             return promiseCache.get(url);
         }
@@ -518,14 +546,15 @@ function buildSliders(includeDevelopment, buildState, compileProgram, onInputCha
 
 
     const renderLever = (config, htmlTemplate) => {
-        const templateUrl = "/pt/" + config["template"] + "?v=" + CACHE_BUSTER;
-        return fetchCache(templateUrl, false).then((x) => x.text())
-            .then((x) => getHandlebars().compile(x))
-            .then((codeTemplate) => codeTemplate(config["attrs"]))
-            .then((code) => {
-                config["code"] = code;
-                return htmlTemplate(config);
-            });
+        return getLeverBundle().then((bundle) => {
+            const code = bundle.getLeverCode(config["variable"]);
+            if (code === null) {
+                throw "Lever not found in bundle: " + config["variable"];
+            }
+
+            config["code"] = code;
+            return htmlTemplate(config);
+        });
     };
 
     const renderSection = (config, leverTemplate, sectionTemplate) => {
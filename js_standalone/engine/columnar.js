@@ -0,0 +1,88 @@
+/**
+ * Logic to read columnar binary snapshots of data CSV files.
+ *
+ * Logic to read columnar binary snapshots of data CSV files as written by
+ * support/columnar_data.py which allows the engine to skip parsing text.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import fs from "fs";
+import path from "path";
+
+const MAGIC = "PLTCOL01";
+const HEADER_START = MAGIC.length + 4;
+const ARRAY_TYPES = {
+    "int32": Int32Array,
+    "float64": Float64Array,
+};
+
+
+/**
+ * Get the path at which a snapshot for a CSV file is expected.
+ *
+ * @param csvLoc Path to the CSV file.
+ * @returns Path to where the binary snapshot would be.
+ */
+function getSnapshotLoc(csvLoc) {
+    const parsed = path.parse(csvLoc);
+    return path.join(parsed.dir, parsed.name + ".bin");
+}
+
+
+/**
+ * Determine if a CSV file has a snapshot which is at least as new as the CSV itself.
+ *
+ * @param csvLoc Path to the CSV file.
+ * @returns True if the snapshot can be used in place of the CSV and false otherwise.
+ */
+function hasFreshSnapshot(csvLoc) {
+    const binLoc = getSnapshotLoc(csvLoc);
+
+    if (!fs.existsSync(binLoc)) {
+        return false;
+    }
+
+    return fs.statSync(binLoc).mtimeMs >= fs.statSync(csvLoc).mtimeMs;
+}
+
+
+/**
+ * Load a columnar snapshot.
+ *
+ * @param loc Path to the binary snapshot.
+ * @returns Object with regions (names in order of region id), numRows, and columns (Map from
+ *      column name to typed array viewing the file contents without copying).
+ */
+function loadSnapshot(loc) {
+    const contents = fs.readFileSync(loc);
+
+    if (contents.toString("ascii", 0, MAGIC.length) !== MAGIC) {
+        throw "Not a columnar snapshot: " + loc;
+    }
+
+    const headerLength = contents.readUInt32LE(MAGIC.length);
+    const headerEnd = HEADER_START + headerLength;
+    const header = JSON.parse(contents.toString("utf8", HEADER_START, headerEnd));
+    const numRows = header["numRows"];
+
+    const columns = new Map();
+    header["columns"].forEach((column) => {
+        const ArrayType = ARRAY_TYPES[column["type"]];
+        const start = contents.byteOffset + column["offset"];
+        const end = start + numRows * ArrayType.BYTES_PER_ELEMENT;
+
+        // Node may pool small buffers so copy only if the view would be misaligned.
+        const aligned = start % ArrayType.BYTES_PER_ELEMENT == 0;
+        const array = aligned ?
+            new ArrayType(contents.buffer, start, numRows) :
+            new ArrayType(contents.buffer.slice(start, end));
+
+        columns.set(column["name"], array);
+    });
+
+    return {"regions": header["regions"], "numRows": numRows, "columns": columns};
+}
+
+
+export {getSnapshotLoc, hasFreshSnapshot, loadSnapshot};
@@ -0,0 +1,169 @@
+/**
+ * Result store for the standalone engine which persists to a local directory.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import crypto from "crypto";
+import fs from "fs";
+import path from "path";
+
+
+/**
+ * Store which saves JSON values as files in a directory.
+ *
+ * Store which saves JSON values as files in a directory, evicting the least recently used files
+ * when the directory grows beyond a maximum number of bytes. Recency is tracked through file
+ * modification times so multiple processes may share the same directory.
+ */
+class DirectoryStore {
+    /**
+     * Create a new store, making the directory if needed.
+     *
+     * @param directory Path to the directory in which to save results.
+     * @param maxBytes Maximum total size of the files in the directory before evicting.
+     */
+    constructor(directory, maxBytes) {
+        const self = this;
+        self._directory = directory;
+        self._maxBytes = maxBytes;
+
+        fs.mkdirSync(directory, {recursive: true});
+    }
+
+    /**
+     * Get a value, marking it as recently used.
+     *
+     * @param key The key for the value.
+     * @returns The parsed value or null if not found.
+     */
+    get(key) {
+        const self = this;
+        const loc = self._getLoc(key);
+
+        try {
+            const contents = fs.readFileSync(loc);
+            const now = new Date();
+            fs.utimesSync(loc, now, now);
+            return JSON.parse(contents);
+        } catch (error) {
+            if (error.code === "ENOENT") {
+                return null;
+            } else {
+                throw error;
+            }
+        }
+    }
+
+    /**
+     * Save a value, evicting least recently used values if over the maximum size.
+     *
+     * @param key The key for the value.
+     * @param value The value to save which must be serializable to JSON.
+     */
+    set(key, value) {
+        const self = this;
+        const loc = self._getLoc(key);
+
+        // Write then rename so concurrent readers never see partial files.
+        const tempLoc = loc + "." + process.pid + ".tmp";
+        fs.writeFileSync(tempLoc, JSON.stringify(value));
+        fs.renameSync(tempLoc, loc);
+
+        self._evict();
+    }
+
+    /**
+     * Remove all values.
+     */
+    clear() {
+        const self = this;
+        self._listEntries().forEach((entry) => self._remove(entry["loc"]));
+    }
+
+    /**
+     * Remove least recently used files until the directory is within the maximum size.
+     */
+    _evict() {
+        const self = this;
+
+        const entries = self._listEntries();
+        entries.sort((a, b) => a["mtimeMs"] - b["mtimeMs"]);
+
+        let totalBytes = entries.map((x) => x["size"]).reduce((a, b) => a + b, 0);
+        let i = 0;
+        while (totalBytes > self._maxBytes && i < entries.length - 1) {
+            self._remove(entries[i]["loc"]);
+            totalBytes -= entries[i]["size"];
+            i++;
+        }
+    }
+
+    /**
+     * List the result files in the directory.
+     *
+     * @returns Array of objects with loc, size, and mtimeMs for each result file.
+     */
+    _listEntries() {
+        const self = this;
+
+        return fs.readdirSync(self._directory)
+            .filter((name) => name.endsWith(".json"))
+            .map((name) => {
+                const loc = path.join(self._directory, name);
+                try {
+                    const stat = fs.statSync(loc);
+                    return {"loc": loc, "size": stat.size, "mtimeMs": stat.mtimeMs};
+                } catch (error) {
+                    return null; // Removed by another process
+                }
+            })
+            .filter((x) => x !== null);
+    }
+
+    /**
+     * Remove a file, ignoring it if another process already removed it.
+     *
+     * @param loc Path to the file to remove.
+     */
+    _remove(loc) {
+        const self = this;
+        try {
+            fs.unlinkSync(loc);
+        } catch (error) {
+            if (error.code !== "ENOENT") {
+                throw error;
+            }
+        }
+    }
+
+    /**
+     * Get the path at which a key's value is saved.
+     *
+     * @param key The key for the value.
+     * @returns Path to the file for the key.
+     */
+    _getLoc(key) {
+        const self = this;
+        return path.join(self._directory, key + ".json");
+    }
+}
+
+
+/**
+ * Build a content address from string parts.
+ *
+ * @param parts Array of strings to hash.
+ * @returns Hex sha256 hash of the parts.
+ */
+function hashParts(parts) {
+    const hash = crypto.createHash("sha256");
+    parts.forEach((part) => {
+        hash.update(part);
+        hash.update("\0");
+    });
+    return hash.digest("hex");
+}
+
+
+export {DirectoryStore, hashParts};
@@ -0,0 +1,290 @@
+/**
+ * Pool of worker threads applying the polymer and GHG modifier for the standalone engine.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import fs from "fs";
+import os from "os";
+import path from "path";
+import {Worker} from "worker_threads";
+
+import papaparse from "papaparse";
+
+import {packStatesForTransfer, unpackStatesFromTransfer} from "./array_state_bootstrap.js";
+import {ALL_ATTRS} from "./const.js";
+import {buildMatricies} from "./polymers_bootstrap.js";
+
+const MATRIX_FILES = [
+    "live_production_trade_subtype_ratios.csv",
+    "live_polymer_ratios.csv",
+    "resin_trade_supplement.csv",
+];
+const MAX_BATCH_STATES = 10;
+const MAX_BATCHES_PER_WORKER = 1;
+const WORKER_LOC = "./polymer_worker.js";
+
+
+/**
+ * Pool of Node worker threads which add polymers and GHG to states after levers execute.
+ *
+ * Pool of Node worker threads which add polymers and GHG to states after levers execute, mirroring
+ * the browser's PolymerWorkerQueue (see js/driver.js). The polymer matricies are loaded once on
+ * the main thread and shared with every worker through SharedArrayBuffers (see
+ * PolymerMatricies.toMessage). Workers then modify batches of states sent with a single
+ * transferable buffer.
+ * Batches from all outstanding requests (like the years of many jobs) are given to the least
+ * loaded worker as workers free up.
+ */
+class PolymerWorkerPool {
+    /**
+     * Start a new pool.
+     *
+     * @param dataDir Path to the directory with the matrix CSV files (see MATRIX_FILES).
+     * @param numWorkers Optional number of worker threads. Defaults to one fewer than the number
+     *      of CPUs available but at least one.
+     */
+    constructor(dataDir, numWorkers) {
+        const self = this;
+        self._dataDir = dataDir;
+
+        const numWorkersEffective = numWorkers === undefined ? getDefaultWorkerCount() : numWorkers;
+
+        self._pendingBatches = [];
+        self._inFlightBatches = new Map();
+        self._nextBatchId = 0;
+
+        self._workers = [];
+        self._workerLoads = [];
+        self._matriciesMessage = null;
+
+        const matriciesFuture = buildMatricies(buildLocalRowsLoader(dataDir));
+        self._readyFuture = matriciesFuture.then((matricies) => {
+            self._matriciesMessage = matricies.toMessage();
+            for (let i = 0; i < numWorkersEffective; i++) {
+                self._workers.push(self._makeWorker(i));
+                self._workerLoads.push(0);
+            }
+        });
+    }
+
+    /**
+     * Get the paths of the files from which the matricies are loaded.
+     *
+     * @returns Array of file paths such as for fingerprinting cached results.
+     */
+    getDataLocs() {
+        const self = this;
+        return MATRIX_FILES.map((filename) => path.join(self._dataDir, filename));
+    }
+
+    /**
+     * Add polymers and GHG to states.
+     *
+     * @param tasks Array of objects with year (like 2050) and state (Map which can be structured
+     *      cloned so without compiled levers). States are split into batches of contiguous tasks.
+     * @returns Promise resolving to the modified states in the same order as tasks. These are
+     *      new objects and not the states given. Rejects if the matricies could not be loaded.
+     */
+    modify(tasks) {
+        const self = this;
+
+        if (tasks.length == 0) {
+            return Promise.resolve([]);
+        }
+
+        return self._readyFuture.then(() => new Promise((resolve, reject) => {
+            const requestInfo = {
+                "results": new Array(tasks.length),
+                "remaining": 0,
+                "failed": false,
+                "resolve": resolve,
+                "reject": reject,
+            };
+
+            const batchSizeEven = Math.ceil(tasks.length / self._workers.length);
+            const batchSize = Math.min(MAX_BATCH_STATES, batchSizeEven);
+            for (let start = 0; start < tasks.length; start += batchSize) {
+                self._pendingBatches.push({
+                    "request": requestInfo,
+                    "start": start,
+                    "tasks": tasks.slice(start, start + batchSize),
+                });
+                requestInfo["remaining"]++;
+            }
+
+            self._dispatch();
+        }));
+    }
+
+    /**
+     * Stop all worker threads such that the process may exit.
+     *
+     * @returns Promise resolving after all workers stop.
+     */
+    terminate() {
+        const self = this;
+        const startedFuture = self._readyFuture.catch(() => null);
+        return startedFuture.then(() => {
+            return Promise.all(self._workers.map((worker) => worker.terminate()));
+        });
+    }
+
+    /**
+     * Start a worker thread.
+     *
+     * @param workerId The index of the worker in this pool.
+     * @returns The new Worker.
+     */
+    _makeWorker(workerId) {
+        const self = this;
+
+        const worker = new Worker(new URL(WORKER_LOC, import.meta.url), {
+            "workerData": {"matricies": self._matriciesMessage},
+        });
+
+        worker.on("message", (response) => self._onResponse(workerId, response));
+        worker.on("error", (error) => self._onError(workerId, error));
+
+        return worker;
+    }
+
+    /**
+     * Send pending batches to the least loaded workers until all workers are at capacity.
+     */
+    _dispatch() {
+        const self = this;
+
+        while (self._pendingBatches.length > 0) {
+            const minLoad = Math.min(...self._workerLoads);
+            if (minLoad >= MAX_BATCHES_PER_WORKER) {
+                return;
+            }
+
+            const workerId = self._workerLoads.indexOf(minLoad);
+            const batch = self._pendingBatches.shift();
+            const batchId = self._nextBatchId;
+            self._nextBatchId++;
+
+            const packed = packStatesForTransfer(batch["tasks"].map((x) => x["state"]));
+
+            const requestObj = {
+                "batchId": batchId,
+                "years": batch["tasks"].map((x) => x["year"]),
+                "states": packed["states"],
+                "attrs": ALL_ATTRS,
+            };
+
+            batch["workerId"] = workerId;
+            self._inFlightBatches.set(batchId, batch);
+            self._workerLoads[workerId]++;
+            self._workers[workerId].postMessage(requestObj, packed["transfer"]);
+        }
+    }
+
+    /**
+     * Process a response from a worker.
+     *
+     * @param workerId The index of the worker which sent the response.
+     * @param response Response from the worker thread.
+     */
+    _onResponse(workerId, response) {
+        const self = this;
+
+        const batchId = response["batchId"];
+        const batch = self._inFlightBatches.get(batchId);
+        self._inFlightBatches.delete(batchId);
+        self._workerLoads[workerId]--;
+
+        const requestInfo = batch["request"];
+        if (response["error"] !== null) {
+            self._failRequest(requestInfo, response["error"]);
+        } else if (!requestInfo["failed"]) {
+            const states = unpackStatesFromTransfer(response["states"]);
+            states.forEach((state, i) => {
+                requestInfo["results"][batch["start"] + i] = state;
+            });
+
+            requestInfo["remaining"]--;
+            if (requestInfo["remaining"] == 0) {
+                requestInfo["resolve"](requestInfo["results"]);
+            }
+        }
+
+        self._dispatch();
+    }
+
+    /**
+     * Fail the requests with batches on a worker which stopped due to an uncaught error.
+     *
+     * @param workerId The index of the worker which failed.
+     * @param error The error thrown within the worker.
+     */
+    _onError(workerId, error) {
+        const self = this;
+
+        const failedIds = Array.of(...self._inFlightBatches.entries())
+            .filter((entry) => entry[1]["workerId"] == workerId)
+            .map((entry) => entry[0]);
+
+        failedIds.forEach((batchId) => {
+            const batch = self._inFlightBatches.get(batchId);
+            self._inFlightBatches.delete(batchId);
+            self._failRequest(batch["request"], error);
+        });
+
+        self._workers[workerId] = self._makeWorker(workerId);
+        self._workerLoads[workerId] = 0;
+        self._dispatch();
+    }
+
+    /**
+     * Reject a request, dropping any of its batches not yet sent to a worker.
+     *
+     * @param requestInfo The record for the request which failed.
+     * @param error The reason for the failure.
+     */
+    _failRequest(requestInfo, error) {
+        const self = this;
+
+        if (requestInfo["failed"]) {
+            return;
+        }
+
+        requestInfo["failed"] = true;
+        self._pendingBatches = self._pendingBatches.filter((x) => x["request"] !== requestInfo);
+        requestInfo["reject"](error);
+    }
+}
+
+
+/**
+ * Build a function which loads the rows of a matrix CSV file from a local directory.
+ *
+ * @param dataDir Path to the directory with the matrix CSV files like live_polymer_ratios.csv.
+ * @returns Function taking a filename and returning a promise resolving to the parsed rows.
+ */
+function buildLocalRowsLoader(dataDir) {
+    return (filename) => {
+        return fs.promises.readFile(path.join(dataDir, filename))
+            .then((x) => x.toString())
+            .then((x) => papaparse.parse(x, {header: true, dynamicTyping: true}))
+            .then((x) => x["data"]);
+    };
+}
+
+
+/**
+ * Determine how many worker threads to start.
+ *
+ * @returns One fewer than the number of CPUs available but at least one.
+ */
+function getDefaultWorkerCount() {
+    const cpus = typeof os.availableParallelism === "function" ?
+        os.availableParallelism() :
+        os.cpus().length;
+    return Math.max(1, cpus - 1);
+}
+
+
+export {PolymerWorkerPool};
@@ -0,0 +1,47 @@
+/**
+ * Worker thread for the standalone engine which adds polymers and GHG to states.
+ *
+ * Worker thread for the standalone engine which adds polymers and GHG to states using the same
+ * StateModifier as the browser web worker (js/polymers.js) and the same batch protocol. The
+ * polymer matricies are loaded once by the PolymerWorkerPool and given in workerData.
+ *
+ * @license BSD, see LICENSE.md
+ */
+
+import {parentPort, workerData} from "worker_threads";
+
+import {packStatesForTransfer, unpackStatesFromTransfer} from "./array_state_bootstrap.js";
+import {buildPolymerMatriciesFromMessage, StateModifier} from "./polymers_bootstrap.js";
+
+
+/**
+ * Listen for batches of states from the parent thread.
+ */
+function main() {
+    const matricies = buildPolymerMatriciesFromMessage(workerData["matricies"]);
+    const modifier = new StateModifier(matricies);
+
+    parentPort.on("message", (batch) => {
+        const batchId = batch["batchId"];
+        const years = batch["years"];
+        const states = unpackStatesFromTransfer(batch["states"]);
+        const attrs = batch["attrs"];
+        const stages = batch["stages"];
+
+        try {
+            states.forEach((state, i) => modifier.modify(years[i], state, attrs, stages));
+        } catch (error) {
+            parentPort.postMessage({"batchId": batchId, "error": error.toString()});
+            return;
+        }
+
+        const packed = packStatesForTransfer(states);
+        parentPort.postMessage(
+            {"batchId": batchId, "states": packed["states"], "error": null, "years": years},
+            packed["transfer"],
+        );
+    });
+}
+
+
+main();
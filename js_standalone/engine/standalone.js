@@ -5,10 +5,25 @@
  */
 
 import fs from "fs";
+import path from "path";
 
 import papaparse from "papaparse";
 import handlebars from "handlebars";
 
+import {ArrayOutputs, StateSchema} from "./array_state_bootstrap.js";
+import {hasFreshSnapshot, getSnapshotLoc, loadSnapshot} from "./columnar.js";
+import {CONSUMPTION_ATTRS} from "./const.js";
+import {DirectoryStore, hashParts} from "./directory_store.js";
+import {PolymerWorkerPool} from "./polymer_pool.js";
+import {ProgramChain} from "./program_chain.js";
+import {
+    DEFAULT_SAMPLING,
+    makeRandomSeed,
+    makeTrialRandomSource,
+    RandomSource,
+} from "./random.js";
+import {ResultCache} from "./result_cache.js";
+import {RunningStats} from "./running_stats.js";
 import {CompileVisitor, toolkit} from "./standalone_visitors.js";
 
 const DATA_ATTRS = [
@@ -33,7 +48,36 @@ const DATA_ATTRS = [
 ];
 
 const NUM_ARGS = 3;
-const USAGE_STR = "USAGE: npm run standalone [job] [output] [error]";
+const NUM_ARGS_CACHED = 4;
+const BATCH_FLAG = "--batch";
+const MONTE_CARLO_FLAG = "--montecarlo";
+const USAGE_STR = [
+    "USAGE: npm run standalone [job] [output] [error] [optional cache dir]",
+    "   or: npm run batch [batch] [output dir] [error] [optional cache dir]",
+    "   or: npm run montecarlo [monte carlo job] [output dir] [error]",
+].join("\n");
+const CACHE_MAX_BYTES = 256 * 1024 * 1024;
+const SERIALIZED_DETAILS = ["polymers", "ghg"];
+
+const MONTE_CARLO_BATCH_SIZE = 256;
+const MONTE_CARLO_DECIMALS = 6;
+const MONTE_CARLO_REGION_LABELS = {
+    "china": "China",
+    "eu30": "EU 30",
+    "nafta": "N America",
+    "row": "Majority World",
+    "global": "Global",
+};
+const MONTE_CARLO_VARIABLES = [
+    {"name": "simLandfillWasteMt", "attrs": ["eolLandfillMT"]},
+    {"name": "simMismanagedWasteMt", "attrs": ["eolMismanagedMT"]},
+    {"name": "simIncineratedWasteMt", "attrs": ["eolIncinerationMT"]},
+    {"name": "simRecycledWasteMt", "attrs": ["eolRecyclingMT"]},
+    {"name": "totalConsumptionMt", "attrs": CONSUMPTION_ATTRS},
+    {"name": "totalGhgCO2eMt", "attrs": null, "ghg": "overallGhg"}, // From polymer pool
+    {"name": "primaryProductionMt", "attrs": ["primaryProductionMT"]},
+    {"name": "secondaryProductionMt", "attrs": ["secondaryProductionMT"]},
+];
 
 
 /**
@@ -61,167 +105,341 @@ function writeJson(payload, loc) {
 
 
 /**
- * Scaffold the workspace.
+ * Load the business as usual data, indexing rows by year.
  *
- * @param jobInfo Contents of the JSON job description file.
- * @returns Promsie that resolves after the workspace is created.
+ * Load the business as usual data, indexing rows by year. If a columnar snapshot of the CSV file
+ * exists (see support/columnar_data.py) and is at least as new as the CSV, it is read instead to
+ * avoid parsing text.
+ *
+ * @param loc File path to the CSV file with business as usual projections.
+ * @returns Promise resolving to a Map from year to the rows (objects with region and parsed
+ *      DATA_ATTRS values) for that year.
  */
-function buildWorkspace(jobInfo) {
-    const loadOutputData = (loc, targetYear) => {
-        const loadRawData = () => {
-            const results = [];
+function loadData(loc) {
+    if (hasFreshSnapshot(loc)) {
+        return new Promise((resolve) => {
+            resolve(loadDataSnapshot(getSnapshotLoc(loc)));
+        });
+    } else {
+        return loadDataCsv(loc);
+    }
+}
 
-            return new Promise((resolve, reject) => {
-                fs.createReadStream(loc)
-                    .pipe(papaparse.parse(
-                        papaparse.NODE_STREAM_INPUT,
-                        {header: true},
-                    ))
-                    .on("data", (data) => {
-                        const year = parseInt(data["year"]);
-                        const included = year == targetYear;
-                        if (included) {
-                            results.push(data);
-                        }
-                    })
-                    .on("end", () => {
-                        resolve(results);
-                    })
-                    .on("error", () => {
-                        reject(results);
-                    });
-            });
-        };
 
-        const createOutputs = (rawData) => {
-            const workspaceOut = new Map();
-            rawData.forEach((row) => {
-                const region = row["region"];
+/**
+ * Index the rows of a columnar snapshot by year.
+ *
+ * @param loc File path to the binary snapshot.
+ * @returns Map from year to the rows for that year like from loadDataCsv.
+ */
+function loadDataSnapshot(loc) {
+    const snapshot = loadSnapshot(loc);
+    const regions = snapshot["regions"];
+    const columns = snapshot["columns"];
+    const years = columns.get("year");
+    const regionIds = columns.get("region");
+
+    const rowsByYear = new Map();
+    for (let i = 0; i < snapshot["numRows"]; i++) {
+        const year = years[i];
+
+        if (!rowsByYear.has(year)) {
+            rowsByYear.set(year, []);
+        }
+
+        const values = new Map();
+        DATA_ATTRS.forEach((attr) => {
+            values.set(attr, columns.get(attr)[i]);
+        });
 
-                if (!workspaceOut.has(region)) {
-                    workspaceOut.set(region, new Map());
+        rowsByYear.get(year).push({"region": regions[regionIds[i]], "values": values});
+    }
+
+    return rowsByYear;
+}
+
+
+/**
+ * Parse the business as usual data CSV, indexing rows by year.
+ *
+ * @param loc File path to the CSV file.
+ * @returns Promise resolving to a Map from year to the rows for that year.
+ */
+function loadDataCsv(loc) {
+    return new Promise((resolve, reject) => {
+        const rowsByYear = new Map();
+
+        fs.createReadStream(loc)
+            .pipe(papaparse.parse(
+                papaparse.NODE_STREAM_INPUT,
+                {header: true},
+            ))
+            .on("data", (data) => {
+                const year = parseInt(data["year"]);
+
+                if (!rowsByYear.has(year)) {
+                    rowsByYear.set(year, []);
                 }
 
-                const workspaceRegion = workspaceOut.get(region);
+                const values = new Map();
                 DATA_ATTRS.forEach((attr) => {
-                    const value = parseFloat(row[attr]);
-                    workspaceRegion.set(attr, value);
+                    values.set(attr, parseFloat(data[attr]));
                 });
-                workspaceRegion.set("eolReuseMT", 0);
+
+                rowsByYear.get(year).push({"region": data["region"], "values": values});
+            })
+            .on("end", () => {
+                resolve(rowsByYear);
+            })
+            .on("error", (error) => {
+                reject(error);
             });
+    });
+}
 
-            return workspaceOut;
-        };
 
-        return loadRawData().then(createOutputs);
+/**
+ * Determine which years a job should simulate.
+ *
+ * @param jobInfo Contents of the JSON job description which may have a single year, a list of
+ *      years, or a range of years like {"start": 2024, "end": 2049} with the end inclusive.
+ * @returns Array of years to simulate.
+ */
+function getJobYears(jobInfo) {
+    const years = jobInfo["years"];
+
+    if (years === undefined) {
+        return [jobInfo["year"]];
+    } else if (Array.isArray(years)) {
+        return years;
+    } else {
+        const yearsRange = [];
+        for (let year = years["start"]; year <= years["end"]; year++) {
+            yearsRange.push(year);
+        }
+        return yearsRange;
+    }
+}
+
+
+/**
+ * Scaffold the workspace.
+ *
+ * @param jobInfo Contents of the JSON job description file.
+ * @param dataByYear Map from year to rows as returned by loadData.
+ * @param targetYear The year for which the workspace should be built.
+ * @returns Newly created workspace for the job.
+ */
+function buildWorkspace(jobInfo, dataByYear, targetYear) {
+    const createOutputs = () => {
+        const baselineInfo = buildBaseline(dataByYear, targetYear);
+        return new ArrayOutputs(baselineInfo["schema"], baselineInfo["baseline"]);
     };
 
-    const loadInputs = (rawInputs) => {
-        return new Promise((resolve) => {
-            const inputMap = new Map();
-            rawInputs.forEach((lever) => {
-                inputMap.set(lever["lever"], lever["value"]);
-            });
-            resolve(inputMap);
+    const createInputs = (rawInputs) => {
+        const inputMap = new Map();
+        rawInputs.forEach((lever) => {
+            inputMap.set(lever["lever"], lever["value"]);
         });
+        return inputMap;
     };
 
-    const loadMeta = (targetYear) => {
-        return new Promise((resolve) => {
-            const workspaceMeta = new Map();
-            workspaceMeta.set("year", targetYear);
-            resolve(workspaceMeta);
-        });
+    const createMeta = () => {
+        const workspaceMeta = new Map();
+        workspaceMeta.set("year", targetYear);
+
+        // Draws are reproducible if the job gives a seed with each year using its own stream.
+        if (jobInfo["seed"] !== undefined) {
+            workspaceMeta.set("random", new RandomSource(jobInfo["seed"], targetYear));
+        }
+
+        return workspaceMeta;
     };
 
-    const promises = [
-        loadOutputData(jobInfo["data"], jobInfo["year"]),
-        loadInputs(jobInfo["inputs"]),
-        loadMeta(jobInfo["year"]),
-    ];
+    const workspace = new Map();
+    workspace.set("out", createOutputs());
+    workspace.set("in", createInputs(jobInfo["inputs"]));
+    workspace.set("meta", createMeta());
 
-    return Promise.all(promises).then((results) => {
-        const outputs = results[0];
-        const inputs = results[1];
-        const meta = results[2];
+    return workspace;
+}
 
-        const workspace = new Map();
-        workspace.set("out", outputs);
-        workspace.set("in", inputs);
-        workspace.set("meta", meta);
 
-        return workspace;
+/**
+ * Lay out the business as usual outputs for a year in a Float64Array.
+ *
+ * @param dataByYear Map from year to rows as returned by loadData.
+ * @param year The year to simulate.
+ * @returns Object with the StateSchema and a Float64Array of baseline values in that layout.
+ */
+function buildBaseline(dataByYear, year) {
+    if (!dataByYear.has(year)) {
+        throw "Could not find data for " + year;
+    }
+
+    const rows = dataByYear.get(year);
+    const regions = rows.map((row) => row["region"]);
+    const schema = new StateSchema(regions, DATA_ATTRS.concat(["eolReuseMT"]));
+
+    const baseline = new Float64Array(schema.getSize());
+    rows.forEach((row) => {
+        row["values"].forEach((value, attr) => {
+            baseline[schema.getOffset(row["region"], attr)] = value;
+        });
     });
+
+    return {"schema": schema, "baseline": baseline};
 }
 
 
 /**
- * Build lever representations.
+ * Parse and compile a plastics language program.
  *
- * @param jobInfo Contents of the JSON job description file.
- * @returns Promise resolving to the levers with compiled code.
+ * @param input The plastics language source code.
+ * @param loc Description of where the code came from for error messages.
+ * @returns The compiled program or null if the source is empty.
  */
-function buildLevers(jobInfo) {
-    const parseProgram = (input, loc) => {
-        if (input.replaceAll("\n", "").replaceAll(" ", "") === "") {
-            return null;
-        }
+function parseProgram(input, loc) {
+    return compileProgram(input, loc)["program"];
+}
 
-        const errors = [];
 
-        const chars = new toolkit.antlr4.InputStream(input);
-        const lexer = new toolkit.PlasticsLangLexer(chars);
-        lexer.removeErrorListeners();
-        lexer.addErrorListener({
-            syntaxError: (recognizer, offendingSymbol, line, column, msg, err) => {
-                const result = `${loc} line ${line} col ${column}: ${msg}`;
-                errors.push(result);
-            },
-        });
+/**
+ * Parse and compile a plastics language program, reporting the variables it accesses.
+ *
+ * @param input The plastics language source code.
+ * @param loc Description of where the code came from for error messages.
+ * @returns Object with program (compiled program or null if the source is empty), reads (array
+ *      of non-local variables read), and writes (array of non-local variables written).
+ */
+function compileProgram(input, loc) {
+    if (input.replaceAll("\n", "").replaceAll(" ", "") === "") {
+        return {"program": null, "reads": [], "writes": []};
+    }
 
-        const tokens = new toolkit.antlr4.CommonTokenStream(lexer);
-        const parser = new toolkit.PlasticsLangParser(tokens);
+    const errors = [];
 
-        parser.buildParsePlastics = true;
-        parser.removeErrorListeners();
-        parser.addErrorListener({
-            syntaxError: (recognizer, offendingSymbol, line, column, msg, err) => {
-                const result = `${loc} line ${line}, col ${column}: ${msg}`;
-                errors.push(result);
-            },
-        });
+    const chars = new toolkit.antlr4.InputStream(input);
+    const lexer = new toolkit.PlasticsLangLexer(chars);
+    lexer.removeErrorListeners();
+    lexer.addErrorListener({
+        syntaxError: (recognizer, offendingSymbol, line, column, msg, err) => {
+            const result = `${loc} line ${line} col ${column}: ${msg}`;
+            errors.push(result);
+        },
+    });
 
-        const programUncompiled = parser.program();
+    const tokens = new toolkit.antlr4.CommonTokenStream(lexer);
+    const parser = new toolkit.PlasticsLangParser(tokens);
 
-        if (errors.length > 0) {
-            throw errors[0];
-        }
+    parser.buildParsePlastics = true;
+    parser.removeErrorListeners();
+    parser.addErrorListener({
+        syntaxError: (recognizer, offendingSymbol, line, column, msg, err) => {
+            const result = `${loc} line ${line}, col ${column}: ${msg}`;
+            errors.push(result);
+        },
+    });
 
-        const program = programUncompiled.accept(new CompileVisitor());
-        if (errors.length > 0) {
-            throw errors[0];
-        }
+    const programUncompiled = parser.program();
+
+    if (errors.length > 0) {
+        throw errors[0];
+    }
+
+    const visitor = new CompileVisitor();
+    const program = programUncompiled.accept(visitor);
+    if (errors.length > 0) {
+        throw errors[0];
+    }
+
+    return {
+        "program": program,
+        "reads": visitor.getReads(),
+        "writes": visitor.getWrites(),
+        "stochastic": visitor.isStochastic(),
+    };
+}
 
-        return program;
+
+/**
+ * Determine if the levers directory has a bundle at least as new as its templates.
+ *
+ * @param baseUrl Path to the levers directory with index.json and the pt templates.
+ * @returns True if bundle.json can be used in place of rendering the templates and false otherwise.
+ */
+function hasFreshBundle(baseUrl) {
+    const bundleLoc = path.join(baseUrl, "bundle.json");
+
+    if (!fs.existsSync(bundleLoc)) {
+        return false;
+    }
+
+    const templateLocs = fs.readdirSync(baseUrl)
+        .filter((filename) => filename.endsWith(".pt") || filename === "index.json")
+        .map((filename) => path.join(baseUrl, filename));
+
+    const bundleTime = fs.statSync(bundleLoc).mtimeMs;
+    return templateLocs.every((loc) => fs.statSync(loc).mtimeMs <= bundleTime);
+}
+
+
+/**
+ * Build lever representations.
+ *
+ * Build lever representations, using the sources pre-rendered into bundle.json by
+ * support/render_bundle.py if found in the levers directory and no template is newer than it.
+ * Otherwise each template is rendered. The source used is logged.
+ *
+ * @param jobInfo Contents of the JSON job description file.
+ * @returns Promise resolving to the levers with rendered source, compiled code, and the
+ *      variables read and written by that code.
+ */
+function buildLevers(jobInfo) {
+    const baseUrl = jobInfo["levers"];
+    const bundleLoc = baseUrl + "/bundle.json";
+    const useBundle = hasFreshBundle(baseUrl);
+    const bundleFuture = useBundle ? loadJson(bundleLoc) : Promise.resolve(null);
+
+    if (useBundle) {
+        console.log("levers: using " + bundleLoc);
+    } else if (fs.existsSync(bundleLoc)) {
+        console.log("levers: rendering templates as " + bundleLoc + " is older than them");
+    } else {
+        console.log("levers: rendering templates as " + bundleLoc + " not found");
+    }
+
+    const compileSource = (source, loc) => {
+        const compiled = compileProgram(source, loc);
+        compiled["source"] = source;
+        return compiled;
     };
 
-    const loadProgram = (loc, templateVals) => {
+    const loadProgram = (loc, templateVals, variable, bundle) => {
+        const hasBundled = bundle !== null && bundle["levers"][variable] !== undefined;
+        if (hasBundled) {
+            return Promise.resolve(compileSource(bundle["levers"][variable], bundleLoc));
+        }
+
         return fs.promises.readFile(loc)
             .then((x) => x.toString())
             .then((x) => handlebars.compile(x))
             .then((x) => x(templateVals))
-            .then((x) => parseProgram(x, loc));
+            .then((x) => compileSource(x, loc));
     };
 
-    const baseUrl = jobInfo["levers"];
-
-    return loadJson(baseUrl + "/index.json")
+    const indexFuture = loadJson(baseUrl + "/index.json")
         .then((rawResult) => {
             return rawResult["categories"].flatMap(
                 (category) => category["levers"],
             );
-        })
-        .then((leversRaw) => {
+        });
+
+    return Promise.all([indexFuture, bundleFuture])
+        .then((results) => {
+            const leversRaw = results[0];
+            const bundle = results[1];
+
             return new Promise((resolve, reject) => {
                 const programFutures = leversRaw.map((raw) => {
                     const fullUrl = baseUrl + "/" + raw["template"];
@@ -229,12 +447,17 @@ function buildLevers(jobInfo) {
                     return {
                         "url": fullUrl,
                         "templateVals": templateVals,
+                        "variable": raw["variable"],
                     };
-                }).map((x) => loadProgram(x["url"], x["templateVals"]));
+                }).map((x) => loadProgram(x["url"], x["templateVals"], x["variable"], bundle));
 
                 Promise.all(programFutures).then((programs) => {
                     for (let i = 0; i < programs.length; i++) {
-                        leversRaw[i]["compiled"] = programs[i];
+                        leversRaw[i]["source"] = programs[i]["source"];
+                        leversRaw[i]["compiled"] = programs[i]["program"];
+                        leversRaw[i]["reads"] = programs[i]["reads"];
+                        leversRaw[i]["writes"] = programs[i]["writes"];
+                        leversRaw[i]["stochastic"] = programs[i]["stochastic"];
                     }
 
                     resolve(leversRaw);
@@ -271,12 +494,31 @@ function consolidateWorkspace(workspace, levers) {
 /**
  * Execute all of the levers in a workspace.
  *
+ * Execute all of the levers in a workspace. If a ProgramChain is given, checkpoints from the last
+ * workspace run for the same year are reused such that only levers from the first one affected by
+ * changed inputs are executed.
+ *
  * @param workspace The workspace in which to execute.
- * @returns Reference to workspace which was modified in place.
+ * @param chain Optional ProgramChain in which to keep checkpoints.
+ * @returns Reference to workspace which was modified in place or, if a chain is given, the
+ *      workspace after executing which may be a different object.
  */
-function executeWorkspace(workspace) {
-    const levers = workspace.get("levers");
-    levers.filter((x) => x["compiled"] !== null).forEach((lever) => {
+function executeWorkspace(workspace, chain) {
+    const levers = workspace.get("levers").filter((x) => x["compiled"] !== null);
+
+    if (chain !== undefined) {
+        const steps = levers.map((lever) => {
+            return {
+                "program": lever["compiled"],
+                "reads": lever["reads"],
+                "writes": lever["writes"],
+                "stochastic": lever["stochastic"],
+            };
+        });
+        return chain.run(workspace.get("meta").get("year"), workspace, steps);
+    }
+
+    levers.forEach((lever) => {
         workspace.set("local", new Map());
         workspace.set("inspect", []);
         lever["compiled"](workspace);
@@ -288,6 +530,11 @@ function executeWorkspace(workspace) {
 /**
  * Serialize outputs from having run a simulation in the stand-alone engine.
  *
+ * Serialize outputs from having run a simulation in the stand-alone engine. If polymers and GHG
+ * were added to the workspace (see PolymerWorkerPool), their values are included alongside the
+ * other attributes of each region with names joined by periods like ghg.overallGhg or
+ * polymers.consumption.pet.
+ *
  * @param workspace The workspace to serialize.
  * @returns The serialization (simple JS object).
  */
@@ -301,51 +548,704 @@ function serializeOutputs(workspace) {
         });
         output[region] = regionOutput;
     });
+
+    const addDetails = (regionOutput, prefix, details) => {
+        details.forEach((value, name) => {
+            const fullName = prefix + "." + name;
+            if (value instanceof Map) {
+                addDetails(regionOutput, fullName, value);
+            } else {
+                regionOutput[fullName] = value;
+            }
+        });
+    };
+
+    SERIALIZED_DETAILS.filter((key) => workspace.has(key)).forEach((key) => {
+        workspace.get(key).forEach((regionDetails, region) => {
+            if (output[region] === undefined) {
+                output[region] = {};
+            }
+            addDetails(output[region], key, regionDetails);
+        });
+    });
+
     return output;
 }
 
 
 /**
- * Main script entry point
+ * Get a copy of a workspace which can be sent to a worker thread.
+ *
+ * @param workspace The workspace after executing levers.
+ * @returns New state Map sharing the values of the workspace but without the compiled levers.
  */
-function main() {
-    if (process.argv.length != NUM_ARGS + 2) {
-        console.error(USAGE_STR);
+function getTransferableState(workspace) {
+    const state = new Map(workspace);
+    state.delete("levers");
+    return state;
+}
+
+
+/**
+ * Sort levers into the order in which they should execute.
+ *
+ * @param levers The levers to sort which will be sorted in place.
+ * @returns Reference to the levers after sorting by priority then variable name.
+ */
+function sortLevers(levers) {
+    levers.sort((a, b) => {
+        const diff = a["priority"] - b["priority"];
+        if (Math.abs(diff) < 0.00001) {
+            return a["variable"].localeCompare(b["variable"]);
+        } else {
+            return diff;
+        }
+    });
+    return levers;
+}
+
+
+/**
+ * Run a single job against already loaded data and levers.
+ *
+ * Run a single job against already loaded data and levers. Levers execute on the main thread for
+ * every year before, if a pool is given, the workspaces for all years are sent to its worker
+ * threads to add polymers and GHG.
+ *
+ * @param jobInfo Description of the job including year (or years) and inputs.
+ * @param dataByYear Map from year to rows as returned by loadData.
+ * @param levers The compiled and sorted levers.
+ * @param chain Optional ProgramChain shared across jobs with the same data and levers such that
+ *      jobs differing in only a few inputs re-run only the affected levers.
+ * @param pool Optional PolymerWorkerPool with which to add polymers and GHG. If not given or
+ *      null, only the outputs from the levers are reported.
+ * @returns Promise resolving to the serialized outputs of the simulation. If the job specifies
+ *      years instead of a single year, this is an object mapping from year to the outputs for
+ *      that year.
+ */
+function runJob(jobInfo, dataByYear, levers, chain, pool) {
+    const executeYear = (year) => {
+        const workspace = buildWorkspace(jobInfo, dataByYear, year);
+        consolidateWorkspace(workspace, levers);
+        return executeWorkspace(workspace, chain);
+    };
+
+    const years = getJobYears(jobInfo);
+    const workspaces = years.map(executeYear);
+
+    const hasPool = pool !== undefined && pool !== null;
+    const modifiedFuture = hasPool ? pool.modify(years.map((year, i) => {
+        return {"year": year, "state": getTransferableState(workspaces[i])};
+    })) : Promise.resolve(workspaces);
+
+    return modifiedFuture.then((states) => {
+        if (jobInfo["years"] === undefined) {
+            return serializeOutputs(states[0]);
+        } else {
+            const output = {};
+            years.forEach((year, i) => {
+                output[year] = serializeOutputs(states[i]);
+            });
+            return output;
+        }
+    });
+}
+
+
+/**
+ * Build a result cache backed by a local directory.
+ *
+ * @param cacheDir Path to the cache directory or undefined if caching is not requested.
+ * @returns The ResultCache or null if caching is not requested.
+ */
+function buildCache(cacheDir) {
+    if (cacheDir === undefined) {
+        return null;
+    } else {
+        return new ResultCache(new DirectoryStore(cacheDir, CACHE_MAX_BYTES));
+    }
+}
+
+
+/**
+ * Start a pool of worker threads adding polymers and GHG if requested.
+ *
+ * @param jobInfo Contents of the JSON job or batch description which may have polymerData, the
+ *      path to the directory with the polymer matrix CSV files (like ../data).
+ * @returns The PolymerWorkerPool or null if polymerData is not given.
+ */
+function buildPool(jobInfo) {
+    if (jobInfo["polymerData"] === undefined) {
+        return null;
+    } else {
+        return new PolymerWorkerPool(jobInfo["polymerData"]);
+    }
+}
+
+
+/**
+ * Stop the worker threads of a pool if one is in use.
+ *
+ * @param pool The PolymerWorkerPool or null if polymers were not requested.
+ * @returns Promise resolving after the workers stop.
+ */
+function terminatePool(pool) {
+    if (pool === null) {
+        return Promise.resolve();
+    } else {
+        return pool.terminate();
+    }
+}
+
+
+/**
+ * Read the source of every engine module for fingerprinting cached results.
+ *
+ * Read the source of every JavaScript file in the engine directory in filename order, matching
+ * get_context_hash in support/build_scenarios.py, such that modules added later (or copied in by
+ * support/preprocess_visitors.sh) are included without being listed.
+ *
+ * @returns Array of Buffers with the contents of each file.
+ */
+function readEngineSources() {
+    const engineDir = new URL(".", import.meta.url);
+    return fs.readdirSync(engineDir)
+        .filter((filename) => filename.endsWith(".js"))
+        .sort()
+        .map((filename) => fs.readFileSync(new URL(filename, engineDir)));
+}
+
+
+/**
+ * Build a function which runs jobs, consulting a result cache if given.
+ *
+ * Build a function which runs jobs, consulting a result cache if given. Results are keyed by a
+ * hash of the job (year or years along with inputs), the rendered lever sources and metadata, the
+ * contents of the data file (and polymer matricies if used), and the engine code. Jobs run by the
+ * same function share a ProgramChain such that consecutive jobs only re-run levers affected by
+ * their differing inputs.
+ *
+ * @param dataLoc Path to the data file used to fingerprint the data.
+ * @param dataByYear Map from year to rows as returned by loadData.
+ * @param levers The compiled and sorted levers.
+ * @param cache The ResultCache to use or null if results should not be cached.
+ * @param pool The PolymerWorkerPool with which to add polymers and GHG or null if not requested.
+ * @returns Function which takes a job description and returns a promise resolving to the
+ *      serialized outputs.
+ */
+function buildJobRunner(dataLoc, dataByYear, levers, cache, pool) {
+    const chain = new ProgramChain();
+    const runUncached = (jobInfo) => runJob(jobInfo, dataByYear, levers, chain, pool);
+
+    if (cache === null) {
+        return runUncached;
+    }
+
+    const engineSources = readEngineSources();
+    const leverDescriptions = levers.map((lever) => {
+        return {
+            "variable": lever["variable"],
+            "default": lever["default"],
+            "priority": lever["priority"],
+            "source": lever["source"],
+        };
+    });
+
+    const polymerDataLocs = pool === null ? [] : pool.getDataLocs();
+
+    const contextKey = hashParts([
+        hashParts(engineSources),
+        hashParts([fs.readFileSync(dataLoc)]),
+        hashParts(polymerDataLocs.map((x) => fs.readFileSync(x))),
+        JSON.stringify(leverDescriptions),
+    ]);
+
+    return (jobInfo) => {
+        const jobDescription = {
+            "year": jobInfo["year"],
+            "years": jobInfo["years"],
+            "inputs": jobInfo["inputs"],
+            "seed": jobInfo["seed"],
+        };
+        const key = hashParts([contextKey, JSON.stringify(jobDescription)]);
+
+        const cached = cache.get(key);
+        if (cached !== null) {
+            return Promise.resolve(cached);
+        }
+
+        return runUncached(jobInfo).then((output) => {
+            cache.set(key, output);
+            return output;
+        });
+    };
+}
+
+
+/**
+ * Report hit and miss statistics for a result cache if one is in use.
+ *
+ * @param cache The ResultCache or null if caching was not requested.
+ */
+function logCacheStats(cache) {
+    if (cache === null) {
         return;
     }
 
-    const jobLoc = process.argv[2];
-    const outputLoc = process.argv[3];
-    const errorLoc = process.argv[4];
+    const stats = cache.getStats();
+    console.log("cache hits: " + stats["hits"] + ", misses: " + stats["misses"]);
+}
+
+
+/**
+ * Execute a single job described by a JSON file.
+ *
+ * @param jobLoc Path to the JSON job description.
+ * @param outputLoc Path where the JSON outputs should be written.
+ * @param errorLoc Path where an error message should be written if the job fails.
+ * @param cacheDir Optional path to a directory in which results should be cached.
+ */
+function mainSingle(jobLoc, outputLoc, errorLoc, cacheDir) {
+    const cache = buildCache(cacheDir);
     const jobFuture = loadJson(jobLoc);
+    const dataFuture = jobFuture.then((jobInfo) => loadData(jobInfo["data"]));
+    const leversFuture = jobFuture.then(buildLevers).then(sortLevers);
+    let pool = null;
 
-    const futureWorkspace = jobFuture.then(buildWorkspace);
-    const futureLevers = jobFuture.then(buildLevers).then((levers) => {
-        levers.sort((a, b) => {
-            const diff = a["priority"] - b["priority"];
-            if (Math.abs(diff) < 0.00001) {
-                return a["variable"].localeCompare(b["variable"]);
-            } else {
-                return diff;
+    const run = (jobInfo, dataByYear, levers) => {
+        pool = buildPool(jobInfo);
+        const runner = buildJobRunner(jobInfo["data"], dataByYear, levers, cache, pool);
+        return runner(jobInfo);
+    };
+
+    Promise.all([jobFuture, dataFuture, leversFuture])
+        .then((x) => run(x[0], x[1], x[2]))
+        .then((output) => writeJson(output, outputLoc))
+        .then(
+            (x) => {
+                logCacheStats(cache);
+                console.log("done");
+            },
+            (x) => {
+                console.log("error: " + x);
+                return fs.promises.writeFile(errorLoc, "" + x);
+            },
+        )
+        .then(() => terminatePool(pool));
+}
+
+
+/**
+ * Execute many jobs, loading data and compiling levers only once.
+ *
+ * Execute a batch of jobs described by a single JSON file with shared levers and data along with
+ * a jobs array where each job has a name, year, and inputs. The outputs for each job are written
+ * to [output dir]/[name].json. Failures for individual jobs are collected into the error file
+ * without stopping the other jobs.
+ *
+ * @param batchLoc Path to the JSON batch description.
+ * @param outputDir Directory in which job outputs should be written.
+ * @param errorLoc Path where error messages should be written if any job fails.
+ * @param cacheDir Optional path to a directory in which results should be cached.
+ */
+function mainBatch(batchLoc, outputDir, errorLoc, cacheDir) {
+    const cache = buildCache(cacheDir);
+    const batchFuture = loadJson(batchLoc);
+    const dataFuture = batchFuture.then((batchInfo) => loadData(batchInfo["data"]));
+    const leversFuture = batchFuture.then(buildLevers).then(sortLevers);
+
+    let pool = null;
+
+    const runAll = (batchInfo, dataByYear, levers) => {
+        pool = buildPool(batchInfo);
+        const runner = buildJobRunner(batchInfo["data"], dataByYear, levers, cache, pool);
+        const errors = [];
+
+        const writeFutures = batchInfo["jobs"].map((jobInfo) => {
+            const name = jobInfo["name"];
+            const outputLoc = path.join(outputDir, name + ".json");
+
+            // Levers run synchronously here but polymers are added by the pool across jobs.
+            let outputFuture = null;
+            try {
+                outputFuture = runner(jobInfo);
+            } catch (error) {
+                outputFuture = Promise.reject(error);
             }
+
+            return outputFuture
+                .then((output) => writeJson(output, outputLoc))
+                .catch((error) => {
+                    errors.push(name + ": " + error);
+                });
+        });
+
+        return Promise.all(writeFutures).then(() => {
+            console.log("completed " + writeFutures.length + " jobs");
+            logCacheStats(cache);
+            return errors;
+        });
+    };
+    Promise.all([batchFuture, dataFuture, leversFuture])
+        .then((x) => runAll(x[0], x[1], x[2]))
+        .then(
+            (errors) => {
+                if (errors.length == 0) {
+                    console.log("done");
+                } else {
+                    console.log("error: " + errors.length + " jobs failed");
+                    return fs.promises.writeFile(errorLoc, errors.join("\n"));
+                }
+            },
+            (x) => {
+                console.log("error: " + x);
+                return fs.promises.writeFile(errorLoc, x);
+            },
+        )
+        .then(() => terminatePool(pool));
+}
+
+
+/**
+ * Load and compile a plastics language file used without templating like simulation.pt.
+ *
+ * @param loc Path to the file.
+ * @returns The compiled program or null if empty.
+ */
+function loadProgramFile(loc) {
+    return parseProgram(fs.readFileSync(loc).toString(), loc);
+}
+
+
+/**
+ * Run Monte Carlo trials for a scenario in batches of array-backed workspaces.
+ *
+ * Run Monte Carlo trials for a scenario where each batch of workspaces shares a single
+ * Float64Array which is reset from the baseline with one copy per trial instead of building
+ * nested Maps. After the programs run for a batch, variables are read directly from the array.
+ * If a pool is given, the batch is also sent to its worker threads to calculate GHG before the
+ * next batch starts.
+ *
+ * @param settings Object with year, numTrials, baseInputs (Map), programs (array of compiled
+ *      programs to run in order for each trial), seed (integer), sampling (random or latin, see
+ *      makeTrialRandomSource), and pool (PolymerWorkerPool or null). Trial i sees the same draws
+ *      in every scenario and, for latin, all trials form a single Latin hypercube design.
+ * @param schema The StateSchema describing the array layout.
+ * @param baseline The Float64Array of baseline values for a single workspace.
+ * @param onTrial Callback taking a Map from region (including global) to Map from variable name
+ *      to value (or null if not available) for each completed trial.
+ * @returns Promise resolving after all trials complete.
+ */
+function runMonteCarloTrials(settings, schema, baseline, onTrial) {
+    const year = settings["year"];
+    const numTrials = settings["numTrials"];
+    const baseInputs = settings["baseInputs"];
+    const programs = settings["programs"];
+    const seed = settings["seed"];
+    const sampling = settings["sampling"];
+    const pool = settings["pool"];
+
+    const size = schema.getSize();
+    const regions = schema.getRegions();
+    const batchValues = new Float64Array(size * MONTE_CARLO_BATCH_SIZE);
+
+    const variableOffsets = MONTE_CARLO_VARIABLES.map((variable) => {
+        if (variable["attrs"] === null) {
+            return null;
+        }
+        return regions.map((region) => {
+            return variable["attrs"].map((attr) => schema.getOffset(region, attr));
         });
-        return levers;
     });
 
-    const downstreamFutures = [futureWorkspace, futureLevers];
+    const getValue = (trialOffset, ghg, variableIndex, regionIndex) => {
+        const variable = MONTE_CARLO_VARIABLES[variableIndex];
+        const offsets = variableOffsets[variableIndex];
 
-    Promise.all(downstreamFutures)
-        .then((x) => consolidateWorkspace(x[0], x[1]))
-        .then(executeWorkspace)
-        .then(serializeOutputs)
-        .then((workspace) => writeJson(workspace, outputLoc))
+        if (offsets !== null) {
+            let total = 0;
+            offsets[regionIndex].forEach((offset) => {
+                total += batchValues[trialOffset + offset];
+            });
+            return total;
+        } else if (ghg !== null && variable["ghg"] !== undefined) {
+            return ghg.get(regions[regionIndex]).get(variable["ghg"]);
+        } else {
+            return null;
+        }
+    };
+
+    const summarize = (trialOffset, ghg) => {
+        const results = new Map();
+        const globalResults = new Map();
+
+        regions.forEach((region, regionIndex) => {
+            const regionResults = new Map();
+
+            MONTE_CARLO_VARIABLES.forEach((variable, variableIndex) => {
+                const name = variable["name"];
+                const total = getValue(trialOffset, ghg, variableIndex, regionIndex);
+                regionResults.set(name, total);
+
+                // The global value is missing if any region is rather than a partial sum.
+                const priorGlobal = globalResults.has(name) ? globalResults.get(name) : 0;
+                const isMissing = priorGlobal === null || total === null;
+                globalResults.set(name, isMissing ? null : priorGlobal + total);
+            });
+
+            results.set(region, regionResults);
+        });
+
+        results.set("global", globalResults);
+        return results;
+    };
+
+    const runBatch = (batchStart) => {
+        const batchSize = Math.min(MONTE_CARLO_BATCH_SIZE, numTrials - batchStart);
+        const workspaces = [];
+
+        for (let i = 0; i < batchSize; i++) {
+            const trialOffset = i * size;
+            batchValues.set(baseline, trialOffset);
+
+            const meta = new Map();
+            meta.set("year", year);
+            meta.set("random", makeTrialRandomSource(sampling, seed, batchStart + i, numTrials));
+
+            const workspace = new Map();
+            workspace.set("out", new ArrayOutputs(schema, batchValues, trialOffset));
+            workspace.set("in", new Map(baseInputs));
+            workspace.set("meta", meta);
+
+            programs.forEach((program) => {
+                workspace.set("local", new Map());
+                workspace.set("inspect", []);
+                program(workspace);
+            });
+
+            workspaces.push(workspace);
+        }
+
+        const ghgFuture = pool === null ? Promise.resolve(null) : pool.modify(
+            workspaces.map((workspace) => {
+                return {"year": year, "state": workspace};
+            }),
+        ).then((states) => states.map((state) => state.get("ghg")));
+
+        return ghgFuture.then((ghgs) => {
+            for (let i = 0; i < batchSize; i++) {
+                onTrial(summarize(i * size, ghgs === null ? null : ghgs[i]));
+            }
+        });
+    };
+
+    let future = Promise.resolve();
+    for (let batchStart = 0; batchStart < numTrials; batchStart += MONTE_CARLO_BATCH_SIZE) {
+        future = future.then(() => runBatch(batchStart));
+    }
+    return future;
+}
+
+
+/**
+ * Format a number with a fixed number of decimal places as required by the output schemas.
+ *
+ * Format a number with a fixed number of decimal places as required by the output schemas (see
+ * spec/montecarlo_summary.csvs and spec/montecarlo_bau.csvs) such that small values are not written
+ * in exponent notation like 1e-7.
+ *
+ * @param value The number to format.
+ * @returns String with MONTE_CARLO_DECIMALS places after the decimal.
+ */
+function formatMonteCarloDecimal(value) {
+    return value.toFixed(MONTE_CARLO_DECIMALS);
+}
+
+
+/**
+ * Execute Monte Carlo trials described by a JSON file.
+ *
+ * Execute Monte Carlo trials described by a JSON file with levers, data, year, trials,
+ * inputs, simulation (path to code drawing perturbed inputs like pt/simulation.pt), and scenarios
+ * (array of objects with name and program path like pt/sim_bau.pt). Rows for each trial are
+ * streamed to [output dir]/trials_[scenario].csv following spec/montecarlo_bau.csvs and means /
+ * standard deviations are written to [output dir]/summary.csv following
+ * spec/montecarlo_summary.csvs. If the job gives polymerData, GHG is calculated for each trial on a
+ * pool of worker threads.
+ *
+ * @param jobLoc Path to the JSON Monte Carlo job description.
+ * @param outputDir Directory in which CSV files should be written.
+ * @param errorLoc Path where an error message should be written if the job fails.
+ */
+function mainMonteCarlo(jobLoc, outputDir, errorLoc) {
+    // Outputs follow spec/montecarlo_bau.csvs which always includes totalGhgCO2eMt so check first.
+    const jobFuture = loadJson(jobLoc).then((jobInfo) => {
+        if (jobInfo["polymerData"] === undefined) {
+            throw "Monte Carlo jobs require polymerData to report totalGhgCO2eMt";
+        }
+        return jobInfo;
+    });
+    const dataFuture = jobFuture.then((jobInfo) => loadData(jobInfo["data"]));
+    const leversFuture = jobFuture.then(buildLevers).then(sortLevers);
+
+    const trialsHeader = ["year", "regionKey", "region"]
+        .concat(MONTE_CARLO_VARIABLES.map((x) => x["name"]))
+        .join(",");
+    const summaryHeader = ["scenario", "regionKey", "region", "variable", "mean", "std"].join(",");
+
+    let pool = null;
+
+    const run = (jobInfo, dataByYear, levers) => {
+        pool = buildPool(jobInfo);
+
+        const workspace = new Map();
+        workspace.set("in", new Map());
+        jobInfo["inputs"].forEach((input) => {
+            workspace.get("in").set(input["lever"], input["value"]);
+        });
+        consolidateWorkspace(workspace, levers);
+        const baseInputs = workspace.get("in");
+        const seed = jobInfo["seed"] === undefined ? makeRandomSeed() : jobInfo["seed"];
+        const sampling = jobInfo["sampling"] === undefined ? DEFAULT_SAMPLING : jobInfo["sampling"];
+
+        const simulationProgram = loadProgramFile(jobInfo["simulation"]);
+        const leverPrograms = levers
+            .map((lever) => lever["compiled"])
+            .filter((x) => x !== null);
+
+        const summaryFd = fs.openSync(path.join(outputDir, "summary.csv"), "w");
+        fs.writeSync(summaryFd, summaryHeader + "\n");
+
+        const runScenario = (scenario) => {
+            const scenarioName = scenario["name"];
+            const scenarioProgram = loadProgramFile(scenario["program"]);
+            const programs = [simulationProgram, scenarioProgram]
+                .filter((x) => x !== null)
+                .concat(leverPrograms);
+
+            const trialsLoc = path.join(outputDir, "trials_" + scenarioName + ".csv");
+            const trialsFd = fs.openSync(trialsLoc, "w");
+            fs.writeSync(trialsFd, trialsHeader + "\n");
+
+            const stats = new Map();
+
+            const year = jobInfo["year"];
+            const baselineInfo = buildBaseline(dataByYear, year);
+            const settings = {
+                "year": year,
+                "numTrials": jobInfo["trials"],
+                "baseInputs": baseInputs,
+                "programs": programs,
+                "seed": seed,
+                "sampling": sampling,
+                "pool": pool,
+            };
+
+            const trialsFuture = runMonteCarloTrials(
+                settings,
+                baselineInfo["schema"],
+                baselineInfo["baseline"],
+                (results) => {
+                    const lines = [];
+                    results.forEach((regionResults, region) => {
+                        const values = Array.of(...regionResults.values())
+                            .map((x) => x === null ? "" : formatMonteCarloDecimal(x));
+                        const row = [year, region, MONTE_CARLO_REGION_LABELS[region]]
+                            .concat(values);
+                        lines.push(row.join(","));
+
+                        regionResults.forEach((value, variable) => {
+                            if (value === null) {
+                                return;
+                            }
+
+                            const key = [region, variable].join("\t");
+                            if (!stats.has(key)) {
+                                stats.set(key, new RunningStats());
+                            }
+                            stats.get(key).add(value);
+                        });
+                    });
+                    fs.writeSync(trialsFd, lines.join("\n") + "\n");
+                },
+            );
+
+            return trialsFuture.then(() => {
+                fs.closeSync(trialsFd);
+
+                const summaryLines = [];
+                stats.forEach((regionStats, key) => {
+                    const keyPieces = key.split("\t");
+                    const region = keyPieces[0];
+                    const variable = keyPieces[1];
+                    summaryLines.push([
+                        scenarioName,
+                        region,
+                        MONTE_CARLO_REGION_LABELS[region],
+                        variable,
+                        formatMonteCarloDecimal(regionStats.getMean()),
+                        formatMonteCarloDecimal(regionStats.getStd()),
+                    ].join(","));
+                });
+                fs.writeSync(summaryFd, summaryLines.join("\n") + "\n");
+
+                console.log("completed " + scenarioName);
+            });
+        };
+
+        const scenariosFuture = jobInfo["scenarios"].reduce(
+            (prior, scenario) => prior.then(() => runScenario(scenario)),
+            Promise.resolve(),
+        );
+
+        return scenariosFuture.then(() => fs.closeSync(summaryFd));
+    };
+
+    Promise.all([jobFuture, dataFuture, leversFuture])
+        .then((x) => run(x[0], x[1], x[2]))
         .then(
             (x) => console.log("done"),
             (x) => {
                 console.log("error: " + x);
-                return fs.promises.writeFile(errorLoc, x);
+                return fs.promises.writeFile(errorLoc, "" + x);
             },
-        );
+        )
+        .then(() => terminatePool(pool));
+}
+
+
+/**
+ * Main script entry point
+ */
+function main() {
+    const args = process.argv.slice(2);
+
+    if (args.length > 0 && args[0] === MONTE_CARLO_FLAG) {
+        if (args.length != NUM_ARGS + 1) {
+            console.error(USAGE_STR);
+            return;
+        }
+
+        mainMonteCarlo(args[1], args[2], args[3]);
+        return;
+    }
+
+    const isBatch = args.length > 0 && args[0] === BATCH_FLAG;
+    const argsEffective = isBatch ? args.slice(1) : args;
+
+    const numArgs = argsEffective.length;
+    if (numArgs != NUM_ARGS && numArgs != NUM_ARGS_CACHED) {
+        console.error(USAGE_STR);
+        return;
+    }
+
+    const cacheDir = numArgs == NUM_ARGS_CACHED ? argsEffective[3] : undefined;
+
+    if (isBatch) {
+        mainBatch(argsEffective[0], argsEffective[1], argsEffective[2], cacheDir);
+    } else {
+        mainSingle(argsEffective[0], argsEffective[1], argsEffective[2], cacheDir);
+    }
 }
 
 
@@ -98,10 +98,14 @@ const ESSENTIAL_FILES = [
     "/js/geotools.js",
     "/js/goals.js",
     "/js/intro.js",
+    "/js/lever_bundle.js",
+    "/js/monte_carlo.js",
     "/js/overview.js",
     "/js/overview_scenario.js",
     "/js/overview_scorecard.js",
     "/js/overview_timedelta.js",
+    "/js/program_chain.js",
+    "/js/random.js",
     "/js/report.js",
     "/js/report_bubble.js",
     "/js/report_config.js",
@@ -109,6 +113,8 @@ const ESSENTIAL_FILES = [
     "/js/report_sparklines.js",
     "/js/report_stage.js",
     "/js/report_timeseries.js",
+    "/js/result_cache.js",
+    "/js/running_stats.js",
     "/js/sim_presenter.js",
     "/js/slider.js",
     "/js/strings.js",
@@ -118,35 +124,12 @@ const ESSENTIAL_FILES = [
     "/js/visitors.js",
     "/js/sw_load.js",
     "/js/add_global_util.js",
+    "/js/array_state.js",
     "/js/polymers.js",
     "/pt/README.md",
-    "/pt/additives.pt",
-    "/pt/consumption_tax.pt",
-    "/pt/delta_waste_export.pt",
-    "/pt/delta_waste_import.pt",
-    "/pt/incineration_investment.pt",
+    "/pt/bundle.json",
     "/pt/index.json",
-    "/pt/landfill_investment.pt",
-    "/pt/maximum_mismanaged.pt",
-    "/pt/minimum_recycled_content.pt",
-    "/pt/minimum_recycling_rate.pt",
-    "/pt/nivi_scratchpad.pt",
-    "/pt/noop.pt",
-    "/pt/recycling_investment.pt",
-    "/pt/reduce_packaging_polymer.pt",
-    "/pt/reduce_ps.pt",
     "/pt/scenarios.json",
-    "/pt/simulation.pt",
-    "/pt/sim_bau.pt",
-    "/pt/sim_cap_virgin.pt",
-    "/pt/sim_mrc.pt",
-    "/pt/sim_package.pt",
-    "/pt/sim_packaging_tax.pt",
-    "/pt/sim_waste_invest.pt",
-    "/pt/virgin_plastic_cap.pt",
-    "/pt/virgin_tax.pt",
-    "/pt/waste_trade.pt",
-    "/pt/yield_loss.pt",
     "/template/README.md",
     "/template/base_prerender.html",
     "/template/harness.html",
@@ -1,11 +1,33 @@
-"""Script to build the standalone tasks in CI / CD."""
+"""Script to build the standalone tasks in CI / CD.
 
+When executing, jobs are split into one shard per worker which each run as a single batch mode
+process of the standalone engine. Unchanged jobs are served from the engine's result cache if a
+cache directory is given.
+"""
+
+import concurrent.futures
 import json
 import os
+import re
+import subprocess
 import sys
+import tempfile
 
 NUM_ARGS = 3
-USAGE_STR = 'USAGE: python build_scenarios.py [scenarios json] [job template] [output dir]'
+EXECUTE_FLAG = '--execute'
+NUM_EXECUTE_ARGS = 8
+CACHE_STATS_REGEX = re.compile(r'cache hits: (\d+), misses: (\d+)')
+USAGE_STR = '\n'.join([
+    ' '.join([
+        'USAGE: python build_scenarios.py',
+        '[scenarios json] [job template] [output dir] [optional batch loc]'
+    ]),
+    ' '.join([
+        '   or: python build_scenarios.py --execute',
+        '[scenarios json] [job template] [output dir] [engine dir]',
+        '[workers] [timeout seconds per job] [retries] [error loc] [optional cache dir]'
+    ])
+])
 
 SCENARIOS = {
     "snapshot": {
@@ -80,63 +102,338 @@ def get_scenario(name, scenarios_json):
     return list(matching)[0]
 
 
+def get_inputs(scenario_info, scenarios_json):
+    inputs = []
+
+    for key in scenario_info:
+        scenario_value = scenario_info[key]
+        scenario = get_scenario(key, scenarios_json)
+
+        if 'config' in scenario:
+            base_value = scenario['config']['default']
+            multiplier = scenario_value / base_value
+            for value in scenario['values']:
+                inputs.append({
+                    'lever': value['lever'],
+                    'value': value['baseValue'] * multiplier
+                })
+        else:
+            for value in scenario['values']:
+                inputs.append({
+                    'lever': value['lever'],
+                    'value': value['value']
+                })
+
+    return inputs
+
+
+def get_years(timeseries_type, name):
+    if timeseries_type == 'snapshot':
+        return [2050]
+    elif name == 'businessAsUsual':
+        return range(2011, 2050)
+    else:
+        return range(2024, 2050)  # Only spend time on projection years
+
+
+def build_jobs(scenarios_json):
+    jobs = []
+
+    for timeseries_type in SCENARIOS:
+        for name in SCENARIOS[timeseries_type]:
+            scenario_info = SCENARIOS[timeseries_type][name]
+            inputs = get_inputs(scenario_info, scenarios_json)
+
+            for year in get_years(timeseries_type, name):
+                if year != 2050:
+                    full_name = '%s%d' % (name, year)
+                else:
+                    full_name = name
+
+                jobs.append({
+                    'name': full_name,
+                    'year': year,
+                    'inputs': inputs
+                })
+
+    return jobs
+
+
+def write_jobs(jobs, job_template, output_dir):
+    for job in jobs:
+        job_template['inputs'] = job['inputs']
+        job_template['year'] = job['year']
+        output_path = os.path.join(output_dir, job['name'] + '.json')
+        with open(output_path, 'w') as f:
+            json.dump(job_template, f)
+
+
+def write_batch(jobs, job_template, batch_loc):
+    batch = {
+        'levers': job_template['levers'],
+        'data': job_template['data'],
+        'jobs': jobs
+    }
+
+    with open(batch_loc, 'w') as f:
+        json.dump(batch, f)
+
+
+def build_shard_batch(jobs, job_template):
+    batch = dict(filter(lambda x: x[0] not in ['inputs', 'year'], job_template.items()))
+    batch['jobs'] = list(map(lambda x: dict(job_template, **x), jobs))
+    return batch
+
+
+def read_shard_errors(error_path, names):
+    job_errors = {}
+    shard_errors = []
+
+    if not os.path.exists(error_path):
+        return (job_errors, shard_errors)
+
+    with open(error_path) as f:
+        lines = f.read().strip().split('\n')
+
+    # Batch mode writes one "[name]: [error]" entry per failed job or a single error for the batch.
+    current = None
+    for line in lines:
+        prefix = line.split(': ', 1)[0]
+        if prefix in names:
+            current = prefix
+            job_errors[current] = line[len(prefix) + 2:]
+        elif current is not None:
+            job_errors[current] += '\n' + line
+        elif line != '':
+            shard_errors.append(line)
+
+    return (job_errors, shard_errors)
+
+
+def execute_shard(shard_id, jobs, job_template, output_dir, engine_dir, work_dir, timeout,
+        retries, cache_dir=None):
+    shard_dir = os.path.join(work_dir, 'shard_%d' % shard_id)
+    batch_path = os.path.join(shard_dir, 'batch.json')
+    temp_output_dir = os.path.join(shard_dir, 'output')
+    error_path = os.path.join(shard_dir, 'error.txt')
+    os.makedirs(temp_output_dir)
+
+    errors = dict(map(lambda x: (x['name'], []), jobs))
+    remaining = list(jobs)
+    hits = 0
+    misses = 0
+
+    for attempt in range(retries + 1):
+        if len(remaining) == 0:
+            break
+
+        if os.path.exists(error_path):
+            os.remove(error_path)
+
+        for filename in os.listdir(temp_output_dir):
+            os.remove(os.path.join(temp_output_dir, filename))
+
+        with open(batch_path, 'w') as f:
+            json.dump(build_shard_batch(remaining, job_template), f)
+
+        command = [
+            'node',
+            'engine/standalone.js',
+            '--batch',
+            batch_path,
+            temp_output_dir,
+            error_path
+        ]
+
+        if cache_dir is not None:
+            command.append(cache_dir)
+
+        # The timeout is per job so the shard is given time for each job it still has to run.
+        shard_timeout = timeout * len(remaining)
+        shard_error = None
+        try:
+            result = subprocess.run(
+                command,
+                cwd=engine_dir,
+                timeout=shard_timeout,
+                capture_output=True,
+                text=True
+            )
+        except subprocess.TimeoutExpired:
+            result = None
+            shard_error = 'shard timed out after %d seconds' % shard_timeout
+
+        if result is not None:
+            cache_stats = CACHE_STATS_REGEX.search(result.stdout)
+            if cache_stats:
+                hits += int(cache_stats.group(1))
+                misses += int(cache_stats.group(2))
+
+            if result.returncode != 0:
+                shard_error = 'exit %d %s' % (result.returncode, result.stderr.strip())
+
+        names = set(map(lambda x: x['name'], remaining))
+        (job_errors, shard_errors) = read_shard_errors(error_path, names)
+        if shard_error is None and len(shard_errors) > 0:
+            shard_error = '\n'.join(shard_errors)
+
+        still_remaining = []
+        for job in remaining:
+            name = job['name']
+            temp_output_path = os.path.join(temp_output_dir, name + '.json')
+
+            # Outputs of a shard which did not finish normally may be partially written.
+            if shard_error is not None:
+                message = shard_error
+            elif name in job_errors:
+                message = job_errors[name]
+            elif not os.path.exists(temp_output_path):
+                message = 'no output written'
+            else:
+                message = None
+
+            if message is None:
+                output_path = os.path.abspath(os.path.join(output_dir, name + '.json'))
+                os.replace(temp_output_path, output_path)
+                errors[name] = None
+            else:
+                errors[name].append('attempt %d: %s' % (attempt + 1, message))
+                still_remaining.append(job)
+
+        remaining = still_remaining
+
+    def describe_error(name):
+        if errors[name] is None:
+            return None
+
+        errors_indented = map(lambda x: '    ' + x.replace('\n', '\n    '), errors[name])
+        return '%s\n%s' % (name, '\n'.join(errors_indented))
+
+    return {
+        'errors': dict(map(lambda x: (x['name'], describe_error(x['name'])), jobs)),
+        'hits': hits,
+        'misses': misses
+    }
+
+
+def execute_jobs(jobs, job_template, output_dir, engine_dir, workers, timeout, retries,
+        cache_dir=None):
+    engine_dir = os.path.abspath(engine_dir)
+
+    if cache_dir is not None:
+        cache_dir = os.path.abspath(cache_dir)
+
+    # One batch mode process per shard such that data and levers are loaded once per worker.
+    shards = list(filter(
+        lambda x: len(x) > 0,
+        map(lambda i: jobs[i::workers], range(workers))
+    ))
+
+    # Paths in the template are relative to the engine directory like with npm run standalone.
+    with tempfile.TemporaryDirectory() as work_dir:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    execute_shard,
+                    shard_id,
+                    shard,
+                    job_template,
+                    output_dir,
+                    engine_dir,
+                    work_dir,
+                    timeout,
+                    retries,
+                    cache_dir
+                )
+                for (shard_id, shard) in enumerate(shards)
+            ]
+            shard_results = [future.result() for future in futures]
+
+    errors_by_name = {}
+    for shard_result in shard_results:
+        errors_by_name.update(shard_result['errors'])
+
+    return {
+        'errors': list(map(lambda x: errors_by_name[x['name']], jobs)),
+        'hits': sum(map(lambda x: x['hits'], shard_results)),
+        'misses': sum(map(lambda x: x['misses'], shard_results))
+    }
+
+
+def main_execute():
+    if len(sys.argv) not in [NUM_EXECUTE_ARGS + 2, NUM_EXECUTE_ARGS + 3]:
+        print(USAGE_STR)
+        sys.exit(1)
+
+    scenarios_json_loc = sys.argv[2]
+    job_template_loc = sys.argv[3]
+    output_dir = sys.argv[4]
+    engine_dir = sys.argv[5]
+    workers = int(sys.argv[6])
+    timeout = int(sys.argv[7])
+    retries = int(sys.argv[8])
+    error_loc = sys.argv[9]
+    cache_dir = sys.argv[10] if len(sys.argv) == NUM_EXECUTE_ARGS + 3 else None
+
+    with open(scenarios_json_loc) as f:
+        scenarios_json = json.load(f)
+
+    with open(job_template_loc) as f:
+        job_template = json.load(f)
+
+    jobs = build_jobs(scenarios_json)
+
+    results = execute_jobs(
+        jobs,
+        job_template,
+        output_dir,
+        engine_dir,
+        workers,
+        timeout,
+        retries,
+        cache_dir
+    )
+    errors = [x for x in results['errors'] if x is not None]
+
+    if cache_dir is not None:
+        print('Cache hits: %d, misses: %d.' % (results['hits'], results['misses']))
+
+    if len(errors) > 0:
+        with open(error_loc, 'w') as f:
+            f.write('\n'.join(errors))
+            f.write('\n')
+
+        print('Failed %d of %d jobs. See %s.' % (len(errors), len(jobs), error_loc))
+        sys.exit(1)
+    else:
+        print('Completed %d jobs.' % len(jobs))
+
+
 def main():
-    if len(sys.argv) != NUM_ARGS + 1:
+    if len(sys.argv) > 1 and sys.argv[1] == EXECUTE_FLAG:
+        main_execute()
+        return
+
+    if len(sys.argv) not in [NUM_ARGS + 1, NUM_ARGS + 2]:
         print(USAGE_STR)
         sys.exit(1)
-    
+
     scenarios_json_loc = sys.argv[1]
     job_template_loc = sys.argv[2]
     output_dir = sys.argv[3]
 
     with open(scenarios_json_loc) as f:
         scenarios_json = json.load(f)
-    
+
     with open(job_template_loc) as f:
         job_template = json.load(f)
-    
-    for timeseries_type in SCENARIOS:
-        for name in SCENARIOS[timeseries_type]:
-            scenario_info = SCENARIOS[timeseries_type][name]
-            inputs = []
-
-            for key in scenario_info:
-                scenario_value = scenario_info[key]
-                scenario = get_scenario(key, scenarios_json)
-                
-                if 'config' in scenario:
-                    base_value = scenario['config']['default']
-                    multiplier = scenario_value / base_value
-                    for value in scenario['values']:
-                        inputs.append({
-                            'lever': value['lever'],
-                            'value': value['baseValue'] * multiplier
-                        })
-                else:
-                    for value in scenario['values']:
-                        inputs.append({
-                            'lever': value['lever'],
-                            'value': value['value']
-                        })
-                
-            job_template['inputs'] = inputs
-
-            if timeseries_type == 'snapshot':
-                years = [2050]
-            elif name == 'businessAsUsual':
-                years = range(2011, 2050)
-            else:
-                years = range(2024, 2050)  # Only spend time on projection years
-            
-            for year in years:
-                if year != 2050:
-                    full_name = '%s%d' % (name, year)
-                else:
-                    full_name = name
-                job_template['year'] = year
-                output_path = os.path.join(output_dir, full_name + '.json')
-                with open(output_path, 'w') as f:
-                    json.dump(job_template, f)
+
+    jobs = build_jobs(scenarios_json)
+
+    if len(sys.argv) == NUM_ARGS + 2:
+        write_batch(jobs, job_template, sys.argv[4])
+    else:
+        write_jobs(jobs, job_template, output_dir)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+"""Columnar binary snapshot of the web data CSV.
+
+The snapshot starts with an 8 byte magic string followed by a little endian uint32 giving the
+length of a JSON header. The header lists the regions and, for each column, its name, type, and
+byte offset. Columns follow the header with each starting at a multiple of 8 bytes: year and
+region (index into regions) as int32 and one float64 column per attribute.
+
+License: BSD
+"""
+
+import csv
+import json
+import os
+import struct
+import sys
+
+import numpy
+
+NUM_ARGS = 2
+USAGE_STR = 'python columnar_data.py [input csv] [output bin]'
+MAGIC = b'PLTCOL01'
+ALIGNMENT = 8
+ATTRS = [
+    'eolRecyclingMT',
+    'eolLandfillMT',
+    'eolIncinerationMT',
+    'eolMismanagedMT',
+    'consumptionAgricultureMT',
+    'consumptionConstructionMT',
+    'consumptionElectronicMT',
+    'consumptionHouseholdLeisureSportsMT',
+    'consumptionPackagingMT',
+    'consumptionTransportationMT',
+    'consumptionTextileMT',
+    'consumptionOtherMT',
+    'netImportsMT',
+    'netExportsMT',
+    'primaryProductionMT',
+    'secondaryProductionMT',
+    'netWasteExportMT',
+    'netWasteImportMT'
+]
+TYPES = {
+    'int32': numpy.dtype('<i4'),
+    'float64': numpy.dtype('<f8')
+}
+
+
+class ColumnarData:
+    """Memory mapped view over a columnar snapshot."""
+
+    def __init__(self, loc):
+        """Map a snapshot from disk without reading its columns into memory.
+
+        Args:
+            loc: Path to the binary snapshot.
+        """
+        with open(loc, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise RuntimeError('Not a columnar snapshot: %s' % loc)
+
+            header_len = struct.unpack('<I', f.read(4))[0]
+            header = json.loads(f.read(header_len).decode('utf-8'))
+
+        self._regions = header['regions']
+        self._region_ids = dict(map(lambda x: (x[1], x[0]), enumerate(self._regions)))
+        self._num_rows = header['numRows']
+
+        self._columns = {}
+        for column in header['columns']:
+            self._columns[column['name']] = numpy.memmap(
+                loc,
+                dtype=TYPES[column['type']],
+                mode='r',
+                offset=column['offset'],
+                shape=(self._num_rows,)
+            )
+
+    def get_regions(self):
+        """Get the region names in the order of their integer ids."""
+        return self._regions
+
+    def get_num_rows(self):
+        """Get the number of records in the snapshot."""
+        return self._num_rows
+
+    def get_column(self, name):
+        """Get a column (year, region, or an attribute) as a memory mapped array."""
+        return self._columns[name]
+
+    def get_indices(self, year=None, region=None):
+        """Get the row indices matching an optional year and region."""
+        mask = numpy.ones(self._num_rows, dtype=bool)
+
+        if year is not None:
+            mask &= self._columns['year'] == year
+
+        if region is not None:
+            mask &= self._columns['region'] == self._region_ids[region]
+
+        return numpy.nonzero(mask)[0]
+
+    def get_records(self, year=None, region=None):
+        """Get matching rows as dictionaries like those from csv.DictReader but with numbers."""
+        def build_record(i):
+            record = {
+                'year': int(self._columns['year'][i]),
+                'region': self._regions[self._columns['region'][i]]
+            }
+
+            for attr in ATTRS:
+                record[attr] = float(self._columns[attr][i])
+
+            return record
+
+        return map(build_record, self.get_indices(year=year, region=region))
+
+
+def get_snapshot_loc(csv_loc):
+    """Get the path at which the snapshot for a CSV file is expected."""
+    return os.path.splitext(csv_loc)[0] + '.bin'
+
+
+def has_fresh_snapshot(csv_loc):
+    """Determine if a CSV file has a snapshot which is at least as new as the CSV itself."""
+    bin_loc = get_snapshot_loc(csv_loc)
+
+    if not os.path.exists(bin_loc):
+        return False
+
+    return os.path.getmtime(bin_loc) >= os.path.getmtime(csv_loc)
+
+
+def write_snapshot(input_loc, output_loc):
+    """Convert a data CSV file into a columnar snapshot.
+
+    Args:
+        input_loc: Path to the CSV file like web.csv.
+        output_loc: Path where the binary snapshot should be written.
+    """
+    with open(input_loc) as f:
+        records = list(csv.DictReader(f))
+
+    regions = []
+    region_ids = {}
+    for record in records:
+        region = record['region']
+        if region not in region_ids:
+            region_ids[region] = len(regions)
+            regions.append(region)
+
+    def parse_float(value):
+        return float(value) if value.strip() != '' else float('nan')
+
+    arrays = [
+        ('year', 'int32', [int(x['year']) for x in records]),
+        ('region', 'int32', [region_ids[x['region']] for x in records])
+    ] + [(attr, 'float64', [parse_float(x[attr]) for x in records]) for attr in ATTRS]
+
+    def pad(length):
+        return (ALIGNMENT - length % ALIGNMENT) % ALIGNMENT
+
+    # Offsets depend on the header length so lay out with a generous fixed width per offset.
+    offset_width = 12
+    columns = [{'name': name, 'type': type_name, 'offset': 0} for (name, type_name, _) in arrays]
+    header = {'numRows': len(records), 'regions': regions, 'columns': columns}
+    header_len = len(json.dumps(header)) + len(columns) * offset_width
+    header_len += pad(len(MAGIC) + 4 + header_len)
+
+    offset = len(MAGIC) + 4 + header_len
+    for column in columns:
+        column['offset'] = offset
+        offset += TYPES[column['type']].itemsize * len(records)
+        offset += pad(offset)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (header_len - len(header_bytes))
+
+    with open(output_loc, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', header_len))
+        f.write(header_bytes)
+
+        for (column, (_, type_name, values)) in zip(columns, arrays):
+            f.write(b'\0' * (column['offset'] - f.tell()))
+            f.write(numpy.array(values, dtype=TYPES[type_name]).tobytes())
+
+
+def main():
+    if len(sys.argv) != NUM_ARGS + 1:
+        print(USAGE_STR)
+        sys.exit(1)
+
+    input_loc = sys.argv[1]
+    output_loc = sys.argv[2]
+
+    write_snapshot(input_loc, output_loc)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,13 +18,16 @@ sqlite3 combined.db < ../support/get_resin_trade_supplement.sql
 cd ..
 
 echo "== Splitting primary / secondary =="
-python support/separate_production.py data/overview_ml_original.csv data/overview_ml.csv 1 20 2011
-python support/separate_production.py data/overview_curve_original.csv data/overview_curve.csv 1 20 2011
-python support/separate_production.py data/overview_naive_original.csv data/overview_naive.csv 1 20 2011
+python support/separate_production.py data/overview_ml_original.csv data/overview_ml.csv 1 20 2011 \
+    data/overview_curve_original.csv data/overview_curve.csv \
+    data/overview_naive_original.csv data/overview_naive.csv
 
 echo "== Make primary web output =="
 cp data/overview_ml.csv data/web.csv
 
+echo "== Make columnar snapshot =="
+python support/columnar_data.py data/web.csv data/web.bin
+
 echo "== Move supporting data =="
 mv pipeline/polymer_ratios.csv data/live_polymer_ratios.csv
 mv pipeline/production_trade_subtype_ratios.csv data/live_production_trade_subtype_ratios.csv
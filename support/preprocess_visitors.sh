@@ -3,6 +3,13 @@ python support/preprocess_visitors.py js/visitors_base.js_template js/compile_vi
 
 cp intermediate/static/plasticslang.js js_standalone/engine/plastics_lang.js
 cp js/const.js js_standalone/engine/const.js
+cp js/result_cache.js js_standalone/engine/result_cache.js
+cp js/program_chain.js js_standalone/engine/program_chain.js
+cp js/random.js js_standalone/engine/random.js
+cp js/running_stats.js js_standalone/engine/running_stats.js
 
 python support/preprocess_visitors.py js_standalone/engine/standalone_visitors_base.js_template js/compile_visitor.js_template js_standalone/engine/standalone_visitors.js
-python support/preprocess_visitors.py js_standalone/engine/plastics_lang_bootstrap.js_template js_standalone/engine/plastics_lang.js js_standalone/engine/plastics_lang_bootstrap.js
\ No newline at end of file
+python support/preprocess_visitors.py js_standalone/engine/plastics_lang_bootstrap.js_template js_standalone/engine/plastics_lang.js js_standalone/engine/plastics_lang_bootstrap.js
+python support/preprocess_visitors.py js_standalone/engine/array_state_bootstrap.js_template js/array_state.js js_standalone/engine/array_state_bootstrap.js
+python support/preprocess_visitors.py js_standalone/engine/add_global_util_bootstrap.js_template js/add_global_util.js js_standalone/engine/add_global_util_bootstrap.js
+python support/preprocess_visitors.py js_standalone/engine/polymers_bootstrap.js_template js/polymers.js js_standalone/engine/polymers_bootstrap.js
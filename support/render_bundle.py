@@ -0,0 +1,240 @@
+"""Script which renders all plastics language programs into a single bundle.
+
+Script which renders the plastics language (pt) templates for every lever in an index.json (see
+render_index.py) along with the programs used without templating (like simulation.pt) into a single
+JSON file keyed by a hash of its contents. This allows the browser and standalone engine to load
+one file instead of fetching and rendering each template with handlebars on startup. The bundle
+holds rendered source rather than a parse tree or other compiled form so programs are still parsed
+when loaded. Only the
+subset of handlebars used by the pt files is supported (variables, this, each, if, unless, and
+@first / @last / @index) and other tags like else, partials, comments, and triple braces fail the
+build.
+
+License: BSD
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+NUM_ARGS = 3
+USAGE_STR = 'python render_bundle.py [pt dir] [index json] [output]'
+
+TAG_REGEX = re.compile(r'{{\s*([#/]?)\s*([^}]*?)\s*}}')
+STANDALONE_REGEX = re.compile(r'^[ \t]*({{\s*[#/][^}]*}})[ \t]*\r?\n', re.MULTILINE)
+VARIABLE_REGEX = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*|this|\.|@first|@last|@index)$')
+BLOCK_HELPERS = {'each', 'if', 'unless'}
+RESERVED_NAMES = {'else'}
+ESCAPES = {
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+    '`': '&#x60;',
+    '=': '&#x3D;'
+}
+
+
+def parse_template(source):
+    """Parse a handlebars template into a tree of nodes.
+
+    Args:
+        source: The template source. Block tags on their own line are removed along with that line
+            as done by handlebars.
+
+    Returns:
+        List of nodes where each node is a string (literal text), a tuple of ('var', name), or a
+        tuple of ('block', helper, argument, children).
+    """
+    source_standalone = STANDALONE_REGEX.sub(r'\1', source)
+
+    root = []
+    stack = [('root', None, root)]
+    position = 0
+
+    def check_literal(literal):
+        if '{{' in literal or '}}' in literal:
+            raise RuntimeError('Unsupported tag near: %s' % literal.strip()[:40])
+
+    def check_variable(name):
+        if VARIABLE_REGEX.match(name) is None or name in RESERVED_NAMES:
+            raise RuntimeError('Unsupported expression: %s' % name)
+
+    for match in TAG_REGEX.finditer(source_standalone):
+        children = stack[-1][2]
+        literal = source_standalone[position:match.start()]
+        check_literal(literal)
+        if literal != '':
+            children.append(literal)
+        position = match.end()
+
+        prefix = match.group(1)
+        body = match.group(2)
+
+        if prefix == '#':
+            pieces = body.split()
+            if len(pieces) != 2 or pieces[0] not in BLOCK_HELPERS:
+                raise RuntimeError('Unsupported block: %s' % body)
+            check_variable(pieces[1])
+            new_children = []
+            children.append(('block', pieces[0], pieces[1], new_children))
+            stack.append((pieces[0], pieces[1], new_children))
+        elif prefix == '/':
+            if stack[-1][0] != body:
+                raise RuntimeError('Unexpected close: %s' % body)
+            stack.pop()
+        else:
+            check_variable(body)
+            children.append(('var', body))
+
+    if len(stack) != 1:
+        raise RuntimeError('Unclosed block: %s' % stack[-1][0])
+
+    literal = source_standalone[position:]
+    check_literal(literal)
+    if literal != '':
+        root.append(literal)
+
+    return root
+
+
+def render_nodes(nodes, context, data):
+    """Render parsed template nodes.
+
+    Args:
+        nodes: The nodes as returned by parse_template.
+        context: The current value for this like the template values or an item within each.
+        data: Dictionary of @ variables like last within the current each.
+
+    Returns:
+        The rendered string.
+    """
+    def lookup(name):
+        if name in ('this', '.'):
+            return context
+        elif name.startswith('@'):
+            return data.get(name[1:], None)
+        elif isinstance(context, dict):
+            return context.get(name, None)
+        else:
+            return None
+
+    def stringify(value):
+        if value is None:
+            return ''
+        elif value is True:
+            return 'true'
+        elif value is False:
+            return 'false'
+        else:
+            return ''.join(map(lambda x: ESCAPES.get(x, x), str(value)))
+
+    def is_truthy(value):
+        return value not in (None, False, '', 0) and value != []
+
+    pieces = []
+
+    for node in nodes:
+        if isinstance(node, str):
+            pieces.append(node)
+        elif node[0] == 'var':
+            pieces.append(stringify(lookup(node[1])))
+        else:
+            helper = node[1]
+            value = lookup(node[2])
+            children = node[3]
+
+            if helper == 'each':
+                items = value if value is not None else []
+                for index, item in enumerate(items):
+                    item_data = {
+                        'index': index,
+                        'first': index == 0,
+                        'last': index == len(items) - 1
+                    }
+                    pieces.append(render_nodes(children, item, item_data))
+            elif helper == 'if':
+                if is_truthy(value):
+                    pieces.append(render_nodes(children, context, data))
+            else:
+                if not is_truthy(value):
+                    pieces.append(render_nodes(children, context, data))
+
+    return ''.join(pieces)
+
+
+def render_template(source, template_vals):
+    """Render a handlebars template using the subset of handlebars supported.
+
+    Args:
+        source: The template source.
+        template_vals: Dictionary of values available to the template.
+
+    Returns:
+        The rendered string.
+    """
+    return render_nodes(parse_template(source), template_vals, {})
+
+
+def get_hash(levers, files):
+    """Get a hash identifying the contents of a bundle.
+
+    Args:
+        levers: Dictionary from lever variable to rendered source.
+        files: Dictionary from filename to source for programs used without templating.
+
+    Returns:
+        Hex digest of the SHA-256 hash of the contents.
+    """
+    contents = json.dumps({'levers': levers, 'files': files}, sort_keys=True)
+    return hashlib.sha256(contents.encode('utf-8')).hexdigest()
+
+
+def main():
+    if len(sys.argv) != NUM_ARGS + 1:
+        print(USAGE_STR)
+        sys.exit(1)
+
+    pt_dir = sys.argv[1]
+    index_loc = sys.argv[2]
+    output_loc = sys.argv[3]
+
+    with open(index_loc) as f:
+        index = json.load(f)
+
+    def read_source(filename):
+        with open(os.path.join(pt_dir, filename)) as f:
+            return f.read()
+
+    levers = {}
+    for category in index['categories']:
+        for lever in category['levers']:
+            source = read_source(lever['template'])
+            try:
+                levers[lever['variable']] = render_template(source, lever.get('attrs', {}))
+            except RuntimeError as e:
+                raise RuntimeError('Failed to render %s: %s' % (lever['template'], e))
+
+    files = {}
+    for filename in sorted(os.listdir(pt_dir)):
+        if not filename.endswith('.pt'):
+            continue
+
+        source = read_source(filename)
+        if TAG_REGEX.search(source) is None:
+            files[filename] = source
+
+    bundle = {
+        'hash': get_hash(levers, files),
+        'levers': levers,
+        'files': files
+    }
+
+    with open(output_loc, 'w') as f:
+        json.dump(bundle, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+python support/render_bundle.py ./pt ./pt/index.json ./pt/bundle.json
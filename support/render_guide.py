@@ -1,11 +1,11 @@
 import datetime
 import json
 import math
-import os
 import string
 import sys
 
 import const
+import results_store
 
 USAGE_STR = 'python render_guide.py [template] [output] [standalone dir] [diagnostics]'
 NUM_ARGS = 4
@@ -16,61 +16,40 @@ ML_TO_KM = 0.0000000000005  #500mL is 0.0000000000005 cubic km
 MILES_PER_KM = 0.6213712
 
 
-def get_total_consumption(year, results_dir, region='global',
-    policy='businessAsUsual'):
+CONSUMPTION_ATTRS = [
+    'consumptionAgricultureMT',
+    'consumptionConstructionMT',
+    'consumptionElectronicMT',
+    'consumptionHouseholdLeisureSportsMT',
+    'consumptionPackagingMT',
+    'consumptionTransportationMT',
+    'consumptionTextileMT',
+    'consumptionOtherMT'
+]
 
-    if region == 'global':
-        get_for_region = lambda x: get_total_consumption(
-            year,
-            results_dir,
-            region=x,
-            policy=policy
-        )
-        return sum(map(get_for_region, const.REGIONS_NO_GLOBAL))
-    
-    if year == DEFAULT_YEAR:
-        filename = policy + '.json'
-    else:
-        policy_effective = policy if year >= 2024 else 'businessAsUsual'
-        filename = '%s%d.json' % (policy_effective, year)
-    
-    with open(os.path.join(results_dir, filename)) as f:
-        results = json.load(f)
-    
-    return sum([
-        results[region]['consumptionAgricultureMT'],
-        results[region]['consumptionConstructionMT'],
-        results[region]['consumptionElectronicMT'],
-        results[region]['consumptionHouseholdLeisureSportsMT'],
-        results[region]['consumptionPackagingMT'],
-        results[region]['consumptionTransportationMT'],
-        results[region]['consumptionTextileMT'],
-        results[region]['consumptionOtherMT']
-    ])
-
-
-def get_fate(year, results_dir, region='global', policy='businessAsUsual',
+
+def get_policy_effective(year, policy):
+    return policy if year >= 2024 else 'businessAsUsual'
+
+
+def get_total_consumption(year, store, region='global', policy='businessAsUsual'):
+    policy_effective = get_policy_effective(year, policy)
+    return store.get_total(policy_effective, year, CONSUMPTION_ATTRS, region=region)
+
+
+def get_fate(year, store, region='global', policy='businessAsUsual', fate='eolMismanagedMT'):
+    policy_effective = get_policy_effective(year, policy)
+    return store.get_value(policy_effective, year, fate, region=region)
+
+
+def get_fate_cumulative(start_year, end_year, store, policy='businessAsUsual',
     fate='eolMismanagedMT'):
-    if region == 'global':
-        get_for_region = lambda x: get_fate(
-            year,
-            results_dir,
-            region=x,
-            policy=policy,
-            fate=fate
-        )
-        return sum(map(get_for_region, const.REGIONS_NO_GLOBAL))
-    
-    if year == DEFAULT_YEAR:
-        filename = policy + '.json'
-    else:
-        policy_effective = policy if year >= 2024 else 'businessAsUsual'
-        filename = '%s%d.json' % (policy_effective, year)
-    
-    with open(os.path.join(results_dir, filename)) as f:
-        results = json.load(f)
-    
-    return results[region][fate]
+    years = range(start_year, end_year + 1)
+    historic_years = filter(lambda x: get_policy_effective(x, policy) != policy, years)
+    projection_years = filter(lambda x: get_policy_effective(x, policy) == policy, years)
+    historic = store.get_sum(fate, policy='businessAsUsual', years=historic_years)
+    projection = store.get_sum(fate, policy=policy, years=projection_years)
+    return historic + projection
 
 
 def get_percent_change(before, after):
@@ -101,61 +80,63 @@ def main():
     results_dir = sys.argv[3]
     diagnostics_loc = sys.argv[4]
 
-    total_consumption_2024 = get_total_consumption(2024, results_dir)
-    total_consumption_2050 = get_total_consumption(2050, results_dir)
+    store = results_store.load(results_dir)
+
+    total_consumption_2024 = get_total_consumption(2024, store)
+    total_consumption_2050 = get_total_consumption(2050, store)
     total_consumption_change = get_percent_change(
         total_consumption_2024,
         total_consumption_2050
     )
 
-    mismanaged_2024 = get_fate(2024, results_dir)
-    mismanaged_2050 = get_fate(2050, results_dir)
+    mismanaged_2024 = get_fate(2024, store)
+    mismanaged_2050 = get_fate(2050, store)
     mismanaged_change = get_percent_change(mismanaged_2024, mismanaged_2050)
 
-    mismanaged_row = get_fate(2050, results_dir, 'row')
+    mismanaged_row = get_fate(2050, store, 'row')
     other_regions = filter(lambda x: x != 'row', const.REGIONS_NO_GLOBAL)
-    mismanaged_other = sum(map(lambda x: get_fate(2050, results_dir, x), other_regions))
+    mismanaged_other = sum(map(lambda x: get_fate(2050, store, x), other_regions))
     mismanaged_row_ratio = mismanaged_row / mismanaged_other
     mismanaged_row_percent = mismanaged_row / mismanaged_2050 * 100
     
-    mismanaged_prod_cap = get_fate(2050, results_dir, policy='capVirgin')
+    mismanaged_prod_cap = get_fate(2050, store, policy='capVirgin')
     prod_cap_percent = get_percent_change(mismanaged_2050, mismanaged_prod_cap)
 
-    mismanaged_mrc = get_fate(2050, results_dir, policy='minimumRecycledContent')
+    mismanaged_mrc = get_fate(2050, store, policy='minimumRecycledContent')
     mrc_percent = get_percent_change(mismanaged_2050, mismanaged_mrc)
 
-    mismanaged_mrr = get_fate(2050, results_dir, policy='minimumRecyclingRate')
+    mismanaged_mrr = get_fate(2050, store, policy='minimumRecyclingRate')
     mrr_percent = get_percent_change(mismanaged_2050, mismanaged_mrr)
 
-    mismanaged_ps = get_fate(2050, results_dir, policy='banPsPackaging')
+    mismanaged_ps = get_fate(2050, store, policy='banPsPackaging')
     delta_ps = mismanaged_ps - mismanaged_2050
 
-    mismanaged_single_use = get_fate(2050, results_dir, policy='banSingleUse')
+    mismanaged_single_use = get_fate(2050, store, policy='banSingleUse')
     delta_single_use = mismanaged_single_use - mismanaged_2050
 
-    high_ambition_total = get_total_consumption(2050, results_dir, policy='highAmbition')
-    high_ambition_mismanaged = get_fate(2050, results_dir, policy='highAmbition')
+    high_ambition_total = get_total_consumption(2050, store, policy='highAmbition')
+    high_ambition_mismanaged = get_fate(2050, store, policy='highAmbition')
 
-    mismanaged_additives = get_fate(2050, results_dir, policy='reducedAdditives')
+    mismanaged_additives = get_fate(2050, store, policy='reducedAdditives')
     delta_additives = mismanaged_additives - mismanaged_2050
     
-    mismanaged_tax_virgin = get_fate(2050, results_dir, policy='taxVirgin')
+    mismanaged_tax_virgin = get_fate(2050, store, policy='taxVirgin')
     delta_tax_virgin = mismanaged_tax_virgin - mismanaged_2050
 
-    mismanaged_ban_waste_trade = get_fate(2050, results_dir, policy='banWasteTrade')
+    mismanaged_ban_waste_trade = get_fate(2050, store, policy='banWasteTrade')
     delta_ban_waste_trade = mismanaged_ban_waste_trade - mismanaged_2050
 
-    bau_recycle = get_fate(2050, results_dir, fate='eolRecyclingMT')
+    bau_recycle = get_fate(2050, store, fate='eolRecyclingMT')
     invest_recycle = get_fate(
         2050, 
-        results_dir,
+        store,
         fate='eolRecyclingMT',
         policy='recyclingInvestment'
     )
     invest_recycle_percent = get_percent_change(bau_recycle, invest_recycle)
     invest_recycle_mismanaged = get_fate(
         2050, 
-        results_dir,
+        store,
         policy='recyclingInvestment'
     )
     invest_recycle_mismanaged_percent = get_percent_change(
@@ -163,39 +144,30 @@ def main():
         invest_recycle_mismanaged
     )
 
-    invest_waste_mismanaged = get_fate(2050, results_dir, policy='wasteInvestment')
+    invest_waste_mismanaged = get_fate(2050, store, policy='wasteInvestment')
     invest_waste_percent = get_percent_change(mismanaged_2050, invest_waste_mismanaged)
 
-    tower_bau_mass_annual = get_fate(2050, results_dir)
+    tower_bau_mass_annual = get_fate(2050, store)
     tower_bau_km_annual = get_cone_height(tower_bau_mass_annual)
     tower_bau_miles_annual = km_to_miles(tower_bau_km_annual)
 
-    tower_intervention_mass_annual = get_fate(2050, results_dir, policy='highAmbition')
+    tower_intervention_mass_annual = get_fate(2050, store, policy='highAmbition')
     tower_intervention_km_annual = get_cone_height(tower_intervention_mass_annual)
     tower_intervention_miles_annual = km_to_miles(tower_intervention_km_annual)
 
-    tower_intervention_low_mass_annual = get_fate(2050, results_dir, policy='lowAmbition')
+    tower_intervention_low_mass_annual = get_fate(2050, store, policy='lowAmbition')
     tower_intervention_low_km_annual = get_cone_height(tower_intervention_low_mass_annual)
     tower_intervention_low_miles_annual = km_to_miles(tower_intervention_low_km_annual)
 
-    tower_bau_mass = sum(map(
-        lambda year: get_fate(year, results_dir),
-        range(2011, 2051)
-    ))
+    tower_bau_mass = get_fate_cumulative(2011, 2050, store)
     tower_bau_km = get_cone_height(tower_bau_mass)
     tower_bau_miles = km_to_miles(tower_bau_km)
 
-    tower_intervention_mass = sum(map(
-        lambda year: get_fate(year, results_dir, policy='highAmbition'),
-        range(2011, 2051)
-    ))
+    tower_intervention_mass = get_fate_cumulative(2011, 2050, store, policy='highAmbition')
     tower_intervention_km = get_cone_height(tower_intervention_mass)
     tower_intervention_miles = km_to_miles(tower_intervention_km)
 
-    tower_intervention_low_mass = sum(map(
-        lambda year: get_fate(year, results_dir, policy='lowAmbition'),
-        range(2011, 2051)
-    ))
+    tower_intervention_low_mass = get_fate_cumulative(2011, 2050, store, policy='lowAmbition')
     tower_intervention_low_km = get_cone_height(tower_intervention_low_mass)
     tower_intervention_low_miles = km_to_miles(tower_intervention_low_km)
     
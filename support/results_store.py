@@ -0,0 +1,425 @@
+"""In-memory index of standalone engine outputs.
+
+Loads every scenario output once into columnar arrays indexed by policy, year, and region so that
+statistics across many scenarios become lookups and vector sums instead of repeated file reads.
+Outputs may also be consolidated into a single SQLite database with one long format table
+(scenario, policy, year, region, attribute, value) which downstream readers can use in place of
+the individual JSON files.
+
+License: BSD
+"""
+
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+
+import numpy
+
+import const
+
+NUM_ARGS = 2
+USAGE_STR = 'python results_store.py [standalone dir] [output db]'
+DEFAULT_YEAR = 2050
+DATABASE_NAME = 'scenarios.db'
+TABLE_NAME = 'scenario_outputs'
+NAME_REGEX = re.compile('^(?P<policy>.*?)(?P<year>[0-9]{4})$')
+
+
+class ResultsStore:
+    """Columnar collection of outputs keyed by policy, year, and region."""
+
+    def __init__(self, records):
+        """Index outputs.
+
+        Args:
+            records: Iterable of dictionaries with name (file stem or other identifier for the
+                scenario run), policy, year, region, and values (dictionary from attribute to
+                number or None).
+        """
+        self._names = []
+        self._name_keys = {}
+        self._index = {}
+        self._row_names = []
+
+        policies = []
+        years = []
+        regions = []
+        values_by_attr = {}
+
+        for record in records:
+            name = record['name']
+            policy = record['policy']
+            year = record['year']
+            region = record['region']
+            row_index = len(policies)
+
+            if name not in self._name_keys:
+                self._names.append(name)
+                self._name_keys[name] = (policy, year)
+
+            for attr in record['values']:
+                if attr not in values_by_attr:
+                    values_by_attr[attr] = [None] * row_index
+
+            for attr in values_by_attr:
+                value = record['values'].get(attr, None)
+                values_by_attr[attr].append(value)
+
+            self._row_names.append(name)
+            policies.append(policy)
+            years.append(year)
+            regions.append(region)
+            self._index[(policy, year, region)] = row_index
+
+        def to_float_array(values):
+            return numpy.array(
+                [numpy.nan if x is None else x for x in values],
+                dtype=numpy.float64
+            )
+
+        self._policies = numpy.array(policies, dtype=object)
+        self._years = numpy.array(years, dtype=numpy.int32)
+        self._regions = numpy.array(regions, dtype=object)
+        self._values = dict(map(
+            lambda x: (x[0], to_float_array(x[1])),
+            values_by_attr.items()
+        ))
+
+    def get_names(self):
+        """Get the scenario run names in the order they were loaded."""
+        return self._names
+
+    def get_name_key(self, name):
+        """Get the (policy, year) for a scenario run name."""
+        return self._name_keys[name]
+
+    def get_attrs(self):
+        """Get the attributes available."""
+        return list(self._values.keys())
+
+    def has(self, policy, year, region='global'):
+        """Determine if outputs are available for a policy, year, and region."""
+        if region == 'global':
+            return all(map(
+                lambda x: (policy, year, x) in self._index,
+                const.REGIONS_NO_GLOBAL
+            ))
+        else:
+            return (policy, year, region) in self._index
+
+    def get_value(self, policy, year, attr, region='global'):
+        """Get a single value where global is the sum across regions.
+
+        Args:
+            policy: The name of the policy like businessAsUsual.
+            year: The year as an integer.
+            attr: The attribute like eolMismanagedMT.
+            region: The region or global to sum across all regions.
+
+        Returns:
+            The value as a float.
+        """
+        attr_values = self._values[attr]
+
+        if region == 'global':
+            return float(sum(map(
+                lambda x: attr_values[self._index[(policy, year, x)]],
+                const.REGIONS_NO_GLOBAL
+            )))
+        else:
+            return float(attr_values[self._index[(policy, year, region)]])
+
+    def get_total(self, policy, year, attrs, region='global'):
+        """Get the sum of multiple attributes like all consumption sectors."""
+        if region == 'global':
+            return sum(map(
+                lambda x: self.get_total(policy, year, attrs, region=x),
+                const.REGIONS_NO_GLOBAL
+            ))
+        else:
+            return sum(map(lambda x: self.get_value(policy, year, x, region=region), attrs))
+
+    def get_column(self, attr):
+        """Get all values for an attribute as an array aligned with get_mask."""
+        return self._values[attr]
+
+    def get_mask(self, policy=None, years=None, region=None):
+        """Get a boolean array selecting rows matching optional filters.
+
+        Args:
+            policy: Optional policy name to require.
+            years: Optional iterable of years to include.
+            region: Optional region to require. If None or global, rows for each region are
+                selected (see const.REGIONS_NO_GLOBAL) but not rows already summed to global.
+
+        Returns:
+            Boolean numpy array aligned with get_column.
+        """
+        mask = numpy.ones(len(self._policies), dtype=bool)
+
+        if policy is not None:
+            mask &= self._policies == policy
+
+        if years is not None:
+            mask &= numpy.isin(self._years, list(years))
+
+        if region is None or region == 'global':
+            mask &= numpy.isin(self._regions, const.REGIONS_NO_GLOBAL)
+        else:
+            mask &= self._regions == region
+
+        return mask
+
+    def get_sum(self, attr, policy=None, years=None, region=None):
+        """Sum an attribute across all rows matching optional filters."""
+        mask = self.get_mask(policy=policy, years=years, region=region)
+        return float(numpy.sum(self._values[attr][mask]))
+
+    def get_long_rows(self):
+        """Get every value as a scenario, policy, year, region, attribute, value tuple.
+
+        Returns:
+            Iterator over tuples where missing values are None.
+        """
+        for row_index in range(len(self._row_names)):
+            for (attr, values) in self._values.items():
+                value = values[row_index]
+                yield (
+                    self._row_names[row_index],
+                    self._policies[row_index],
+                    int(self._years[row_index]),
+                    self._regions[row_index],
+                    attr,
+                    None if numpy.isnan(value) else float(value)
+                )
+
+
+def parse_name(name):
+    """Determine the policy and year for a standalone output file stem.
+
+    Args:
+        name: File stem like capVirgin (2050) or businessAsUsual2030.
+
+    Returns:
+        Tuple of policy name and year.
+    """
+    match = NAME_REGEX.match(name)
+    if match:
+        return (match.group('policy'), int(match.group('year')))
+    else:
+        return (name, DEFAULT_YEAR)
+
+
+def get_records_from_output(name, contents):
+    """Get records from the parsed JSON output of the standalone engine.
+
+    Args:
+        name: The file stem for the output.
+        contents: Parsed JSON which is either region to attributes or, for multi-year jobs, year
+            to region to attributes.
+
+    Returns:
+        List of records like expected by ResultsStore.
+    """
+    is_multi_year = len(contents) > 0 and all(map(lambda x: x.isdigit(), contents.keys()))
+
+    if is_multi_year:
+        policy = name
+        by_year = map(lambda x: (int(x[0]), x[1]), contents.items())
+    else:
+        (policy, year) = parse_name(name)
+        by_year = [(year, contents)]
+
+    records = []
+    for (year, regions) in by_year:
+        for region in regions:
+            records.append({
+                'name': name,
+                'policy': policy,
+                'year': year,
+                'region': region,
+                'values': regions[region]
+            })
+
+    return records
+
+
+def load_from_files(locs):
+    """Load outputs from a list of standalone engine JSON files.
+
+    Args:
+        locs: Paths to the JSON files.
+
+    Returns:
+        Newly built ResultsStore.
+    """
+    records = []
+
+    for loc in locs:
+        name = pathlib.Path(loc).stem
+
+        with open(loc) as f:
+            contents = json.load(f)
+
+        records.extend(get_records_from_output(name, contents))
+
+    return ResultsStore(records)
+
+
+def load_from_directory(results_dir):
+    """Load all standalone engine JSON outputs within a directory.
+
+    Args:
+        results_dir: Path to the directory like standalone_tasks.
+
+    Returns:
+        Newly built ResultsStore.
+    """
+    return load_from_files(get_output_locs(results_dir))
+
+
+def get_output_locs(results_dir):
+    """Get the paths to the standalone engine JSON outputs within a directory in sorted order."""
+    names = sorted(filter(lambda x: x.endswith('.json'), os.listdir(results_dir)))
+    return list(map(lambda x: os.path.join(results_dir, x), names))
+
+
+def get_database_loc(results_dir):
+    """Get the path at which the consolidated database for a directory of outputs is expected."""
+    return os.path.join(results_dir, DATABASE_NAME)
+
+
+def has_fresh_database(results_dir):
+    """Determine if a directory has a database at least as new as all of its JSON outputs."""
+    database_loc = get_database_loc(results_dir)
+
+    if not os.path.exists(database_loc):
+        return False
+
+    database_time = os.path.getmtime(database_loc)
+    return all(map(
+        lambda x: os.path.getmtime(x) <= database_time,
+        get_output_locs(results_dir)
+    ))
+
+
+def write_database(store, output_loc):
+    """Write all values in a store to a consolidated SQLite database.
+
+    Args:
+        store: The ResultsStore to write.
+        output_loc: Path where the database should be written. Any existing database is replaced.
+    """
+    temp_loc = output_loc + '.tmp'
+    if os.path.exists(temp_loc):
+        os.remove(temp_loc)
+
+    connection = sqlite3.connect(temp_loc)
+    try:
+        connection.execute(
+            '''
+            CREATE TABLE %s (
+                scenario TEXT,
+                policy TEXT,
+                year INTEGER,
+                region TEXT,
+                attribute TEXT,
+                value REAL
+            )
+            ''' % TABLE_NAME
+        )
+        connection.executemany(
+            'INSERT INTO %s VALUES (?, ?, ?, ?, ?, ?)' % TABLE_NAME,
+            store.get_long_rows()
+        )
+        connection.execute(
+            'CREATE INDEX %s_key ON %s (policy, year, region)' % (TABLE_NAME, TABLE_NAME)
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+    # Rename so readers never see a partially written database.
+    os.replace(temp_loc, output_loc)
+
+
+def load_from_database(database_loc):
+    """Load outputs from a consolidated SQLite database.
+
+    Args:
+        database_loc: Path to the database like standalone_tasks/scenarios.db.
+
+    Returns:
+        Newly built ResultsStore.
+    """
+    connection = sqlite3.connect(database_loc)
+    try:
+        cursor = connection.execute(
+            '''
+            SELECT
+                scenario,
+                policy,
+                year,
+                region,
+                attribute,
+                value
+            FROM
+                %s
+            ORDER BY
+                rowid
+            ''' % TABLE_NAME
+        )
+
+        records = []
+        records_by_key = {}
+        for (scenario, policy, year, region, attribute, value) in cursor:
+            key = (scenario, year, region)
+            if key not in records_by_key:
+                record = {
+                    'name': scenario,
+                    'policy': policy,
+                    'year': year,
+                    'region': region,
+                    'values': {}
+                }
+                records_by_key[key] = record
+                records.append(record)
+
+            records_by_key[key]['values'][attribute] = value
+    finally:
+        connection.close()
+
+    return ResultsStore(records)
+
+
+def load(results_dir):
+    """Load outputs from a directory, using its consolidated database if up to date.
+
+    Args:
+        results_dir: Path to the directory like standalone_tasks.
+
+    Returns:
+        Newly built ResultsStore.
+    """
+    if has_fresh_database(results_dir):
+        return load_from_database(get_database_loc(results_dir))
+    else:
+        return load_from_directory(results_dir)
+
+
+def main():
+    if len(sys.argv) != NUM_ARGS + 1:
+        print(USAGE_STR)
+        sys.exit(1)
+
+    results_dir = sys.argv[1]
+    output_loc = sys.argv[2]
+
+    write_database(load_from_directory(results_dir), output_loc)
+
+
+if __name__ == '__main__':
+    main()
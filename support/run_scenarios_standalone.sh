@@ -1,10 +1,5 @@
 mkdir standalone_tasks
-python support/build_scenarios.py pt/scenarios.json js_standalone/example.json ./standalone_tasks
+python support/build_scenarios.py --execute pt/scenarios.json js_standalone/example.json ./standalone_tasks ./js_standalone $(nproc) 600 2 ./standalone_errors.txt ./standalone_cache
 
-cd js_standalone
-for file in ../standalone_tasks/*.json; do 
-    npm run standalone "$file" "$file" "test_error.txt"
-done
-cd ..
-
-python support/scenarios_overview.py ./standalone_tasks/scenarios_overview.csv ./standalone_tasks/*.json
+python support/results_store.py ./standalone_tasks ./standalone_tasks/scenarios.db
+python support/scenarios_overview.py ./standalone_tasks/scenarios_overview.csv ./standalone_tasks/scenarios.db
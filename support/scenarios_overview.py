@@ -1,12 +1,11 @@
 import csv
-import json
-import pathlib
 import sys
 
 import const
+import results_store
 
 NUM_ARGS = 2
-USAGE_STR = 'python scenarios_overview.py [csv loc] [path to json files]'
+USAGE_STR = 'python scenarios_overview.py [csv loc] [scenarios db or paths to json files]'
 ATTRS = [
     'eolRecyclingMT',
     'eolLandfillMT',
@@ -44,28 +43,22 @@ def main():
     output_loc = sys.argv[1]
     input_locs = sys.argv[2:]
 
+    if len(input_locs) == 1 and input_locs[0].endswith('.db'):
+        store = results_store.load_from_database(input_locs[0])
+    else:
+        store = results_store.load_from_files(input_locs)
+
     output_rows = []
-    for input_loc in input_locs:
-        name = pathlib.Path(input_loc).stem
-        
-        with open(input_loc) as f:
-            input_src = json.load(f)
-        
-        input_src['global'] = {}
-        for attr in ATTRS:
-            input_src['global'][attr] = sum(map(
-                lambda x: input_src[x][attr],
-                REGIONS
-            ))
-        
-        for attr in TRADE_ATTRS:
-            input_src['global'][attr] = None
-        
+    for name in store.get_names():
+        (policy, year) = store.get_name_key(name)
         regions_with_global = REGIONS + ['global']
         for region in regions_with_global:
             new_row = {'region': region, 'scenario': name}
             for attr in ATTRS:
-                new_row[attr] = input_src[region][attr]
+                if region == 'global' and attr in TRADE_ATTRS:
+                    new_row[attr] = None
+                else:
+                    new_row[attr] = store.get_value(policy, year, attr, region=region)
             output_rows.append(new_row)
         
     with open(output_loc, 'w') as f:
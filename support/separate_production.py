@@ -1,7 +1,18 @@
-import csv
+"""Split domestic production into primary and secondary production.
+
+License: BSD
+"""
+
 import sys
 
-USAGE_STR = 'python separate_production.py [input] [output] [recycle delay] [yield loss] [start]'
+import numpy
+import pandas
+
+USAGE_STR = ' '.join([
+    'python separate_production.py',
+    '[input] [output] [recycle delay] [yield loss] [start]',
+    '[optional additional input] [optional additional output] ...'
+])
 NUM_ARGS = 5
 OUTPUT_COLS = [
     'year',
@@ -27,66 +38,82 @@ OUTPUT_COLS = [
 ]
 
 
-def partial_parse_record(record):
-    record['year'] = int(record['year'])
-    record['eolRecyclingMT'] = float(record['eolRecyclingMT'])
-    record['domesticProductionMT'] = float(record['domesticProductionMT'])
-    return record
-
-
-def get_key(year, region):
-    return '%d\t%s' % (year, region)
-
-
-def strip_record(record):
-    return dict(map(lambda x: (x, record[x]), OUTPUT_COLS))
+def format_floats(values):
+    """Format floats like the csv module would (shortest repr) to keep outputs stable."""
+    return pandas.Series([repr(float(x)) for x in values], index=values.index)
+
+
+def separate_production(records, recycle_delay, yield_loss, start_year):
+    """Calculate primary and secondary production for records from an overview CSV.
+
+    Args:
+        records: DataFrame with all columns read as strings.
+        recycle_delay: Years between collection for recycling and secondary production.
+        yield_loss: Percent of recycling lost before becoming secondary production.
+        start_year: The first year to include in the output.
+
+    Returns:
+        DataFrame with OUTPUT_COLS as strings for the records at or after start_year.
+    """
+    years = records['year'].astype(numpy.int64)
+    region_ids, _ = pandas.factorize(records['region'])
+    recycling = records['eolRecyclingMT'].astype(numpy.float64)
+    production = records['domesticProductionMT'].astype(numpy.float64)
+
+    # Index recycling by (region, year + delay) so a join finds the lagged collection volume.
+    lagged = pandas.Series(
+        recycling.to_numpy(),
+        index=pandas.MultiIndex.from_arrays([region_ids, years.to_numpy() + recycle_delay])
+    )
+    lagged = lagged[~lagged.index.duplicated(keep='last')]
+
+    allowed = (years >= start_year).to_numpy()
+    target_index = pandas.MultiIndex.from_arrays([region_ids[allowed], years[allowed]])
+    input_recycling = lagged.reindex(target_index).to_numpy()
+
+    missing = numpy.isnan(input_recycling)
+    if missing.any():
+        first_missing = numpy.argmax(missing)
+        missing_year = years[allowed].to_numpy()[first_missing] - recycle_delay
+        missing_region = records['region'].to_numpy()[allowed][first_missing]
+        raise KeyError('Could not find %s in %d' % (missing_region, missing_year))
+
+    original_primary = production.to_numpy()[allowed]
+    secondary_naive = input_recycling * (1 - yield_loss / 100)
+    secondary = numpy.where(
+        original_primary < secondary_naive,
+        original_primary,
+        secondary_naive
+    )
+    primary = original_primary - secondary
+
+    output = records.loc[allowed].copy()
+    output['year'] = years[allowed].astype(str)
+    output['eolRecyclingMT'] = format_floats(recycling[allowed])
+    output['primaryProductionMT'] = format_floats(pandas.Series(primary, index=output.index))
+    output['secondaryProductionMT'] = format_floats(pandas.Series(secondary, index=output.index))
+
+    return output[OUTPUT_COLS]
 
 
 def main():
-    if len(sys.argv) != NUM_ARGS + 1:
+    num_extra = len(sys.argv) - (NUM_ARGS + 1)
+    if num_extra < 0 or num_extra % 2 != 0:
         print(USAGE_STR)
         sys.exit(1)
-    
-    input_loc = sys.argv[1]
-    output_loc = sys.argv[2]
+
     recycle_delay = int(sys.argv[3])
     yield_loss = float(sys.argv[4])
     start_year = int(sys.argv[5])
 
-    indexed_records = {}
-    flat_records = []
-    with open(input_loc) as f:
-        raw_records = csv.DictReader(f)
-        parsed_records = map(partial_parse_record, raw_records)
-
-        for record in parsed_records:
-            key = get_key(record['year'], record['region'])
-            indexed_records[key] = record
-            flat_records.append(record)
-    
-    def transform_record(record):
-        input_key = get_key(record['year'] - recycle_delay, record['region'])
-        input_record = indexed_records[input_key]
-        input_recycling = input_record['eolRecyclingMT']
-        
-        original_primary = record['domesticProductionMT']
-        secondary_naive = input_recycling * (1 - yield_loss / 100)
-        secondary = original_primary if original_primary < secondary_naive else secondary_naive
-        primary = original_primary - secondary
-
-        record['primaryProductionMT'] = primary
-        record['secondaryProductionMT'] = secondary
-
-        return record
-    
-    allowed_records = filter(lambda x: x['year'] >= start_year, flat_records)
-    transformed_records = map(transform_record, allowed_records)
-    stripped_records = map(strip_record, transformed_records)
-
-    with open(output_loc, 'w') as f:
-        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLS)
-        writer.writeheader()
-        writer.writerows(stripped_records)
+    locs = [(sys.argv[1], sys.argv[2])] + [
+        (sys.argv[i], sys.argv[i + 1]) for i in range(NUM_ARGS + 1, len(sys.argv), 2)
+    ]
+
+    for (input_loc, output_loc) in locs:
+        records = pandas.read_csv(input_loc, dtype=str, keep_default_na=False)
+        output = separate_production(records, recycle_delay, yield_loss, start_year)
+        output.to_csv(output_loc, index=False, lineterminator='\r\n')
 
 
 if __name__ == '__main__':
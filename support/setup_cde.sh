@@ -1,7 +1,9 @@
 pip install -r requirements.txt
 bash support/render_index.sh
+bash support/render_bundle.sh
 
 [ ! -e pt/index.json ] && exit 1;
+[ ! -e pt/bundle.json ] && exit 4;
 
 bash support/setup_local.sh
 
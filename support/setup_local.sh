@@ -5,6 +5,11 @@ bash support/prepare_data.sh
 
 [ ! -e data/overview_ml.csv ] && exit 1;
 
+[ ! -e pt/index.json ] && bash support/render_index.sh
+bash support/render_bundle.sh
+
+[ ! -e pt/bundle.json ] && exit 2;
+
 bash support/npm_install.sh
 bash support/load_deps.sh
 bash support/make.sh
@@ -2,6 +2,8 @@ import csv
 import json
 import sys
 
+import columnar_data
+
 NUM_ARGS = 2
 USAGE_STR = 'python update_scenarios.py [data csv] [scenarios]'
 TARGET_YEAR = 2020
@@ -16,12 +18,20 @@ def main():
     scenarios_loc = sys.argv[2]
 
     totals = {}
-    with open(data_loc) as f:
-        input_data = csv.DictReader(f)
-        data_2030 = filter(lambda x: int(x['year']) == TARGET_YEAR, input_data)
-        for region_record in data_2030:
-            region = region_record['region']
-            totals[region] = float(region_record['primaryProductionMT'])
+    if columnar_data.has_fresh_snapshot(data_loc):
+        snapshot = columnar_data.ColumnarData(columnar_data.get_snapshot_loc(data_loc))
+        regions = snapshot.get_regions()
+        region_ids = snapshot.get_column('region')
+        production = snapshot.get_column('primaryProductionMT')
+        for i in snapshot.get_indices(year=TARGET_YEAR):
+            totals[regions[region_ids[i]]] = float(production[i])
+    else:
+        with open(data_loc) as f:
+            input_data = csv.DictReader(f)
+            data_2030 = filter(lambda x: int(x['year']) == TARGET_YEAR, input_data)
+            for region_record in data_2030:
+                region = region_record['region']
+                totals[region] = float(region_record['primaryProductionMT'])
 
     with open(scenarios_loc) as f:
         scenarios = json.load(f)
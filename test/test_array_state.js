@@ -0,0 +1,91 @@
+function buildArrayStateTest() {
+
+    QUnit.module("array_state", function() {
+
+        function buildOutputs() {
+            const schema = new StateSchema(["china", "row"], ["a", "b"]);
+            return new ArrayOutputs(schema, new Float64Array([1, 2, 3, 4]));
+        }
+
+        QUnit.test("schema offsets", function(assert) {
+            const schema = new StateSchema(["china", "row"], ["a", "b"]);
+            assert.equal(schema.getSize(), 4);
+            assert.equal(schema.getOffset("row", "a"), 2);
+            assert.equal(schema.getRegionIndex("other"), -1);
+        });
+
+        QUnit.test("reads and writes array", function(assert) {
+            const outputs = buildOutputs();
+            outputs.get("row").set("b", 5);
+            assert.equal(outputs.get("china").get("a"), 1);
+            assert.equal(outputs.getValues()[3], 5);
+        });
+
+        QUnit.test("keeps extra attributes", function(assert) {
+            const outputs = buildOutputs();
+            outputs.get("china").set("region", "china");
+            outputs.set("global", new Map([["a", 4]]));
+            assert.equal(outputs.get("china").get("region"), "china");
+            assert.equal(outputs.get("china").size, 3);
+            assert.equal(outputs.get("global").get("a"), 4);
+            assert.deepEqual(Array.of(...outputs.keys()), ["china", "row", "global"]);
+        });
+
+        QUnit.test("packs and unpacks state", function(assert) {
+            const outputs = buildOutputs();
+            outputs.get("china").set("region", "china");
+            outputs.set("global", new Map([["a", 4]]));
+
+            const state = new Map();
+            state.set("out", outputs);
+            state.set("in", new Map([["x", 1]]));
+
+            const packed = packStateForTransfer(state);
+            assert.equal(packed["transfer"].length, 1);
+
+            const cloned = structuredClone(packed["state"], {"transfer": packed["transfer"]});
+            const unpacked = unpackStateFromTransfer(cloned);
+            const unpackedOut = unpacked.get("out");
+            assert.ok(unpackedOut instanceof ArrayOutputs);
+            assert.equal(unpackedOut.get("row").get("b"), 4);
+            assert.equal(unpackedOut.get("china").get("region"), "china");
+            assert.equal(unpackedOut.get("global").get("a"), 4);
+            assert.equal(unpacked.get("in").get("x"), 1);
+        });
+
+        QUnit.test("copies shared arrays before packing", function(assert) {
+            const schema = new StateSchema(["china"], ["a", "b"]);
+            const shared = new Float64Array([1, 2, 3, 4]);
+            const outputs = new ArrayOutputs(schema, shared, 2);
+
+            const state = new Map();
+            state.set("out", outputs);
+
+            const packed = packStateForTransfer(state);
+            assert.deepEqual(Array.of(...packed["state"].get("out")["values"]), [3, 4]);
+            assert.equal(shared.length, 4);
+        });
+
+        QUnit.test("packs batch into one buffer", function(assert) {
+            const buildState = (offset) => {
+                const outputs = buildOutputs();
+                outputs.get("china").set("a", offset);
+                return new Map([["out", outputs]]);
+            };
+
+            const packed = packStatesForTransfer([buildState(10), buildState(20)]);
+            assert.equal(packed["transfer"].length, 1);
+
+            const cloned = structuredClone(packed["states"], {"transfer": packed["transfer"]});
+            const unpacked = unpackStatesFromTransfer(cloned);
+            assert.equal(unpacked[0].get("out").get("china").get("a"), 10);
+            assert.equal(unpacked[1].get("out").get("china").get("a"), 20);
+            assert.equal(unpacked[1].get("out").get("row").get("b"), 4);
+            assert.equal(unpacked[1].get("out").getOffset(), 4);
+        });
+
+    });
+}
+
+
+export {buildArrayStateTest};
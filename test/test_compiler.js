@@ -1,4 +1,5 @@
 import {Compiler} from "compiler";
+import {RandomSource} from "random";
 
 
 function buildCompilerTest() {
@@ -88,6 +89,25 @@ function buildCompilerTest() {
             assert.ok(workspace.get("out").get("test") <= 10);
         });
 
+        QUnit.test("draw seeded", function(assert) {
+            const code = [
+                "var inner = draw normally from mean of 5 std of 1;",
+                "out.test = inner + draw uniformly from in.test to 10;"
+            ].join("\n");
+
+            const compileResult = compileProgram(code);
+            assert.ok(compileResult.getErrors().length == 0);
+
+            const program = compileResult.getProgram();
+            const runSeeded = () => {
+                const workspace = buildWorkspace();
+                workspace.get("meta").set("random", new RandomSource(42));
+                program(workspace);
+                return workspace.get("out").get("test");
+            };
+            assert.equal(runSeeded(), runSeeded());
+        });
+
         QUnit.test("repeat sum", function(assert) {
             const workspace = buildWorkspace();
             const code = [
@@ -491,6 +511,47 @@ function buildCompilerTest() {
             
         });
 
+        QUnit.test("nested identifier", function(assert) {
+            const workspace = buildWorkspace();
+            workspace.get("out").set("china", new Map());
+            workspace.get("out").get("china").set("test", 2);
+            const code = "out.china.test = out.china.test + in.test;";
+
+            const compileResult = compileProgram(code);
+            assert.ok(compileResult.getErrors().length == 0);
+
+            const program = compileResult.getProgram();
+            program(workspace);
+            program(workspace);
+            assert.ok(workspace.get("out").get("china").get("test") == 12);
+        });
+
+        QUnit.test("missing identifier", function(assert) {
+            const workspace = buildWorkspace();
+            const code = "out.other = in.test;";
+
+            const compileResult = compileProgram(code);
+            assert.ok(compileResult.getErrors().length == 0);
+
+            const program = compileResult.getProgram();
+            try {
+                program(workspace);
+                assert.ok(false);
+            } catch {
+                assert.ok(!workspace.get("out").has("other"));
+            }
+        });
+
+        QUnit.test("dependencies", function(assert) {
+            const compileResult = compileProgram("out.china.test = out.china.test + in.test;");
+            assert.deepEqual(compileResult.getReads(), ["in.test", "out.china.test"]);
+            assert.deepEqual(compileResult.getWrites(), ["out.china.test"]);
+            assert.ok(!compileResult.isStochastic());
+
+            const drawResult = compileProgram("out.test = draw uniformly from 5 to 10;");
+            assert.ok(drawResult.isStochastic());
+        });
+
     });
 }
 
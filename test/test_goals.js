@@ -0,0 +1,43 @@
+import {getGoalRequirements, getGoals} from "goals";
+
+
+function buildGoalsTest() {
+    QUnit.module("goals", function() {
+
+        function buildState() {
+            const out = new Map();
+            ["global", "china", "eu30", "nafta", "row"].forEach((region) => {
+                out.set(region, new Map([["eolLandfillMT", 2], ["eolRecyclingMT", 3]]));
+            });
+            return new Map([["out", out]]);
+        }
+
+        QUnit.test("gets only requested goals", function(assert) {
+            const goals = getGoals(buildState(), ["landfillWaste", "recycling"]);
+            const chinaGoals = goals.get("china");
+            assert.equal(chinaGoals.size, 2);
+            assert.equal(chinaGoals.get("landfillWaste"), 2);
+            assert.equal(chinaGoals.get("recycling"), 3);
+        });
+
+        QUnit.test("requires ghg only for ghg goal", function(assert) {
+            const wasteRequirements = getGoalRequirements(["landfillWaste", "recycling"]);
+            assert.deepEqual(wasteRequirements["attrs"], ["eolLandfillMT", "eolRecyclingMT"]);
+            assert.deepEqual(wasteRequirements["stages"], []);
+
+            const ghgRequirements = getGoalRequirements(["ghg"]);
+            assert.deepEqual(ghgRequirements["attrs"], []);
+            assert.deepEqual(ghgRequirements["stages"], ["ghg"]);
+        });
+
+        QUnit.test("requires attrs for all goals by default", function(assert) {
+            const requirements = getGoalRequirements();
+            assert.ok(requirements["attrs"].indexOf("secondaryProductionMT") != -1);
+            assert.ok(requirements["attrs"].indexOf("netImportsMT") == -1);
+            assert.deepEqual(requirements["stages"], ["ghg"]);
+        });
+    });
+}
+
+
+export {buildGoalsTest};
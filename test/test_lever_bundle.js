@@ -0,0 +1,32 @@
+import {LeverBundle} from "lever_bundle";
+
+
+function buildLeverBundleTest() {
+    QUnit.module("lever_bundle", function() {
+
+        function buildBundle() {
+            return new LeverBundle(
+                "abc",
+                {"chinaPercentReducePs": "var x = 1;"},
+                {"sim_bau.pt": "# bau"},
+            );
+        }
+
+        QUnit.test("gets lever code", function(assert) {
+            const bundle = buildBundle();
+            assert.equal(bundle.getHash(), "abc");
+            assert.equal(bundle.getLeverCode("chinaPercentReducePs"), "var x = 1;");
+            assert.equal(bundle.getLeverCode("other"), null);
+        });
+
+        QUnit.test("gets file code", function(assert) {
+            const bundle = buildBundle();
+            assert.equal(bundle.getFileCode("sim_bau.pt"), "# bau");
+            assert.equal(bundle.getFileCode("sim_other.pt"), null);
+        });
+
+    });
+}
+
+
+export {buildLeverBundleTest};
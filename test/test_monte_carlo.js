@@ -0,0 +1,105 @@
+import {MonteCarloExecutor, MonteCarloSummary} from "monte_carlo";
+
+
+function buildMonteCarloTest() {
+    QUnit.module("monte_carlo", function() {
+
+        function buildRecord(series, value) {
+            const regionRecord = new Map();
+            regionRecord.set("series", series);
+            regionRecord.set("region", "china");
+            regionRecord.set("recycling", value);
+            return new Map([["china", regionRecord]]);
+        }
+
+        QUnit.test("summarizes online", function(assert) {
+            const summary = new MonteCarloSummary();
+            [2, 4, 4, 4, 5, 5, 7, 9].forEach((x) => summary.add(buildRecord("baseline", x)));
+            summary.add(buildRecord("other", 1));
+
+            const records = summary.getRecords();
+            assert.equal(records.length, 2);
+            assert.equal(records[0]["series"], "baseline");
+            assert.equal(records[0]["region"], "china");
+            assert.equal(records[0]["variable"], "recycling");
+            assert.ok(Math.abs(records[0]["mean"] - 5) < 0.00001);
+            assert.ok(Math.abs(records[0]["std"] - 2) < 0.00001);
+            assert.equal(records[1]["std"], 0);
+        });
+
+        QUnit.test("runs all trials with limited concurrency", function(assert) {
+            const done = assert.async();
+
+            let inFlight = 0;
+            let maxInFlight = 0;
+            const executor = new MonteCarloExecutor((index) => {
+                inFlight++;
+                maxInFlight = Math.max(inFlight, maxInFlight);
+                return new Promise((resolve) => setTimeout(() => {
+                    inFlight--;
+                    resolve(index);
+                }, 1));
+            }, 3);
+
+            const indices = [];
+            const progress = [];
+            executor.run(10, (x) => indices.push(x), (x) => progress.push(x)).then((count) => {
+                assert.equal(count, 10);
+                assert.equal(maxInFlight, 3);
+                assert.deepEqual(indices.sort((a, b) => a - b), [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]);
+                assert.equal(progress[progress.length - 1], 10);
+                done();
+            });
+        });
+
+        QUnit.test("reports precision of tracked means", function(assert) {
+            const summary = new MonteCarloSummary();
+            [4, 6].forEach((x) => summary.add(buildRecord("baseline", x)));
+            summary.add(buildRecord("other", 1));
+            summary.add(buildRecord("other", 1));
+
+            const isTracked = (region, variable) => variable === "recycling";
+            const precision = summary.getPrecision("baseline", 2, isTracked);
+            assert.ok(Math.abs(precision - 0.4) < 0.00001);
+            assert.equal(summary.getPrecision("other", 2, isTracked), 0);
+            assert.equal(summary.getPrecision("baseline", 2, () => false), 0);
+        });
+
+        QUnit.test("stops adaptive runs between rounds", function(assert) {
+            const done = assert.async();
+
+            const executor = new MonteCarloExecutor((index) => Promise.resolve(index), 2);
+
+            const indices = [];
+            const checks = [];
+            const shouldStop = (completed) => {
+                checks.push(completed);
+                return completed >= 6;
+            };
+
+            executor.runAdaptive(20, 3, (x) => indices.push(x), shouldStop).then((count) => {
+                assert.equal(count, 6);
+                assert.deepEqual(checks, [3, 6]);
+                assert.deepEqual(indices.sort((a, b) => a - b), [0, 1, 2, 3, 4, 5]);
+                done();
+            });
+        });
+
+        QUnit.test("caps adaptive runs", function(assert) {
+            const done = assert.async();
+
+            const executor = new MonteCarloExecutor((index) => Promise.resolve(index), 2);
+
+            const indices = [];
+            executor.runAdaptive(7, 3, (x) => indices.push(x), () => false).then((count) => {
+                assert.equal(count, 7);
+                assert.equal(indices.length, 7);
+                done();
+            });
+        });
+
+    });
+}
+
+
+export {buildMonteCarloTest};
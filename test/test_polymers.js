@@ -50,6 +50,53 @@ function buildPolymerTest() {
             });
         });
 
+        QUnit.test("rebuild matricies from message", function(assert) {
+            const done = assert.async();
+            const matrixFuture = buildMatricies();
+            matrixFuture.then((original) => {
+                const message = structuredClone(original.toMessage());
+                const rebuilt = buildPolymerMatriciesFromMessage(message);
+
+                const polymerOriginal = original.getPolymer("china", "transportation", "ldpe");
+                const polymerRebuilt = rebuilt.getPolymer("china", "transportation", "ldpe");
+                assert.equal(polymerRebuilt.getPercent(), polymerOriginal.getPercent());
+                assert.equal(polymerRebuilt.getSeries(), polymerOriginal.getSeries());
+
+                const subtypeOriginal = original.getSubtype(2048, "nafta", "packaging");
+                const subtypeRebuilt = rebuilt.getSubtype(2048, "nafta", "packaging");
+                assert.equal(subtypeRebuilt.getRatio(), subtypeOriginal.getRatio());
+
+                const tradeOriginal = original.getResinTrade(2048, "row");
+                const tradeRebuilt = rebuilt.getResinTrade(2048, "row");
+                assert.equal(tradeRebuilt.getNetImportResin(), tradeOriginal.getNetImportResin());
+
+                assert.deepEqual(
+                    Array.from(rebuilt.getRegions()),
+                    Array.from(original.getRegions()),
+                );
+                done();
+            });
+        });
+
+        QUnit.test("build dense matricies", function(assert) {
+            const builder = new PolymerMatriciesBuilder();
+            builder.addSubtype(new SubtypeInfo(2050, "china", "packaging", 0.2));
+            builder.addSubtype(new SubtypeInfo(2050, "row", "packaging", 0.3));
+            builder.addPolymer(new PolymerInfo("packaging", "china", "pet", 0.4, "goods"));
+            builder.addResinTrade(new ResinTrade(2050, "row", 5));
+            const matricies = builder.build();
+
+            assert.equal(matricies.getSubtype(2050, "ROW", "packaging").getRatio(), 0.3);
+            assert.equal(matricies.getPolymer("china", "Packaging", "pet").getPercent(), 0.4);
+            assert.equal(matricies.getPolymer("china", "packaging", "pet").getSeries(), "goods");
+            assert.equal(matricies.getResinTrade(2050, "row").getNetImportResin(), 5);
+
+            assert.equal(matricies.getPolymer("row", "packaging", "pet"), undefined);
+            assert.equal(matricies.getSubtype(2049, "china", "packaging"), undefined);
+            assert.equal(matricies.getResinTrade(2050, "china"), undefined);
+            assert.equal(matricies.getResinTrade(2050, "mars"), undefined);
+        });
+
         QUnit.test("query for non-textile polymer", function(assert) {
             const done = assert.async();
             const modifierFuture = buildModifier();
@@ -248,6 +295,42 @@ function buildPolymerTest() {
             });
         });
 
+        QUnit.test("normalize trade series", function(assert) {
+            const done = assert.async();
+
+            const tradeMap = new Map();
+            tradeMap.set("china", new Map([["a", 40], ["b", 10]]));
+            tradeMap.set("row", new Map([["a", -20], ["b", -10]]));
+
+            const totals = new Map([["china", 30], ["row", -30]]);
+
+            const state = new Map();
+            state.set("trade", tradeMap);
+
+            const modifierFuture = buildModifier();
+            modifierFuture.then((modifier) => {
+                modifier._normalizeDetailedTradeSeries(
+                    state,
+                    "goods",
+                    ["a", "b"],
+                    totals,
+                    ["china", "row"],
+                );
+
+                const chinaTrade = tradeMap.get("china");
+                const chinaTotal = chinaTrade.get("a") + chinaTrade.get("b");
+                assert.ok(Math.abs(chinaTotal - 30) <= 1);
+
+                const aTotal = chinaTrade.get("a") + tradeMap.get("row").get("a");
+                assert.ok(Math.abs(aTotal) <= 1);
+
+                const diagnostics = state.get("tradeNormalization").get("goods");
+                assert.ok(diagnostics["iterations"] > 0);
+                assert.ok(diagnostics["residual"] <= 1);
+                done();
+            });
+        });
+
         QUnit.test("get combine vectors", function(assert) {
             const done = assert.async();
             const modifierFuture = buildModifier();
@@ -462,6 +545,53 @@ function buildPolymerTest() {
             });
         });
 
+        QUnit.test("modify without stages", function(assert) {
+            const chinaMap = new Map();
+            chinaMap.set("eolLandfillMT", 3);
+
+            const outMap = new Map();
+            outMap.set("china", chinaMap);
+
+            const state = new Map();
+            state.set("in", new Map());
+            state.set("out", outMap);
+
+            const done = assert.async();
+            const modifierFuture = buildModifier();
+            modifierFuture.then((modifier) => {
+                modifier.modify(2050, state, ["eolLandfillMT"], []);
+                assert.ok(!state.has("polymers"));
+                assert.ok(!state.has("ghg"));
+                assert.equal(state.get("out").get("global").get("eolLandfillMT"), 3);
+                done();
+            });
+        });
+
+        QUnit.test("remove ghg detail", function(assert) {
+            const chinaGhg = new Map();
+            chinaGhg.set("consumption", 5);
+            chinaGhg.set("overallGhg", 10);
+
+            const ghg = new Map();
+            ghg.set("china", chinaGhg);
+
+            const state = new Map();
+            state.set("trade", new Map());
+            state.set("polymers", new Map());
+            state.set("ghg", ghg);
+
+            const done = assert.async();
+            const modifierFuture = buildModifier();
+            modifierFuture.then((modifier) => {
+                modifier._removeGhgDetail(state, false);
+                assert.ok(!state.has("trade"));
+                assert.ok(!state.has("polymers"));
+                assert.equal(state.get("ghg").get("china").size, 1);
+                assert.equal(state.get("ghg").get("china").get("overallGhg"), 10);
+                done();
+            });
+        });
+
         QUnit.test("get GHG", function(assert) {
             const inputs = new Map();
             inputs.set("chinaTestEmissionsProduction", 1.5);
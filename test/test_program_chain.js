@@ -0,0 +1,122 @@
+import {ProgramChain} from "program_chain";
+
+
+function buildProgramChainTest() {
+    QUnit.module("program_chain", function() {
+
+        function buildState(a, b) {
+            const state = new Map();
+            state.set("in", new Map([["a", a], ["b", b]]));
+            state.set("out", new Map([["china", new Map([["x", 0]])]]));
+            return state;
+        }
+
+        function buildSteps(counts) {
+            const addInput = (name) => {
+                return (state) => {
+                    counts.set(name, counts.get(name) + 1);
+                    const china = state.get("out").get("china");
+                    china.set("x", china.get("x") * 10 + state.get("in").get(name));
+                };
+            };
+
+            counts.set("a", 0);
+            counts.set("b", 0);
+
+            return [
+                {
+                    "program": addInput("a"),
+                    "reads": ["in.a", "out.china.x"],
+                    "writes": ["out.china.x"],
+                    "stochastic": false,
+                },
+                {
+                    "program": addInput("b"),
+                    "reads": ["in.b", "out.china.x"],
+                    "writes": ["out.china.x"],
+                    "stochastic": false,
+                },
+            ];
+        }
+
+        QUnit.test("runs all steps initially", function(assert) {
+            const counts = new Map();
+            const chain = new ProgramChain();
+            const result = chain.run(2050, buildState(1, 2), buildSteps(counts));
+            assert.equal(result.get("out").get("china").get("x"), 12);
+            assert.equal(counts.get("a"), 1);
+            assert.equal(counts.get("b"), 1);
+        });
+
+        QUnit.test("reruns only affected suffix", function(assert) {
+            const counts = new Map();
+            const steps = buildSteps(counts);
+            const chain = new ProgramChain();
+            chain.run(2050, buildState(1, 2), steps);
+
+            const result = chain.run(2050, buildState(1, 3), steps);
+            assert.equal(result.get("out").get("china").get("x"), 13);
+            assert.equal(result.get("in").get("b"), 3);
+            assert.equal(counts.get("a"), 1);
+            assert.equal(counts.get("b"), 2);
+        });
+
+        QUnit.test("reruns all after first affected", function(assert) {
+            const counts = new Map();
+            const steps = buildSteps(counts);
+            const chain = new ProgramChain();
+            chain.run(2050, buildState(1, 2), steps);
+
+            const result = chain.run(2050, buildState(4, 2), steps);
+            assert.equal(result.get("out").get("china").get("x"), 42);
+            assert.equal(counts.get("a"), 2);
+            assert.equal(counts.get("b"), 2);
+        });
+
+        QUnit.test("reruns stochastic steps", function(assert) {
+            const counts = new Map();
+            const steps = buildSteps(counts);
+            steps[1]["stochastic"] = true;
+            const chain = new ProgramChain();
+            chain.run(2050, buildState(1, 2), steps);
+            chain.run(2050, buildState(1, 2), steps);
+            assert.equal(counts.get("a"), 1);
+            assert.equal(counts.get("b"), 2);
+        });
+
+        QUnit.test("uses meta of current run after checkpoint", function(assert) {
+            const counts = new Map();
+            const steps = buildSteps(counts);
+            steps[1]["program"] = (state) => {
+                const china = state.get("out").get("china");
+                china.set("x", state.get("meta").get("draw"));
+            };
+            steps[1]["stochastic"] = true;
+
+            const runWithDraw = (chain, draw) => {
+                const state = buildState(1, 2);
+                state.set("meta", new Map([["draw", draw]]));
+                return chain.run(2050, state, steps);
+            };
+
+            const chain = new ProgramChain();
+            runWithDraw(chain, 5);
+            const result = runWithDraw(chain, 7);
+            assert.equal(result.get("out").get("china").get("x"), 7);
+            assert.equal(counts.get("a"), 1);
+        });
+
+        QUnit.test("separates keys", function(assert) {
+            const counts = new Map();
+            const steps = buildSteps(counts);
+            const chain = new ProgramChain();
+            chain.run(2049, buildState(1, 2), steps);
+            chain.run(2050, buildState(1, 2), steps);
+            assert.equal(counts.get("a"), 2);
+        });
+
+    });
+}
+
+
+export {buildProgramChainTest};
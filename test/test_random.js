@@ -0,0 +1,84 @@
+import {
+    getStateRandomSource,
+    inverseNormalCdf,
+    LatinHypercubeSource,
+    makeTrialRandomSource,
+    RandomSource,
+} from "random";
+
+
+function buildRandomTest() {
+    QUnit.module("random", function() {
+
+        function draw(source, count) {
+            return Array.from(Array(count)).map(() => source.nextUniform());
+        }
+
+        QUnit.test("reproducible with seed", function(assert) {
+            const first = draw(new RandomSource(123, 4), 300);
+            const second = draw(new RandomSource(123, 4), 300);
+            assert.deepEqual(first, second);
+        });
+
+        QUnit.test("streams differ", function(assert) {
+            const first = draw(new RandomSource(123, 0), 10);
+            const second = draw(new RandomSource(123, 1), 10);
+            assert.notDeepEqual(first, second);
+        });
+
+        QUnit.test("uniform in range", function(assert) {
+            const source = new RandomSource(5);
+            const values = Array.from(Array(1000)).map(() => source.uniform(5, 10));
+            assert.ok(values.every((x) => x >= 5 && x < 10));
+        });
+
+        QUnit.test("normal moments", function(assert) {
+            const source = new RandomSource(7);
+            const values = Array.from(Array(10000)).map(() => source.normal(5, 2));
+            const mean = values.reduce((a, b) => a + b) / values.length;
+            const variance = values
+                .map((x) => Math.pow(x - mean, 2))
+                .reduce((a, b) => a + b) / values.length;
+            assert.ok(Math.abs(mean - 5) < 0.1);
+            assert.ok(Math.abs(Math.sqrt(variance) - 2) < 0.1);
+        });
+
+        QUnit.test("latin hypercube stratifies each draw", function(assert) {
+            const sources = Array.from(Array(20)).map((x, i) => new LatinHypercubeSource(3, i, 10));
+            [0, 1, 2].forEach(() => {
+                const strata = sources.map((source) => Math.floor(source.nextUniform() * 10));
+                assert.equal(new Set(strata.slice(0, 10)).size, 10);
+                assert.equal(new Set(strata.slice(10)).size, 10);
+            });
+        });
+
+        QUnit.test("latin hypercube reproducible with seed", function(assert) {
+            const first = draw(new LatinHypercubeSource(123, 4, 50), 30);
+            const second = draw(new LatinHypercubeSource(123, 4, 50), 30);
+            assert.deepEqual(first, second);
+        });
+
+        QUnit.test("inverse normal cdf", function(assert) {
+            assert.ok(Math.abs(inverseNormalCdf(0.5)) < 0.00001);
+            assert.ok(Math.abs(inverseNormalCdf(0.975) - 1.959964) < 0.00001);
+            assert.ok(Math.abs(inverseNormalCdf(0.025) + 1.959964) < 0.00001);
+        });
+
+        QUnit.test("makes trial sources", function(assert) {
+            assert.ok(makeTrialRandomSource("random", 1, 2, 10) instanceof RandomSource);
+            assert.ok(makeTrialRandomSource("latin", 1, 2, 10) instanceof LatinHypercubeSource);
+            assert.throws(() => makeTrialRandomSource("other", 1, 2, 10));
+        });
+
+        QUnit.test("uses source from state", function(assert) {
+            const source = new RandomSource(1);
+            const state = new Map([["meta", new Map([["random", source]])]]);
+            assert.equal(getStateRandomSource(state), source);
+            assert.ok(getStateRandomSource(new Map()) !== source);
+        });
+
+    });
+}
+
+
+export {buildRandomTest};
@@ -0,0 +1,46 @@
+import {MemoryStore, ResultCache} from "result_cache";
+
+
+function buildResultCacheTest() {
+    QUnit.module("result_cache", function() {
+
+        QUnit.test("stores and retrieves", function(assert) {
+            const cache = new ResultCache(new MemoryStore(10));
+            cache.set("a", 1);
+            assert.equal(cache.get("a"), 1);
+            assert.equal(cache.get("b"), null);
+        });
+
+        QUnit.test("evicts least recently used", function(assert) {
+            const cache = new ResultCache(new MemoryStore(2));
+            cache.set("a", 1);
+            cache.set("b", 2);
+            cache.get("a");
+            cache.set("c", 3);
+            assert.equal(cache.get("a"), 1);
+            assert.equal(cache.get("b"), null);
+            assert.equal(cache.get("c"), 3);
+        });
+
+        QUnit.test("evicts by size", function(assert) {
+            const cache = new ResultCache(new MemoryStore(5, (x) => x.length));
+            cache.set("a", "abc");
+            cache.set("b", "def");
+            assert.equal(cache.get("a"), null);
+            assert.equal(cache.get("b"), "def");
+        });
+
+        QUnit.test("reports stats", function(assert) {
+            const cache = new ResultCache(new MemoryStore(10));
+            cache.getOrCalculate("a", () => 1);
+            cache.getOrCalculate("a", () => 2);
+            assert.equal(cache.get("a"), 1);
+            const stats = cache.getStats();
+            assert.equal(stats["hits"], 2);
+            assert.equal(stats["misses"], 1);
+        });
+    });
+}
+
+
+export {buildResultCacheTest};
@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support'))
+
+import results_store  # noqa: E402
+
+USAGE_STR = 'python test_results_store.py'
+NUM_ARGS = 0
+
+
+def build_store():
+    records = []
+
+    for (region, value) in [('china', 1), ('eu30', 2), ('nafta', 3), ('row', 4), ('global', 10)]:
+        records.append({
+            'name': 'businessAsUsual',
+            'policy': 'businessAsUsual',
+            'year': 2050,
+            'region': region,
+            'values': {'eolLandfillMT': value}
+        })
+
+    records.append({
+        'name': 'businessAsUsual2030',
+        'policy': 'businessAsUsual',
+        'year': 2030,
+        'region': 'china',
+        'values': {'eolLandfillMT': 100}
+    })
+
+    return results_store.ResultsStore(records)
+
+
+def check_sum_excludes_global_rows():
+    store = build_store()
+
+    assert store.get_sum('eolLandfillMT', policy='businessAsUsual', years=[2050]) == 10
+    assert store.get_sum('eolLandfillMT', years=[2050], region='global') == 10
+    assert store.get_sum('eolLandfillMT') == 110
+    assert store.get_sum('eolLandfillMT', region='china') == 101
+
+
+def check_sum_matches_value():
+    store = build_store()
+
+    total = store.get_value('businessAsUsual', 2050, 'eolLandfillMT')
+    assert store.get_sum('eolLandfillMT', years=[2050]) == total
+
+
+def main():
+    if len(sys.argv) != NUM_ARGS + 1:
+        print(USAGE_STR)
+        sys.exit(1)
+
+    check_sum_excludes_global_rows()
+    check_sum_matches_value()
+
+    print('Done.')
+
+
+main()